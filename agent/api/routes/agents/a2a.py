@@ -1,29 +1,96 @@
+import asyncio
 import json
 import uuid
-from typing import Optional
-import redis
-from fastapi import APIRouter, Depends, Request, Header, HTTPException
-from agent.models.agent_rpc import JsonRpcRequest, JsonRpcResponse, TelexRequest, TelexResponse
-from agent.core.config import PROJECT_NAME, AGENT_API_KEY, TELEX_LOG_BASE
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+import orjson
+from fastapi import APIRouter, Depends, Request, Response, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from agent.models.agent_rpc import (
+    JsonRpcRequest, JsonRpcResponse, TelexRequest, TelexResponse, RpcParams, TaskPayload, rpc_request_adapter,
+    TaskSendRequest, MessageSendRequest, ProgressUpdateRequest, NextStepRequest, GoalProgressRequest,
+    GoalFromPlanRequest, SearchRequest, RPC_METHODS
+)
+from agent.core.affinity import ROUTING_KEY_HEADER, conversation_key, routing_key, set_affinity_headers
+from agent.core.admission import admission, Overloaded, METHOD_PRIORITIES, HIGH_PRIORITY, LOW_PRIORITY
+from agent.core.config import (
+    PROJECT_NAME, AGENT_API_KEY, TELEX_LOG_BASE,
+    COACH_DEADLINE_SECONDS, COACH_DEADLINE_FALLBACK
+)
 from agent.core.logger import logger
-from agent.db.database import get_redis, get_repository
-from agent.services.agent import run_gemini
-# from agent.db.repositories.goals import GoalRepository
+from agent.core.metrics import label_request
+from agent.core.tracing import current_span, span, traced
+from agent.core.ratelimit import enforce_rate_limit
+from agent.core.utils import short_plan_from_prompt
+from agent.db.database import get_redis, get_repository, get_optional_database
+from agent.db.replicas import read_session_key, set_read_session
+from agent.db.repositories.goals import GoalRepository
+from agent.core.worker import enqueue_for
+from agent.services.agent import FallbackReply, generate_reply, run_gemini_with_deadline, user_prompt_prefix
+from agent.services.attachments import Attachment, AttachmentError, ingest_parts
+from agent.services.delivery import post_to_telex
+from agent.services.next_steps import NextStepUnavailable, get_next_step
+from agent.services.plans import (
+    PlanOutlineUnavailable, plan_section_count, plan_sections, generate_plan, iter_plan_sections, plan_milestones,
+    save_plan
+)
+from agent.services.progress import ProgressError, publish_progress
+from agent.services.provider import llm_available
+from agent.services.search import search_history
 # from agent.db.repositories.messages import MessageRepository
 # from agent.db.repositories.users import UserRepository
 
 router = APIRouter()
 
+COACH_ACK_MESSAGE = "Great question! I'm putting together a detailed answer and will post it here shortly."
+
+
+async def queue_background_reply(key: Optional[str], user_msg: str, channel_id: str) -> bool:
+    """Hand a shed request to the conversation's worker, which posts the full reply to the channel."""
+    try:
+        await asyncio.to_thread(enqueue_for, key, "agent.core.worker.long_coach_task", user_msg, channel_id)
+        return True
+    except Exception as e:
+        logger.warning("Could not queue a background reply. Error: %s", e)
+        return False
+
 
 @router.post("/coach", response_model=TelexResponse)
-async def telex_webhook(payload: TelexRequest):
+async def telex_webhook(payload: TelexRequest, req: Request, response: Response):
+    key = routing_key(
+        req.headers.get(ROUTING_KEY_HEADER), conversation_key(channel_id=payload.channel_id, sender=payload.sender)
+    )
+    set_affinity_headers(response, key)
+    set_read_session(await read_session_key(get_optional_database(req), telex_user_id=payload.sender) or payload.sender)
+    await enforce_rate_limit(get_redis(req), sender=payload.sender, channel_id=payload.channel_id)
+
     try:
         user_msg = payload.message or ""
 
         if not user_msg.strip():
             reply = "Hi! I'm your AI Coaching Agent. What are you working on today?"
+        elif COACH_DEADLINE_SECONDS > 0 and payload.channel_id:
+            async def deliver(late_reply: str) -> None:
+                await push_message_to_telex(payload.channel_id, late_reply)
+
+            prefix = await user_prompt_prefix(get_optional_database(req), payload.sender)
+            reply = await run_gemini_with_deadline(user_msg, COACH_DEADLINE_SECONDS, deliver, prefix)
+            if (
+                isinstance(reply, FallbackReply) and llm_available()
+                and await queue_background_reply(key, user_msg, payload.channel_id)
+            ):
+                # shed here: the worker owning this conversation answers in the channel instead
+                reply = COACH_ACK_MESSAGE
+            elif reply is None:
+                if COACH_DEADLINE_FALLBACK == "template":
+                    reply = short_plan_from_prompt(user_msg)
+                else:
+                    reply = COACH_ACK_MESSAGE
         else:
-            reply = await run_gemini(user_msg)
+            prefix = await user_prompt_prefix(get_optional_database(req), payload.sender)
+            reply = await generate_reply(user_msg, prefix=prefix)
 
         if not reply.strip():
             push_log_to_telex(payload.channel_id, f"User: {user_msg}")
@@ -53,64 +120,234 @@ async def agent_card():
     }
 
 
+def _json_default(value: Any) -> Any:
+    # types orjson does not encode itself: repository rows, models and NUMERIC columns
+    if isinstance(value, Mapping):
+        return dict(value)
+    if hasattr(value, "_mapping"):
+        return dict(value._mapping)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def render_rpc(rpc_response: JsonRpcResponse, response: Response) -> Response:
+    """
+    Encode straight to bytes. Handlers already built a valid JsonRpcResponse, so
+    FastAPI's response_model revalidation and jsonable_encoder walk are skipped.
+    """
+    content = orjson.dumps(
+        {
+            "jsonrpc": rpc_response.jsonrpc,
+            "id": rpc_response.id,
+            "result": rpc_response.result,
+            "error": rpc_response.error,
+        },
+        default=_json_default,
+    )
+    rendered = Response(content=content, media_type="application/json")
+    # headers set on the injected response (affinity) are not merged into a returned Response
+    rendered.headers.raw.extend(response.headers.raw)
+    return rendered
+
+
+def invalid_params(body: bytes, error: ValidationError) -> Optional[JsonRpcResponse]:
+    """A -32602 reply when the envelope is fine and only params failed validation."""
+    errors = error.errors()
+    if not all(len(e["loc"]) > 1 and e["loc"][1] == "params" for e in errors):
+        return None
+    try:
+        rpc_id = JsonRpcRequest.model_validate_json(body).id
+    except ValidationError:
+        return None
+    return JsonRpcResponse(id=rpc_id, error=params_error(errors, field_start=2))
+
+
+def params_error(errors: list, field_start: int = 0) -> dict:
+    """JSON-RPC -32602 error naming each invalid field; loc parts before `field_start` are dropped."""
+    message = "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'][field_start:]) or 'params'}: {e['msg']}" for e in errors
+    )
+    return {"code": -32602, "message": f"Invalid params: {message}"}
+
+
 @router.post("/rpc", response_model=JsonRpcResponse)
 async def rpc_entry(
     req: Request,
-) -> JsonRpcResponse:
+    response: Response,
+) -> Response:
     try:
-        body = await req.json()
-        rpc = JsonRpcRequest(**body)
-    except Exception as e:
-        logger.exception(e)
+        with span("rpc.parse"):
+            body = await req.body()
+            rpc = rpc_request_adapter.validate_json(body)
+    except ValidationError as e:
+        error = invalid_params(body, e)
+        if error is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid JSON-RPC: {e}"
+            ) from e
+        return render_rpc(error, response)
+
+    # the method is client-supplied; only known names become metric labels
+    method_label = rpc.method if rpc.method in RPC_METHODS else "unknown"
+    label_request(rpc_method=method_label)
+    current_span().set(rpc_method=method_label)
+    try:
+        params = rpc.params if isinstance(rpc.params, RpcParams) else RpcParams.model_validate(rpc.params or {})
+    except ValidationError as e:
+        # unknown methods keep their params untyped, so context_id/sender are checked only here
+        return render_rpc(JsonRpcResponse(id=rpc.id, error=params_error(e.errors())), response)
+    key = routing_key(
+        req.headers.get(ROUTING_KEY_HEADER), conversation_key(context_id=params.context_id, sender=params.sender)
+    )
+    set_affinity_headers(response, key)
+    set_read_session(
+        await read_session_key(get_optional_database(req), getattr(params, "user_id", None), params.sender) or key
+    )
+
+    # LLM-bound methods degrade to a template plan inside generate_reply;
+    # low-priority methods are refused outright so they never add to the backlog.
+    priority = METHOD_PRIORITIES.get(rpc.method)
+    try:
+        if priority == LOW_PRIORITY:
+            admission.check(LOW_PRIORITY)
+    except Overloaded as o:
         raise HTTPException(
-            status_code=400,
-            detail=f"Invalid JSON-RPC: {e}"
-        ) from e
+            status_code=503,
+            detail="Agent is overloaded, please retry later",
+            headers={"Retry-After": str(o.retry_after)}
+        ) from o
+
+    if priority == HIGH_PRIORITY:
+        await enforce_rate_limit(get_redis(req), sender=params.sender)
 
     if rpc.method == "tasks/send":
-        return await handle_task_send(rpc)
+        result = await handle_task_send(rpc, req)
+    elif rpc.method == "tasks/sendSubscribe":
+        stream = handle_task_send_subscribe(rpc, req)
+        set_affinity_headers(stream, key)
+        return stream
     elif rpc.method == "message/send":
-        return await handle_message_send(rpc)
+        result = await handle_message_send(rpc, req)
     elif rpc.method == "progress/update":
-        return await handle_progress_update(rpc)
+        result = await handle_progress_update(rpc, req)
+    elif rpc.method == "goals/next_step":
+        result = await handle_next_step(rpc, req)
+    elif rpc.method == "goals/progress":
+        result = await handle_goal_progress(rpc, req)
+    elif rpc.method == "goals/from_plan":
+        result = await handle_goal_from_plan(rpc, req)
+    elif rpc.method == "search/query":
+        result = await handle_search(rpc, req)
     else:
-        return JsonRpcResponse(id=rpc.id, error={"code": -32601, "message": "Method not found"})
+        result = JsonRpcResponse(id=rpc.id, error={"code": -32601, "message": "Method not found"})
+    return render_rpc(result, response)
 
 
-async def handle_task_send(rpc: JsonRpcRequest) -> JsonRpcResponse:
-    try:
-        params = rpc.params or {}
-        task = params.get("task", {})
+async def task_inputs(task: TaskPayload, req: Request) -> Tuple[str, List[Attachment]]:
+    text_inputs, attachments = await ingest_parts(task.parts, get_redis(req))
+    return " ".join(text_inputs).strip() or task.title or "", attachments
 
-        parts = task.get("parts", [])
-        text_inputs = []
-        for p in parts:
-            if isinstance(p, dict) and p.get("text"):
-                text_inputs.append(p["text"])
-            elif isinstance(p, str):
-                text_inputs.append(p)
 
-        user_text = " ".join(text_inputs).strip() or task.get("title", "")
+@traced("rpc.tasks/send")
+async def handle_task_send(rpc: TaskSendRequest, req: Request) -> JsonRpcResponse:
+    try:
+        params = rpc.params
+        task = params.task
+        user_text, attachments = await task_inputs(task, req)
 
-        reply = await run_gemini(user_text)
+        sections = None if attachments else plan_sections(user_text, params.mode)
+        if sections:
+            reply = await generate_plan(user_text, *sections)
+        else:
+            reply = await generate_reply(user_text, attachments=attachments)
 
         result = {
-            "task_id": task.get("id", str(uuid.uuid4())),
+            "task_id": task.id or str(uuid.uuid4()),
             "status": "completed",
             "parts": [{"type": "text", "text": reply}],
-            "context_id": params.get("context_id")
+            "context_id": params.context_id
         }
 
         return JsonRpcResponse(id=rpc.id, result=result)
+    except AttachmentError as e:
+        return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": str(e)})
     except Exception as e:
         logger.exception(e)
         return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
 
 
-async def handle_message_send(rpc: JsonRpcRequest) -> JsonRpcResponse:
+def handle_task_send_subscribe(rpc: TaskSendRequest, req: Request) -> StreamingResponse:
+    """
+    Stream a task as server-sent events, one JSON-RPC response per event.
+
+    Decomposed plans emit each section as an artifact chunk as soon as it and
+    every earlier section are done; the final event carries the merged plan.
+    """
+    params = rpc.params
+    task = params.task
+    task_id = task.id or str(uuid.uuid4())
+    context_id = params.context_id
+
+    def event(result: dict) -> str:
+        return f"data: {JsonRpcResponse(id=rpc.id, result=result).model_dump_json()}\n\n"
+
+    async def stream():
+        with span("rpc.tasks/sendSubscribe"):
+            async for chunk in events():
+                yield chunk
+
+    async def events():
+        try:
+            user_text, attachments = await task_inputs(task, req)
+            sections = None if attachments else plan_sections(user_text, params.mode)
+            if sections:
+                chunks, last = [], plan_section_count(sections[0]) - 1
+                try:
+                    async for index, text in iter_plan_sections(user_text, *sections):
+                        chunks.append(text)
+                        yield event({
+                            "task_id": task_id,
+                            "status": "working",
+                            "artifact": {
+                                "index": 0,
+                                "append": index > 0,
+                                "last_chunk": index == last,
+                                "parts": [{"type": "text", "text": text}],
+                            },
+                            "context_id": context_id,
+                        })
+                    reply = "\n\n".join(chunks)
+                except PlanOutlineUnavailable as e:
+                    reply = e.reply
+            else:
+                reply = await generate_reply(user_text, attachments=attachments)
+
+            yield event({
+                "task_id": task_id,
+                "status": "completed",
+                "parts": [{"type": "text", "text": reply}],
+                "context_id": context_id,
+            })
+        except AttachmentError as e:
+            error = JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": str(e)})
+            yield f"data: {error.model_dump_json()}\n\n"
+        except Exception as e:
+            logger.exception(e)
+            error = JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
+            yield f"data: {error.model_dump_json()}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@traced("rpc.message/send")
+async def handle_message_send(rpc: MessageSendRequest, req: Request) -> JsonRpcResponse:
     try:
-        params = rpc.params or {}
-        message = params.get("message")
+        params = rpc.params
+        message = params.message
 
         if isinstance(message, dict):
             text = message.get("text")
@@ -122,10 +359,10 @@ async def handle_message_send(rpc: JsonRpcRequest) -> JsonRpcResponse:
 
         if text.lower().startswith(("create goal:", "new goal:")):
             title = text.split(":", 1)[1].strip()
-            sender = params.get("sender")
             return JsonRpcResponse(id=rpc.id, result={"message": f"Goal created: {title}"})
 
-        reply = await run_gemini(text)
+        prefix = await user_prompt_prefix(get_optional_database(req), params.sender)
+        reply = await generate_reply(text, prefix=prefix)
 
         return JsonRpcResponse(id=rpc.id, result={"message": {"text": reply}})
     except Exception as e:
@@ -133,13 +370,94 @@ async def handle_message_send(rpc: JsonRpcRequest) -> JsonRpcResponse:
         return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
 
 
-async def handle_progress_update(rpc: JsonRpcRequest) -> JsonRpcResponse:
+@traced("rpc.progress/update")
+async def handle_progress_update(rpc: ProgressUpdateRequest, req: Request) -> JsonRpcResponse:
+    """Queue the update on the progress stream; the worker applies it in batches."""
+    redis_ = get_redis(req)
+    if redis_ is None:
+        return JsonRpcResponse(id=rpc.id, error={"code": -32000, "message": "Progress updates unavailable"})
+
+    try:
+        event_id = await publish_progress(redis_, rpc.params)
+        return JsonRpcResponse(id=rpc.id, result={"status": "acknowledged", "event_id": event_id})
+    except ProgressError as e:
+        return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": str(e)})
+    except Exception as e:
+        logger.exception(e)
+        return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
+
+
+@traced("rpc.goals/next_step")
+async def handle_next_step(rpc: NextStepRequest, req: Request) -> JsonRpcResponse:
     try:
-        params = rpc.params or {}
-        # if redis_:
-        #     await redis_.rpush("progress_updates", json.dumps(params))
+        params = rpc.params
+        db = get_optional_database(req)
+        if db is None:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32603, "message": "Goal storage unavailable"})
+
+        result = await get_next_step(db, get_redis(req), params.user_id, params.goal_id)
+        if result is None:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Goal not found"})
 
-        return JsonRpcResponse(id=rpc.id, result={"status": "acknowledged"})
+        return JsonRpcResponse(id=rpc.id, result=result)
+    except NextStepUnavailable as e:
+        return JsonRpcResponse(id=rpc.id, error={"code": -32000, "message": str(e)})
+    except Exception as e:
+        logger.exception(e)
+        return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
+
+
+@traced("rpc.goals/progress")
+async def handle_goal_progress(rpc: GoalProgressRequest, req: Request) -> JsonRpcResponse:
+    try:
+        db = get_optional_database(req)
+        if db is None:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32603, "message": "Goal storage unavailable"})
+
+        dashboard = await GoalRepository(db).get_progress_dashboard(rpc.params.user_id)
+        return JsonRpcResponse(id=rpc.id, result=dashboard)
+    except Exception as e:
+        logger.exception(e)
+        return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
+
+
+@traced("rpc.goals/from_plan")
+async def handle_goal_from_plan(rpc: GoalFromPlanRequest, req: Request) -> JsonRpcResponse:
+    try:
+        params = rpc.params
+        title = params.title.strip()
+        if not title:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "title is required"})
+
+        plan_text = params.plan or short_plan_from_prompt(title)
+        if not plan_milestones(plan_text):
+            return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "No milestones found in plan"})
+
+        db = get_optional_database(req)
+        if db is None:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32603, "message": "Goal storage unavailable"})
+
+        goal = await save_plan(db, params.user_id, title, plan_text)
+        return JsonRpcResponse(id=rpc.id, result=goal)
+    except Exception as e:
+        logger.exception(e)
+        return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
+
+
+@traced("rpc.search/query")
+async def handle_search(rpc: SearchRequest, req: Request) -> JsonRpcResponse:
+    try:
+        params = rpc.params
+        query = params.query.strip()
+        if not query:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "query is required"})
+
+        db = get_optional_database(req)
+        if db is None:
+            return JsonRpcResponse(id=rpc.id, error={"code": -32603, "message": "Search unavailable"})
+
+        result = await search_history(db, params.user_id, query, params.limit, params.since)
+        return JsonRpcResponse(id=rpc.id, result=result)
     except Exception as e:
         logger.exception(e)
         return JsonRpcResponse(id=rpc.id, error={"code": -32602, "message": "Internal Server Error"})
@@ -154,6 +472,16 @@ def push_log_to_telex(channel_id: str, content: str):
         headers["X-AGENT-API-KEY"] = AGENT_API_KEY
     try:
         import requests
-        requests.post(url, json={"log": content}, headers=headers, timeout=5)
+        with span("telex.push_log", channel_id=channel_id):
+            requests.post(url, json={"log": content}, headers=headers, timeout=5)
     except Exception as e:
         logger.debug("Could not push to telex logs. Error: %s", e)
+
+
+async def push_message_to_telex(channel_id: str, content: str):
+    if not channel_id:
+        return
+    try:
+        await post_to_telex(channel_id, content)
+    except Exception as e:
+        logger.error("Could not push reply to telex channel %s. Error: %s", channel_id, e)
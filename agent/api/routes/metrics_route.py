@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from agent.core.affinity import ring
+from agent.core.logger import logger
+from agent.core.metrics import queue_depth, redis_up, registry
+from agent.db.database import get_redis
+from agent.db.redis_client import pipeline
+
+router = APIRouter(tags=["Metrics"])
+
+QUEUE_NAMES = ("telex_tasks",)
+
+
+def queue_names():
+    """The shared queue plus each ring node's telex_tasks:<node> affinity queue."""
+    return QUEUE_NAMES + tuple(f"telex_tasks:{node}" for node in ring.nodes)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(redis_=Depends(get_redis)) -> PlainTextResponse:
+    if redis_ is not None:
+        names = queue_names()
+        try:
+            async with pipeline(redis_) as pipe:
+                pipe.ping()
+                for name in names:
+                    pipe.llen(f"rq:queue:{name}")
+                pong, *depths = await pipe.execute()
+            redis_up.set(int(bool(pong)))
+            for name, depth in zip(names, depths):
+                queue_depth.set(depth, queue=name)
+        except Exception as e:
+            redis_up.set(0)
+            logger.debug("Could not read queue depths. Error: %s", e)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,130 @@
+"""
+Admission control for LLM-bound work
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from agent.core.config import (
+    LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE, LLM_MAX_QUEUE_WAIT, LLM_LOW_PRIORITY_QUEUE
+)
+from agent.core.logger import logger
+from agent.core.tracing import span
+
+HIGH_PRIORITY = 0
+LOW_PRIORITY = 1
+
+# JSON-RPC methods that are refused first when the agent is saturated
+METHOD_PRIORITIES = {
+    "tasks/send": HIGH_PRIORITY,
+    "tasks/sendSubscribe": HIGH_PRIORITY,
+    "message/send": HIGH_PRIORITY,
+    "goals/next_step": HIGH_PRIORITY,
+    "progress/update": LOW_PRIORITY,
+}
+
+# Seconds for the smoothed queue wait to halve while no acquire updates it
+QUEUE_WAIT_HALF_LIFE = 2.0
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Agent overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds concurrent LLM calls and sheds load before queues grow unbounded.
+
+    High-priority callers wait for one of `max_in_flight` slots, but are refused
+    once `max_queue` callers are already waiting or the smoothed queue wait is
+    over `max_queue_wait`. Low-priority callers never take a slot; they are
+    refused as soon as the queue passes `low_priority_queue` or half the wait budget.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_queue_wait: float, low_priority_queue: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.low_priority_queue = low_priority_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self._queue_wait = 0.0
+        self._wait_recorded = time.monotonic()
+        self.shed = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_wait))
+
+    def _decayed_wait(self) -> float:
+        elapsed = time.monotonic() - self._wait_recorded
+        return self._queue_wait * 0.5 ** (elapsed / QUEUE_WAIT_HALF_LIFE)
+
+    @property
+    def queue_wait(self) -> float:
+        """
+        Smoothed queue wait, decayed by the time since it was last recorded. A free
+        slot with nobody waiting means no wait at all, so shedding stops once load
+        drops even though shed requests never reach an acquire to record it.
+        """
+        if self.waiting == 0 and self.in_flight < self.max_in_flight:
+            return 0.0
+        return self._decayed_wait()
+
+    def _record_wait(self, waited: float) -> None:
+        # exponentially weighted so a single slow acquire does not flip shedding on
+        self._queue_wait = 0.8 * self._decayed_wait() + 0.2 * waited
+        self._wait_recorded = time.monotonic()
+
+    def _refuse(self, priority: int) -> Overloaded:
+        self.shed += 1
+        logger.warning({
+            "event": "load_shed", "priority": priority, "in_flight": self.in_flight,
+            "waiting": self.waiting, "queue_wait": round(self.queue_wait, 3)
+        })
+        return Overloaded(self._retry_after())
+
+    def check(self, priority: int = LOW_PRIORITY) -> None:
+        """Raise Overloaded if a request of this priority should be shed right now."""
+        if priority == LOW_PRIORITY:
+            if self.waiting >= self.low_priority_queue or self.queue_wait > self.max_queue_wait / 2:
+                raise self._refuse(priority)
+        elif self.waiting >= self.max_queue or self.queue_wait > self.max_queue_wait:
+            raise self._refuse(priority)
+
+    @asynccontextmanager
+    async def admit(self, priority: int = HIGH_PRIORITY) -> AsyncIterator[None]:
+        self.check(priority)
+        if priority == LOW_PRIORITY:
+            yield
+            return
+
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            with span("llm.admission", queued=self.waiting, in_flight=self.in_flight):
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            raise self._refuse(priority) from None
+        finally:
+            self.waiting -= 1
+            self._record_wait(time.monotonic() - started)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+
+admission = AdmissionController(
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    max_queue=LLM_MAX_QUEUE,
+    max_queue_wait=LLM_MAX_QUEUE_WAIT,
+    low_priority_queue=LLM_LOW_PRIORITY_QUEUE,
+)
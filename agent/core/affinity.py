@@ -0,0 +1,88 @@
+"""
+Consistent-hash routing of conversations to agent instances
+
+A conversation's routing key is the X-A2A-Routing-Key request header when the
+client sends one, so a proxy can hash it from the first request on; otherwise
+a token derived from the context, channel or sender id in the body, returned in
+the response for the client to send back. The ring maps keys to INSTANCE_IDs,
+each one process (main() runs a single worker when AFFINITY_NODES is set), and
+background jobs for a key go to the owning instance's worker queue.
+"""
+
+import bisect
+import hashlib
+from typing import Iterable, List, Optional
+from starlette.responses import Response
+from agent.core.config import AFFINITY_NODES, AFFINITY_VNODES, INSTANCE_ID
+
+ROUTING_KEY_HEADER = "X-A2A-Routing-Key"
+AFFINITY_NODE_HEADER = "X-A2A-Affinity-Node"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Maps keys to nodes so each node owns many small arcs of the ring. Adding or
+    removing a node only moves the keys on that node's arcs (about 1/N of them).
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 128):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self._owners))
+
+    def add(self, node: str) -> None:
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        keep = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+ring = HashRing([n.strip() for n in AFFINITY_NODES.split(",") if n.strip()] or [INSTANCE_ID], AFFINITY_VNODES)
+
+
+def conversation_key(context_id: Optional[str] = None, channel_id: Optional[str] = None,
+                     sender: Optional[str] = None) -> Optional[str]:
+    """The id a conversation's turns share: its context, else its channel, else its sender."""
+    return context_id or channel_id or sender
+
+
+def routing_token(key: str) -> str:
+    """A header-safe stand-in for a conversation key; ids are client-supplied and may not be latin-1."""
+    return f"{_hash(key):016x}"
+
+
+def routing_key(request_key: Optional[str], conversation: Optional[str]) -> Optional[str]:
+    """The client's X-A2A-Routing-Key when sent, else a token for the conversation id."""
+    if request_key:
+        return request_key
+    return routing_token(conversation) if conversation else None
+
+
+def set_affinity_headers(response: Response, key: Optional[str]) -> None:
+    """Return the routing key and owning node so clients can send the key on later requests."""
+    if not key:
+        return
+    response.headers[ROUTING_KEY_HEADER] = key
+    response.headers[AFFINITY_NODE_HEADER] = ring.node_for(key) or INSTANCE_ID
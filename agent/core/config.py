@@ -1,43 +1,253 @@
 """
 Centralized logic for declaring application environment variables
+
+Settings are resolved on first access rather than at import, so a process only
+reads and validates the variables it actually uses. `from agent.core.config
+import X` still works and resolves just X, at the importer's import time; that is
+fine for settings with a default, while settings that have none (credentials,
+DATABASE_URL) are read as `config.X` where they are used. Entry points `require()`
+the settings they cannot run without, so those still fail at startup.
 """
 
+import json
 import pathlib
 import os
-from databases import DatabaseURL
+import socket
+import threading
+from typing import Any, Callable
 from starlette.config import Config
 from starlette.datastructures import Secret
 
 env_path = os.environ.get("ENV_FILE_PATH") or pathlib.Path(__file__).resolve().parents[2] / ".env"
 config = Config(env_path)
 
-PROJECT_NAME = config("APP_NAME", cast=str, default="multi_modal_coach-agent")
-VERSION = config("APP_VERSION", cast=str, default="1.0.0")
-ALLOWED_ORIGINS = config("ALLOWED_ORIGINS", cast=list, default=["*"])
-SECRET_KEY = config("SECRET_KEY", cast=str)
-ENV = config("ENV", cast=str, default="development")
-LOG_PATH = config("AGENT_LOG_PATH", cast=str, default="agent_interactions.log")
-AGENT_API_KEY = config("AGENT_API_KEY", cast=str, default=None)
-TELEX_LOG_BASE = config("TELEX_LOG_BASE", cast=str, default="https://api.telex.im/agent-logs")
-
-POSTGRES_USER = config("POSTGRES_USER", cast=str)
-POSTGRES_PASSWORD = config("POSTGRES_PASSWORD", cast=Secret)
-POSTGRES_SERVER = config("POSTGRES_HOST", cast=str)
-POSTGRES_PORT = config("POSTGRES_PORT", cast=str, default="5432")
-POSTGRES_DB = config("POSTGRES_DB", cast=str)
+
+class _Lazy:
+    def __init__(self, resolve: Callable[[], Any]):
+        self.resolve = resolve
+
+
+def lazy(key: str, **kwargs) -> Any:
+    return _Lazy(lambda: config(key, **kwargs))
+
+
+def get(name: str) -> Any:
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+def require(*names: str) -> None:
+    """Resolve `names` now, so a missing required setting stops startup instead of failing a request."""
+    for name in names:
+        get(name)
+
+
+def _db_url() -> str:
+    return (
+        f"postgresql://{get('POSTGRES_USER')}:{get('POSTGRES_PASSWORD')}"
+        f"@{get('POSTGRES_SERVER')}:{get('POSTGRES_PORT')}/{get('POSTGRES_DB')}"
+    )
+
+
+def _cpu_quota() -> int:
+    """Whole CPUs this process may use: the cgroup quota (v2, then v1) if set, else the core count."""
+    cores = os.cpu_count() or 1
+    try:
+        quota, period = pathlib.Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+    except (OSError, ValueError):
+        try:
+            quota = pathlib.Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text().strip()
+            period = pathlib.Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text().strip()
+        except OSError:
+            return cores
+    if quota in ("max", "-1"):
+        return cores
+    return max(1, min(cores, -(-int(quota) // int(period))))
+
+
+def _web_concurrency() -> int:
+    # every worker opens its own DB and Redis pools, so the default stays small
+    return config("WEB_CONCURRENCY", cast=int, default=None) or min(_cpu_quota(), 4)
+
+
+def _database_url():
+    from databases import DatabaseURL
+
+    return config("DATABASE_URL", cast=DatabaseURL, default=None) or DatabaseURL(get("db_url"))
+
+
+PROJECT_NAME = lazy("APP_NAME", cast=str, default="multi_modal_coach-agent")
+VERSION = lazy("APP_VERSION", cast=str, default="1.0.0")
+ALLOWED_ORIGINS = lazy("ALLOWED_ORIGINS", cast=list, default=["*"])
+SECRET_KEY = lazy("SECRET_KEY", cast=str)
+ENV = lazy("ENV", cast=str, default="development")
+HOST = lazy("HOST", cast=str, default="0.0.0.0")
+PORT = lazy("PORT", cast=int, default=8000)
+# Production serving: worker processes (defaults to the container's CPU quota, at most 4),
+# requests served before a worker is recycled (0 disables) and the total seconds a worker
+# spends shutting down, shared by open connections and in-flight LLM calls. Keep it below
+# the orchestrator's stop grace period (docker-compose.yml: stop_grace_period).
+WEB_CONCURRENCY = _Lazy(_web_concurrency)
+WORKER_MAX_REQUESTS = lazy("WORKER_MAX_REQUESTS", cast=int, default=10000)
+SHUTDOWN_GRACE_SECONDS = lazy("SHUTDOWN_GRACE_SECONDS", cast=int, default=30)
+# addresses (comma-separated IPs or CIDRs) of the proxies whose X-Forwarded-For/-Proto are
+# trusted as the client address; set it to the load balancer's subnet when there is one
+FORWARDED_ALLOW_IPS = lazy("FORWARDED_ALLOW_IPS", cast=str, default="127.0.0.1/32")
+LOG_PATH = lazy("AGENT_LOG_PATH", cast=str, default="agent_interactions.log")
+LOG_LEVEL = lazy("LOG_LEVEL", cast=str, default="INFO")
+# "json" or "text"
+LOG_FORMAT = lazy("LOG_FORMAT", cast=str, default="json")
+LOG_QUEUE_SIZE = lazy("LOG_QUEUE_SIZE", cast=int, default=10000)
+# JSON object of event name (or message template) -> fraction of records kept
+LOG_SAMPLE_RATES = lazy("LOG_SAMPLE_RATES", cast=json.loads, default='{"verifying_signature": 0.01}')
+# Tracing: spans go to a JSONL file and/or an OTLP/HTTP collector; off when neither is set.
+# Traces are kept at TRACE_SAMPLE_RATE, plus any that errored or ran past TRACE_SLOW_MS.
+TRACE_EXPORT_PATH = lazy("TRACE_EXPORT_PATH", cast=str, default="")
+TRACE_OTLP_ENDPOINT = lazy("TRACE_OTLP_ENDPOINT", cast=str, default="")
+TRACE_SAMPLE_RATE = lazy("TRACE_SAMPLE_RATE", cast=float, default=0.05)
+TRACE_SLOW_MS = lazy("TRACE_SLOW_MS", cast=float, default=2000)
+TRACE_MAX_SPANS = lazy("TRACE_MAX_SPANS", cast=int, default=512)
+AGENT_API_KEY = lazy("AGENT_API_KEY", cast=str, default=None)
+TELEX_LOG_BASE = lazy("TELEX_LOG_BASE", cast=str, default="https://api.telex.im/agent-logs")
+TELEX_WEBHOOK_BASE = lazy("TELEX_WEBHOOK_BASE", cast=str, default="https://ping.telex.im/v1/webhooks")
+# Shared secret for X-A2A-Signature on /rpc and /coach (unset disables the check), how far
+# X-A2A-Timestamp may drift, and the replay cache: seconds per bucket and entries kept in memory
+A2A_SIGNING_SECRET = lazy("A2A_SIGNING_SECRET", cast=str, default=None)
+A2A_SIGNATURE_TOLERANCE_SECONDS = lazy("A2A_SIGNATURE_TOLERANCE_SECONDS", cast=int, default=300)
+A2A_NONCE_BUCKET_SECONDS = lazy("A2A_NONCE_BUCKET_SECONDS", cast=int, default=60)
+A2A_NONCE_CACHE_SIZE = lazy("A2A_NONCE_CACHE_SIZE", cast=int, default=100_000)
+# Largest /rpc or /coach body buffered, signed or not; bigger ones get 413 before any parsing
+A2A_MAX_BODY_BYTES = lazy("A2A_MAX_BODY_BYTES", cast=int, default=32 * 1024 * 1024)
+
+# Seconds /coach waits for the LLM before answering early; 0 disables deadline mode
+COACH_DEADLINE_SECONDS = lazy("COACH_DEADLINE_SECONDS", cast=float, default=8.0)
+# What /coach answers with when the deadline passes: "ack" or "template"
+COACH_DEADLINE_FALLBACK = lazy("COACH_DEADLINE_FALLBACK", cast=str, default="ack")
+
+# Admission control in front of Gemini
+LLM_MAX_IN_FLIGHT = lazy("LLM_MAX_IN_FLIGHT", cast=int, default=16)
+LLM_MAX_QUEUE = lazy("LLM_MAX_QUEUE", cast=int, default=64)
+LLM_MAX_QUEUE_WAIT = lazy("LLM_MAX_QUEUE_WAIT", cast=float, default=5.0)
+LLM_LOW_PRIORITY_QUEUE = lazy("LLM_LOW_PRIORITY_QUEUE", cast=int, default=16)
+
+# Per-sender / per-channel token buckets: tiers are "name=capacity/refill_per_sec",
+# members map a sender or channel id to a tier ("channel_abc=pro"); others use "default".
+# A channel's bucket is shared by everyone in it, so the default allows a busy group chat
+RATE_LIMIT_ENABLED = lazy("RATE_LIMIT_ENABLED", cast=bool, default=True)
+RATE_LIMIT_TIERS = lazy("RATE_LIMIT_TIERS", cast=str, default="default=60/1,pro=240/4")
+RATE_LIMIT_TIER_MEMBERS = lazy("RATE_LIMIT_TIER_MEMBERS", cast=str, default="")
+
+# Long plans ("12-week ...") are outlined first and their sections generated in parallel
+PLAN_FANOUT_MIN_SECTIONS = lazy("PLAN_FANOUT_MIN_SECTIONS", cast=int, default=4)
+PLAN_FANOUT_MAX_SECTIONS = lazy("PLAN_FANOUT_MAX_SECTIONS", cast=int, default=16)
+PLAN_FANOUT_CONCURRENCY = lazy("PLAN_FANOUT_CONCURRENCY", cast=int, default=4)
+
+# Worker job that precomputes next-step suggestions for active goals
+NEXT_STEP_INTERVAL_SECONDS = lazy("NEXT_STEP_INTERVAL_SECONDS", cast=int, default=6 * 60 * 60)
+NEXT_STEP_BATCH_SIZE = lazy("NEXT_STEP_BATCH_SIZE", cast=int, default=20)
+NEXT_STEP_REQUESTS_PER_MINUTE = lazy("NEXT_STEP_REQUESTS_PER_MINUTE", cast=int, default=60)
+NEXT_STEP_TTL_SECONDS = lazy("NEXT_STEP_TTL_SECONDS", cast=int, default=3 * 24 * 60 * 60)
+
+# progress/update events: Redis Stream length cap, and the worker consumer's batch size,
+# blocking read timeout and idle time after which another consumer's pending events are claimed
+PROGRESS_STREAM_MAXLEN = lazy("PROGRESS_STREAM_MAXLEN", cast=int, default=1_000_000)
+PROGRESS_BATCH_SIZE = lazy("PROGRESS_BATCH_SIZE", cast=int, default=500)
+PROGRESS_BLOCK_MS = lazy("PROGRESS_BLOCK_MS", cast=int, default=1000)
+PROGRESS_CLAIM_IDLE_MS = lazy("PROGRESS_CLAIM_IDLE_MS", cast=int, default=60_000)
+# deliveries after which an event that keeps failing is moved to the dead-letter stream
+PROGRESS_MAX_DELIVERIES = lazy("PROGRESS_MAX_DELIVERIES", cast=int, default=5)
+
+# Monthly messages partitions: months created ahead, how often the worker checks, months kept
+# before a partition is archived to MESSAGE_ARCHIVE_DIR and dropped (0 keeps every month)
+MESSAGE_PARTITIONS_AHEAD = lazy("MESSAGE_PARTITIONS_AHEAD", cast=int, default=3)
+MESSAGE_PARTITION_INTERVAL_SECONDS = lazy("MESSAGE_PARTITION_INTERVAL_SECONDS", cast=int, default=24 * 60 * 60)
+MESSAGE_RETENTION_MONTHS = lazy("MESSAGE_RETENTION_MONTHS", cast=int, default=0)
+MESSAGE_ARCHIVE_DIR = lazy("MESSAGE_ARCHIVE_DIR", cast=str, default="archive/messages")
+
+# Background results posted to Telex channels: pooled connections, concurrent posts per channel,
+# results read but not yet delivered, attempts before dead-lettering and the first backoff delay.
+# Results up to half of DELIVERY_BATCH_MAX_CHARS for one channel are combined within the window.
+DELIVERY_MAX_CONNECTIONS = lazy("DELIVERY_MAX_CONNECTIONS", cast=int, default=20)
+DELIVERY_CHANNEL_CONCURRENCY = lazy("DELIVERY_CHANNEL_CONCURRENCY", cast=int, default=2)
+DELIVERY_MAX_IN_FLIGHT = lazy("DELIVERY_MAX_IN_FLIGHT", cast=int, default=200)
+DELIVERY_MAX_ATTEMPTS = lazy("DELIVERY_MAX_ATTEMPTS", cast=int, default=6)
+DELIVERY_BACKOFF_SECONDS = lazy("DELIVERY_BACKOFF_SECONDS", cast=float, default=1.0)
+DELIVERY_BATCH_WINDOW_MS = lazy("DELIVERY_BATCH_WINDOW_MS", cast=int, default=2000)
+DELIVERY_BATCH_MAX_CHARS = lazy("DELIVERY_BATCH_MAX_CHARS", cast=int, default=4000)
+DELIVERY_CLAIM_IDLE_MS = lazy("DELIVERY_CLAIM_IDLE_MS", cast=int, default=5 * 60_000)
+
+POSTGRES_USER = lazy("POSTGRES_USER", cast=str)
+POSTGRES_PASSWORD = lazy("POSTGRES_PASSWORD", cast=Secret)
+POSTGRES_SERVER = lazy("POSTGRES_HOST", cast=str)
+POSTGRES_PORT = lazy("POSTGRES_PORT", cast=str, default="5432")
+POSTGRES_DB = lazy("POSTGRES_DB", cast=str)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# Per-process (per event loop) pool size, and how long a pooled connection may idle before it is pinged
+REDIS_MAX_CONNECTIONS = lazy("REDIS_MAX_CONNECTIONS", cast=int, default=50)
+REDIS_HEALTH_CHECK_SECONDS = lazy("REDIS_HEALTH_CHECK_SECONDS", cast=int, default=30)
+
+# Conversation affinity: this instance's id and every instance on the hash ring
+INSTANCE_ID = _Lazy(lambda: config("INSTANCE_ID", cast=str, default=socket.gethostname()))
+AFFINITY_NODES = lazy("AFFINITY_NODES", cast=str, default="")
+AFFINITY_VNODES = lazy("AFFINITY_VNODES", cast=int, default=128)
+
+db_url = _Lazy(_db_url)
+
+DATABASE_URL = _Lazy(_database_url)
+
+# Read replicas for repository get_* methods: comma-separated URLs, each optionally ending in
+# "|weight". Replicas are health-checked every DATABASE_REPLICA_CHECK_SECONDS and skipped while
+# unreachable or lagging more than DATABASE_REPLICA_MAX_LAG_SECONDS. After a write, that
+# user's reads stay on the primary for READ_AFTER_WRITE_SECONDS.
+DATABASE_REPLICA_URLS = lazy("DATABASE_REPLICA_URLS", cast=str, default="")
+DATABASE_REPLICA_CHECK_SECONDS = lazy("DATABASE_REPLICA_CHECK_SECONDS", cast=float, default=5.0)
+DATABASE_REPLICA_MAX_LAG_SECONDS = lazy("DATABASE_REPLICA_MAX_LAG_SECONDS", cast=float, default=10.0)
+READ_AFTER_WRITE_SECONDS = lazy("READ_AFTER_WRITE_SECONDS", cast=float, default=5.0)
+
+GEMINI_API_KEY = lazy("GEMINI_API_KEY", cast=str)
+GEMINI_MODEL = lazy("GEMINI_MODEL", cast=str, default="gemini-2.5-flash")
+# "gemini", or "fake" for load tests: a stand-in model that sleeps for
+# FAKE_LLM_LATENCY_SECONDS plus FAKE_LLM_OUTPUT_TOKENS / FAKE_LLM_TOKENS_PER_SECOND
+LLM_PROVIDER = lazy("LLM_PROVIDER", cast=str, default="gemini")
+FAKE_LLM_LATENCY_SECONDS = lazy("FAKE_LLM_LATENCY_SECONDS", cast=float, default=0.5)
+FAKE_LLM_TOKENS_PER_SECOND = lazy("FAKE_LLM_TOKENS_PER_SECOND", cast=float, default=100.0)
+FAKE_LLM_OUTPUT_TOKENS = lazy("FAKE_LLM_OUTPUT_TOKENS", cast=int, default=150)
+
+# Static prompt prefixes (system prompt + user profile) are reused across turns;
+# prefixes at least PROMPT_CACHE_MIN_CHARS long also use Gemini context caching
+PROMPT_CACHE_MIN_CHARS = lazy("PROMPT_CACHE_MIN_CHARS", cast=int, default=16000)
+PROMPT_CACHE_TTL_SECONDS = lazy("PROMPT_CACHE_TTL_SECONDS", cast=int, default=3600)
+PROMPT_PREFIX_CACHE_SIZE = lazy("PROMPT_PREFIX_CACHE_SIZE", cast=int, default=256)
+
+# A2A file parts: size cap per attachment, bytes kept in memory before spilling to disk,
+# and how long an uploaded file is reused (Gemini keeps uploads for 48 hours)
+ATTACHMENT_MAX_BYTES = lazy("ATTACHMENT_MAX_BYTES", cast=int, default=20 * 1024 * 1024)
+ATTACHMENT_MAX_COUNT = lazy("ATTACHMENT_MAX_COUNT", cast=int, default=5)
+ATTACHMENT_SPOOL_BYTES = lazy("ATTACHMENT_SPOOL_BYTES", cast=int, default=1024 * 1024)
+ATTACHMENT_UPLOAD_TTL_SECONDS = lazy("ATTACHMENT_UPLOAD_TTL_SECONDS", cast=int, default=47 * 60 * 60)
+
+ACCESS_TOKEN_EXPIRE_MINS = lazy("ACCESS_TOKEN_EXPIRE_MINS", cast=int, default=30)
+JWT_TOKEN_ALGORITHM = lazy("JWT_TOKEN_ALGORITHM", cast=str, default="HS256")
+JWT_TOKEN_SECRET_KEY = lazy("JWT_TOKEN_SECRET_KEY", cast=str)
+
+
+_pending = {name: value for name, value in globals().items() if isinstance(value, _Lazy)}
+for _name in _pending:
+    del globals()[_name]
 
-db_url = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
-DATABASE_URL = config(
-    "DATABASE_URL",
-    cast=DatabaseURL,
-    default=db_url
-)
+# re-entrant: resolving DATABASE_URL resolves the POSTGRES_* settings it is built from
+_resolving = threading.RLock()
 
-GEMINI_API_KEY=config("GEMINI_API_KEY", cast=str)
 
-ACCESS_TOKEN_EXPIRE_MINS = config("ACCESS_TOKEN_EXPIRE_MINS", cast=int, default=30)
-JWT_TOKEN_ALGORITHM = config("JWT_TOKEN_ALGORITHM", cast=str, default="HS256")
-JWT_TOKEN_SECRET_KEY = config("JWT_TOKEN_SECRET_KEY", cast=str)
+def __getattr__(name: str) -> Any:
+    with _resolving:
+        # another thread may have resolved it while this one waited
+        if name in globals():
+            return globals()[name]
+        if name not in _pending:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        value = _pending[name].resolve()
+        globals()[name] = value
+        del _pending[name]
+        return value
@@ -1,15 +1,110 @@
 """
 Centralized logging layer for the application
+
+Records are handed to a bounded in-memory queue and written to stdout by a
+background thread, so request handlers never block on log I/O. Hot-path events
+can be sampled, either per call with `extra={"sample_rate": 0.01}` or through
+the LOG_SAMPLE_RATES setting keyed by event name or message template.
 """
 
+import atexit
+import json
 import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+from agent.core.config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, dict):
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of sub-WARNING records for configured hot-path events."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            key = record.msg.get("event") if isinstance(record.msg, dict) else record.msg
+            rate = self.rates.get(key) if isinstance(key, str) else None
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueue records untouched and drop them when the queue is full.
+
+    The stock QueueHandler formats every record on the calling thread; here
+    all formatting happens on the listener thread instead.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
 
 class LogHandler:
     logger = logging.getLogger("A2A-Coach")
-    logger.setLevel(logging.DEBUG)
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(levelname)s:     %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-    handler.setFormatter(formatter)
+    logger.setLevel(LOG_LEVEL.upper())
+    logger.propagate = False
+
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(records)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
     logger.addHandler(handler)
 
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(levelname)s:     %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+
+    listener = QueueListener(records, output, respect_handler_level=True)
+
+    @classmethod
+    def restart_in_child(cls) -> None:
+        # A forked child (e.g. an RQ work horse) inherits the parent's queue, possibly
+        # with its lock held or records the parent will also write, but no listener thread.
+        cls.records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        cls.handler.queue = cls.records
+        cls.listener.queue = cls.records
+        cls.listener._thread = None
+        cls.listener.start()
+
+
+LogHandler.listener.start()
+atexit.register(LogHandler.listener.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=LogHandler.restart_in_child)
+
 logger = LogHandler.logger
@@ -0,0 +1,253 @@
+"""
+In-process metrics in the Prometheus text format, plus per-request Server-Timing
+
+Each worker process keeps its own registry. Workers started by one uvicorn
+process share its port, so a scrape is answered by whichever worker accepts
+the connection and shows only that worker's numbers.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    """A gauge whose values are read from `collect` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, *args, collect: Optional[Callable[[], Dict[Tuple, float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        if self.collect:
+            values.update(self.collect())
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # per label set: one counter per bucket, then sum and count
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, state in self._values.items():
+            for bound, count in zip(self.buckets, state):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self.metrics) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "a2a_http_request_duration_seconds", "HTTP request latency by route and JSON-RPC method",
+    ("route", "rpc_method", "status")
+))
+llm_request_duration = registry.register(Histogram(
+    "a2a_llm_request_duration_seconds", "LLM call latency by model and outcome", ("model", "outcome")
+))
+llm_tokens = registry.register(Counter(
+    "a2a_llm_tokens_total", "LLM tokens by model and direction", ("model", "direction")
+))
+db_query_duration = registry.register(Histogram(
+    "a2a_db_query_duration_seconds", "Repository query latency by query name", ("query",)
+))
+cache_requests = registry.register(Counter(
+    "a2a_cache_requests_total", "Cache lookups by cache and result (hit/miss/coalesced)", ("cache", "result")
+))
+queue_depth = registry.register(Gauge(
+    "a2a_queue_depth", "Jobs waiting in a background queue", ("queue",)
+))
+redis_command_duration = registry.register(Histogram(
+    "a2a_redis_command_duration_seconds", "Redis latency by command, script name or pipeline", ("command",)
+))
+redis_connections = registry.register(Gauge(
+    "a2a_redis_connections", "Connections in this process's Redis pools by state", ("state",)
+))
+redis_up = registry.register(Gauge(
+    "a2a_redis_up", "1 when Redis answered a PING at the last scrape", ()
+))
+db_reads = registry.register(Counter(
+    "a2a_db_reads_total", "Repository reads by where they were routed (primary/replica)", ("target",)
+))
+db_replica_lag = registry.register(Gauge(
+    "a2a_db_replica_lag_seconds", "Replication lag of each read replica at its last health check", ("replica",)
+))
+db_replica_healthy = registry.register(Gauge(
+    "a2a_db_replica_healthy", "1 while a read replica is receiving reads", ("replica",)
+))
+telex_deliveries = registry.register(Counter(
+    "a2a_telex_deliveries_total", "Background result posts to Telex by outcome (delivered/retry/dead_letter)",
+    ("outcome",)
+))
+
+
+# Server-Timing: per-request totals of named phases (llm, db, ...)
+_timings: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar(
+    "server_timings", default=None
+)
+_request_labels: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "request_labels", default=None
+)
+
+
+def record_timing(name: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.setdefault(name, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += 1
+
+
+def label_request(**labels) -> None:
+    """Attach labels (e.g. rpc_method) to the current request's latency sample."""
+    current = _request_labels.get()
+    if current is not None:
+        current.update(labels)
+
+
+def server_timing_header(timings: Dict[str, List[float]], total: float) -> str:
+    parts = [
+        f'{name};dur={spent * 1000:.1f};desc="{count}x"' for name, (spent, count) in timings.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route and RPC method, and
+    adding a Server-Timing header with the time spent in each named phase.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: Dict[str, List[float]] = {}
+        labels: dict = {}
+        timings_token = _timings.set(timings)
+        labels_token = _request_labels.set(labels)
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                rpc_method=labels.get("rpc_method", ""),
+                status=status[0],
+            )
+            _timings.reset(timings_token)
+            _request_labels.reset(labels_token)
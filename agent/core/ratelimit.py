@@ -0,0 +1,138 @@
+"""
+Distributed token-bucket rate limiting backed by Redis
+"""
+
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from agent.core.config import RATE_LIMIT_ENABLED, RATE_LIMIT_TIERS, RATE_LIMIT_TIER_MEMBERS
+from agent.core.logger import logger
+from agent.db.redis_client import RedisScript
+
+# Checks every bucket in KEYS and only takes tokens when all of them allow it,
+# so a sender is never charged for a request its channel refused.
+# ARGV holds "capacity, refill-per-second" pairs matching KEYS, then the cost.
+TOKEN_BUCKET_SCRIPT = RedisScript("token_bucket", """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = tonumber(ARGV[#ARGV])
+local levels = {}
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local refill = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+    levels[i] = tokens
+    if tokens < cost then
+        retry_after = math.max(retry_after, (cost - tokens) / refill)
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local refill = tonumber(ARGV[i * 2])
+    local tokens = levels[i]
+    if retry_after == 0 then
+        tokens = tokens - cost
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / refill * 1000))
+end
+
+if retry_after == 0 then
+    return {1, '0'}
+end
+return {0, tostring(retry_after)}
+""")
+
+
+def parse_tiers(raw: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse "default=30/0.5,pro=120/2" into {tier: (capacity, refill per second)}.
+
+    Raises ValueError for a malformed entry, a non-positive capacity or refill
+    (the bucket would never refill and its expiry divides by the refill), or
+    when there is no "default" tier for unlisted senders and channels.
+    """
+    tiers = {}
+    for entry in filter(None, (e.strip() for e in raw.split(","))):
+        try:
+            name, limits = entry.split("=", 1)
+            capacity, refill = (float(v) for v in limits.split("/", 1))
+        except ValueError as e:
+            raise ValueError(f"Invalid rate limit tier {entry!r}, expected name=capacity/refill") from e
+        if capacity <= 0 or refill <= 0:
+            raise ValueError(f"Rate limit tier {entry!r} needs a positive capacity and refill")
+        tiers[name.strip()] = (capacity, refill)
+    if "default" not in tiers:
+        raise ValueError("RATE_LIMIT_TIERS must define a \"default\" tier")
+    return tiers
+
+
+def parse_members(raw: str, tiers: Dict[str, Tuple[float, float]]) -> Dict[str, str]:
+    """Parse "channel_abc=pro,telex-user-001=pro" into {sender or channel: tier}, each tier one of `tiers`."""
+    members = {}
+    for entry in filter(None, (e.strip() for e in raw.split(","))):
+        key, _, tier = entry.partition("=")
+        if tier.strip() not in tiers:
+            raise ValueError(f"Rate limit member {entry!r} names an unknown tier")
+        members[key.strip()] = tier.strip()
+    return members
+
+
+class TokenBucketLimiter:
+    def __init__(self, tiers: Dict[str, Tuple[float, float]], members: Dict[str, str]):
+        self.tiers = tiers
+        self.members = members
+
+    def limits_for(self, identity: str) -> Tuple[float, float]:
+        return self.tiers[self.members.get(identity, "default")]
+
+    async def acquire(self, redis_, identities: Dict[str, Optional[str]], cost: int = 1) -> float:
+        """
+        Take `cost` tokens from each identity's bucket in one atomic call.
+
+        `identities` maps a scope ("sender", "channel") to its id; empty ids are
+        skipped. Returns 0 when allowed, otherwise the seconds until a retry can
+        succeed. Fails open when Redis is unavailable.
+        """
+        keys: List[str] = []
+        args: List[float] = []
+        for scope, identity in identities.items():
+            if not identity:
+                continue
+            capacity, refill = self.limits_for(identity)
+            keys.append(f"ratelimit:{scope}:{identity}")
+            args.extend((capacity, refill))
+
+        if not keys or redis_ is None:
+            return 0
+
+        try:
+            allowed, retry_after = await TOKEN_BUCKET_SCRIPT(redis_, keys, [*args, cost])
+        except Exception as e:
+            logger.error("Rate limiter unavailable, allowing request. Error: %s", e)
+            return 0
+
+        return 0 if int(allowed) else float(retry_after)
+
+
+_tiers = parse_tiers(RATE_LIMIT_TIERS)
+limiter = TokenBucketLimiter(_tiers, parse_members(RATE_LIMIT_TIER_MEMBERS, _tiers))
+
+
+async def enforce_rate_limit(redis_, sender: Optional[str] = None, channel_id: Optional[str] = None) -> None:
+    if not RATE_LIMIT_ENABLED:
+        return
+
+    retry_after = await limiter.acquire(redis_, {"sender": sender, "channel": channel_id})
+    if retry_after:
+        logger.warning({"event": "rate_limited", "sender": sender, "channel_id": channel_id})
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
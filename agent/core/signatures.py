@@ -0,0 +1,154 @@
+"""
+HMAC signature checks for signed A2A routes
+
+SignatureMiddleware reads the request body once, verifies X-A2A-Signature over
+timestamp + body (see `verify_a2a_signature`), and replays the buffered bytes to
+the route, so handlers read the body as usual without a second pass over the
+socket. Bodies over A2A_MAX_BODY_BYTES are refused with 413 before they are
+buffered in full, with or without a signing secret, so a route never parses an
+unbounded body. A signature is accepted once: seen signatures are kept in buckets keyed
+by their timestamp, in Redis when it is connected and in memory otherwise, and a
+bucket expires once every timestamp in it is outside the tolerance window.
+"""
+
+import time
+from typing import Dict, Iterable, Optional, Set
+from starlette.responses import JSONResponse
+from agent.core.config import (
+    A2A_MAX_BODY_BYTES, A2A_NONCE_BUCKET_SECONDS, A2A_NONCE_CACHE_SIZE, A2A_SIGNATURE_TOLERANCE_SECONDS
+)
+from agent.core.logger import logger
+from agent.core.tracing import span
+from agent.core.utils import verify_a2a_signature
+
+NONCE_KEY = "a2a:nonces:{bucket}"
+
+
+class NonceCache:
+    """Signatures seen within the tolerance window, bounded to `max_entries`."""
+
+    def __init__(self, tolerance_seconds: int, bucket_seconds: int, max_entries: int):
+        self.tolerance_seconds = tolerance_seconds
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.max_entries = max_entries
+        self._buckets: Dict[int, Set[str]] = {}
+        self._size = 0
+
+    def bucket(self, timestamp: int) -> int:
+        return timestamp // self.bucket_seconds
+
+    def expires_at(self, bucket: int) -> int:
+        """When the newest timestamp the bucket can hold falls out of the window."""
+        return (bucket + 1) * self.bucket_seconds + self.tolerance_seconds
+
+    def _expire(self, now: float) -> None:
+        for bucket in [b for b in self._buckets if self.expires_at(b) < now]:
+            self._size -= len(self._buckets.pop(bucket))
+
+    def add(self, timestamp: int, nonce: str) -> Optional[bool]:
+        """True if the nonce is new, False if it was seen, None if the cache is full."""
+        self._expire(time.time())
+        seen = self._buckets.setdefault(self.bucket(timestamp), set())
+        if nonce in seen:
+            return False
+        if self._size >= self.max_entries:
+            return None
+        seen.add(nonce)
+        self._size += 1
+        return True
+
+    async def add_shared(self, redis_, timestamp: int, nonce: str) -> bool:
+        """`add` across every worker process: one Redis set per bucket, expiring on its own."""
+        bucket = self.bucket(timestamp)
+        key = NONCE_KEY.format(bucket=bucket)
+        async with redis_.pipeline(transaction=True) as pipe:
+            pipe.sadd(key, nonce)
+            pipe.expireat(key, self.expires_at(bucket))
+            added, _ = await pipe.execute()
+        return bool(added)
+
+
+def _reject(status_code: int, detail: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content=detail, headers=headers)
+
+
+class SignatureMiddleware:
+    """ASGI middleware rejecting oversized, unsigned, stale or replayed POSTs to `paths`."""
+
+    def __init__(self, app, paths: Iterable[str], secret: Optional[str], max_body_bytes: int = A2A_MAX_BODY_BYTES):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.secret = secret
+        self.max_body_bytes = max_body_bytes
+        self.nonces = NonceCache(A2A_SIGNATURE_TOLERANCE_SECONDS, A2A_NONCE_BUCKET_SECONDS, A2A_NONCE_CACHE_SIZE)
+        if not secret:
+            logger.warning("A2A_SIGNING_SECRET is not set; A2A requests are not signature-checked")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = _reject(413, "Request body too large")
+        content_length = dict(scope.get("headers") or []).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        chunks, size = [], 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                await too_large(scope, receive, send)
+                return
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        # without a secret only the size limit applies
+        response = await self.check(scope, body) if self.secret else None
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        replayed = False
+
+        async def receive_buffered():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, receive_buffered, send)
+
+    async def check(self, scope, body: bytes) -> Optional[JSONResponse]:
+        """None when the request is signed, fresh and unseen, otherwise the rejection."""
+        headers = dict(scope.get("headers") or [])
+        timestamp = headers.get(b"x-a2a-timestamp", b"").decode("latin-1")
+        signature = headers.get(b"x-a2a-signature", b"").decode("latin-1")
+
+        with span("a2a.verify_signature"):
+            if not timestamp or not signature:
+                return _reject(401, "Missing A2A signature")
+            if not verify_a2a_signature(body, timestamp, signature, self.secret, A2A_SIGNATURE_TOLERANCE_SECONDS):
+                return _reject(401, "Invalid A2A signature")
+
+            redis_ = getattr(scope["app"].state, "_redis", None)
+            try:
+                added = await self.nonces.add_shared(redis_, int(timestamp), signature) if redis_ else None
+            except Exception as e:
+                logger.warning("Redis nonce check failed, using this process's cache: %s", e)
+                redis_ = None
+            if redis_ is None:
+                added = self.nonces.add(int(timestamp), signature)
+                if added is None:
+                    return _reject(503, "Too many signed requests", {"Retry-After": str(self.nonces.bucket_seconds)})
+            if not added:
+                return _reject(409, "Replayed A2A request")
+        return None
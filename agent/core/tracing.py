@@ -0,0 +1,376 @@
+"""
+Lightweight request tracing
+
+Spans are recorded for every request while tracing is enabled, buffered per
+trace, and exported when the trace's local root ends if it was head-sampled
+(TRACE_SAMPLE_RATE), errored, or ran longer than TRACE_SLOW_MS. Export is
+OTLP/JSON: one ExportTraceServiceRequest per line in TRACE_EXPORT_PATH and/or
+POSTed to an OTLP/HTTP collector at TRACE_OTLP_ENDPOINT.
+
+Context crosses process boundaries as a W3C `traceparent` string: read from
+the incoming HTTP header and carried in RQ job meta into the worker.
+
+    python -m agent.core.tracing traces.jsonl --slowest 5
+
+prints the critical path of the slowest exported traces.
+"""
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from agent.core.config import (
+    PROJECT_NAME, TRACE_EXPORT_PATH, TRACE_MAX_SPANS, TRACE_OTLP_ENDPOINT, TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+)
+from agent.core.logger import logger
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+class _Trace:
+    __slots__ = ("trace_id", "sampled", "spans", "dropped", "flushed", "kept")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.flushed = False
+        self.kept = False
+
+
+class Span:
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "is_root")
+
+    def __init__(self, name: str, trace: _Trace, parent_id: Optional[str], is_root: bool, attributes: dict):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.is_root = is_root
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.is_root and self.parent_id is None else 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+@lru_cache(maxsize=None)
+def enabled() -> bool:
+    return bool(TRACE_EXPORT_PATH or TRACE_OTLP_ENDPOINT)
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def current_traceparent() -> Optional[str]:
+    """The active span as a W3C traceparent, for handing to another process."""
+    active = _current.get()
+    if active is None:
+        return None
+    return f"00-{active.trace.trace_id}-{active.span_id}-{'01' if active.trace.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], sampled)
+
+
+@contextmanager
+def span(name: str, parent: Optional[SpanContext] = None, **attributes) -> Iterator:
+    """
+    Record `name` as a child of the active span, or start a local root when
+    there is none (continuing `parent` if given). Yields a span with `set()`.
+    """
+    if not enabled():
+        yield NOOP_SPAN
+        return
+
+    active = _current.get()
+    if active is not None and parent is None:
+        trace, parent_id, is_root = active.trace, active.span_id, False
+    elif parent is not None:
+        trace, parent_id, is_root = _Trace(parent.trace_id, parent.sampled), parent.span_id, True
+    else:
+        trace, parent_id, is_root = _Trace(os.urandom(16).hex(), random.random() < TRACE_SAMPLE_RATE), None, True
+
+    new = Span(name, trace, parent_id, is_root, attributes)
+    token = _current.set(new)
+    try:
+        yield new
+    except BaseException as e:
+        new.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        new.end_ns = time.time_ns()
+        _finish(new)
+
+
+def traced(name: str):
+    """Decorator: run an async function inside a span called `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _finish(finished: Span) -> None:
+    trace = finished.trace
+    if trace.flushed:
+        # ended after its root (e.g. a shielded LLM call); follow the root's decision
+        if trace.kept:
+            exporter.submit([finished])
+        return
+
+    if len(trace.spans) < TRACE_MAX_SPANS:
+        trace.spans.append(finished)
+    else:
+        trace.dropped += 1
+
+    if not finished.is_root:
+        return
+
+    trace.flushed = True
+    slow = (finished.end_ns - finished.start_ns) / 1e6 >= TRACE_SLOW_MS
+    trace.kept = trace.sampled or slow or any(s.error for s in trace.spans)
+    if trace.kept:
+        if trace.dropped:
+            finished.set(dropped_spans=trace.dropped)
+        exporter.submit(trace.spans)
+    trace.spans = []
+
+
+class SpanExporter:
+    """Writes finished spans from a background thread, batched, never blocking callers."""
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 512, interval: float = 1.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._pid = None
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        # started lazily and again in forked children (RQ work horses), which inherit no thread
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, spans: List[Span]) -> None:
+        self._ensure_started()
+        self._idle.clear()
+        for s in spans:
+            try:
+                self._queue.put_nowait(s)
+            except queue.Full:
+                self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until queued spans are written; call before a process exits without atexit."""
+        if self._pid == os.getpid():
+            self._idle.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Span] = []
+            try:
+                batch.append(self._queue.get(timeout=self.interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._export(batch)
+            if self._queue.empty():
+                self._idle.set()
+
+    def _export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": PROJECT_NAME}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                ]},
+                "scopeSpans": [{"scope": {"name": "agent.core.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+            }]
+        }
+        body = json.dumps(payload, default=str)
+        try:
+            if TRACE_EXPORT_PATH:
+                with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            if TRACE_OTLP_ENDPOINT:
+                import httpx
+
+                httpx.post(
+                    TRACE_OTLP_ENDPOINT, content=body, headers={"Content-Type": "application/json"}, timeout=5
+                )
+        except Exception as e:
+            logger.warning("Could not export %s spans. Error: %s", len(spans), e)
+
+
+exporter = SpanExporter()
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+
+        with span(f"{scope['method']} {scope['path']}", parent=parent, http_method=scope["method"]) as root:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    root.set(http_status=message["status"])
+                    if message["status"] >= 500:
+                        root.error = f"HTTP {message['status']}"
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+
+
+def _load_spans(path: str) -> Dict[str, List[dict]]:
+    traces: Dict[str, List[dict]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for s in scope.get("spans", []):
+                        traces.setdefault(s["traceId"], []).append(s)
+    return traces
+
+
+def critical_path(spans: List[dict]) -> List[dict]:
+    """
+    Follow the root down through the child that finished last at each level,
+    i.e. the chain of spans the request was actually waiting on.
+    """
+    by_id = {s["spanId"]: s for s in spans}
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in spans:
+        parent = s.get("parentSpanId")
+        children.setdefault(parent if parent in by_id else None, []).append(s)
+
+    roots = children.get(None, [])
+    if not roots:
+        return []
+    node = max(roots, key=lambda s: int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"]))
+    path = [node]
+    while True:
+        # children that outlive their parent (queued jobs, late replies) were not waited on
+        end = int(node["endTimeUnixNano"])
+        awaited = [c for c in children.get(node["spanId"], []) if int(c["endTimeUnixNano"]) <= end]
+        if not awaited:
+            return path
+        node = max(awaited, key=lambda s: int(s["endTimeUnixNano"]))
+        path.append(node)
+
+
+def _ms(s: dict) -> float:
+    return (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Critical paths of the slowest exported traces")
+    parser.add_argument("path", help="JSONL file written through TRACE_EXPORT_PATH")
+    parser.add_argument("--slowest", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    traces = _load_spans(args.path)
+    ranked = sorted(traces.items(), key=lambda t: max(_ms(s) for s in t[1]), reverse=True)
+    for trace_id, spans in ranked[:args.slowest]:
+        path = critical_path(spans)
+        if not path:
+            continue
+        print(f"trace {trace_id}  {_ms(path[0]):.1f} ms  ({len(spans)} spans)")
+        for depth, s in enumerate(path):
+            error = " [error]" if s.get("status", {}).get("code") == 2 else ""
+            print(f"  {'  ' * depth}{s['name']}  {_ms(s):.1f} ms{error}")
+
+
+if __name__ == "__main__":
+    main()
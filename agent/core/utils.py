@@ -15,7 +15,7 @@ def verify_a2a_signature(body_bytes: bytes, timestamp: str, signature: str, secr
 
     This function checks timestamp tolerance to prevent replay attacks.
     """
-    logger.info({"event": "verifying_signature", "timestamp": timestamp, "signature": signature})
+    logger.info({"event": "verifying_signature", "timestamp": timestamp})
     if not secret:
         return False
 
@@ -32,7 +32,8 @@ def verify_a2a_signature(body_bytes: bytes, timestamp: str, signature: str, secr
     msg = timestamp.encode("utf-8") + body_bytes
     expected = hmac.new(secret.encode("utf-8"), msg, hashlib.sha256).hexdigest()
 
-    return hmac.compare_digest(expected, signature)
+    # compare bytes: compare_digest raises TypeError on non-ASCII str, and the header is client-controlled
+    return hmac.compare_digest(expected.encode("ascii"), signature.encode("utf-8"))
 
 
 def short_plan_from_prompt(user_text: str) -> str:
@@ -1,27 +1,226 @@
+import asyncio
+import threading
+import uuid
+from datetime import timedelta
+from typing import Optional
 import redis
 from rq import Queue
-from agent.core.config import REDIS_URL
+from agent.core.affinity import ring
+from agent.core.config import (
+    REDIS_URL, NEXT_STEP_INTERVAL_SECONDS, INSTANCE_ID, MESSAGE_ARCHIVE_DIR,
+    MESSAGE_PARTITION_INTERVAL_SECONDS, MESSAGE_PARTITIONS_AHEAD, MESSAGE_RETENTION_MONTHS
+)
 from agent.core.logger import logger
-from agent.services.agent import run_gemini
+from agent.core.tracing import current_traceparent, exporter, parse_traceparent, span
+from agent.db.redis_client import close_client, get_client
+from agent.db.tasks import create_database
+from agent.services.agent import FallbackReply, run_gemini
+from agent.services.delivery import Deliverer, close_telex_client, publish_delivery
+from agent.services.next_steps import precompute_next_steps
+from agent.services.partitions import archive_message_partitions, ensure_message_partitions
+from agent.services.progress import consume_progress
 
+# RQ only speaks the sync client; everything the jobs themselves do goes through get_client()
 redis_conn = redis.from_url(REDIS_URL)
 queue = Queue("telex_tasks", connection=redis_conn)
 
 
-def long_coach_task(user_input: str):
-    """Long-running background analysis that calls the LLM (sync wrapper)."""
-    logger.info({"event": "background_coaching", "user_input": user_input})
+def node_queue(node: str) -> Queue:
+    return Queue(f"telex_tasks:{node}", connection=redis_conn)
+
+
+def enqueue_for(key: str, func, *args, **kwargs):
+    """
+    Enqueue a job on the worker that owns `key` on the hash ring, so every job
+    for one conversation lands in the same process and finds its state warm.
+    """
+    node = ring.node_for(key) if key else None
+    target = node_queue(node) if node else queue
+    traceparent = current_traceparent()
+    if traceparent:
+        kwargs["meta"] = {**kwargs.get("meta", {}), "traceparent": traceparent}
+    return target.enqueue(func, *args, **kwargs)
+
+
+def job_trace_parent():
+    """The span context of whoever enqueued the running job, if it was traced."""
+    from rq import get_current_job
+
+    job = get_current_job()
+    return parse_traceparent(job.meta.get("traceparent")) if job else None
+
+
+BACKGROUND_FAILED_NOTICE = "Sorry, the coach could not finish this request. Please try again later."
+BACKGROUND_DEGRADED_NOTICE = "The coach is unavailable right now, so this is a short template plan instead:"
+
+
+async def _long_coach(user_input: str, channel_id: Optional[str]) -> str:
     try:
-        result = run_gemini(user_input)
+        result = await run_gemini(user_input)
+    except Exception as e:
+        logger.exception(e)
+        result, message, status = f"Background task failed: {e}", BACKGROUND_FAILED_NOTICE, "error"
+    else:
+        message, status = result, "success"
+        if isinstance(result, FallbackReply):
+            message = f"{BACKGROUND_DEGRADED_NOTICE}\n\n{result}"
+    if channel_id:
+        try:
+            await publish_delivery(get_client(), channel_id, message, status)
+        finally:
+            await close_client()
+    return result
+
+
+def long_coach_task(user_input: str, channel_id: Optional[str] = None):
+    """
+    Long-running background analysis that calls the LLM (sync wrapper). With a
+    channel_id the result is queued for delivery to that Telex channel.
+    """
+    logger.info({"event": "background_coaching", "user_input": user_input, "channel_id": channel_id})
+    try:
+        with span("worker.long_coach_task", parent=job_trace_parent()):
+            result = asyncio.run(_long_coach(user_input, channel_id))
     except Exception as e:
         result = f"Background task failed: {e}"
-    logger.info("[worker] background coaching result:\n", result)
+    finally:
+        # work horses exit without running atexit hooks
+        exporter.flush()
+    logger.info("[worker] background coaching result:\n%s", result)
     return result
 
 
+PERIODIC_LEASE_KEY = "periodic:{name}"
+
+
+def schedule_periodic(name: str, func: str, interval: int, delay_seconds: int) -> None:
+    """
+    Schedule the next run of a periodic job under a fresh job id. Reusing one id
+    would let RQ expire the finished run's key and drop the scheduled entry with it.
+    """
+    queue.enqueue_in(
+        timedelta(seconds=delay_seconds),
+        func,
+        job_id=f"{name}:{uuid.uuid4().hex}",
+        job_timeout=interval,
+    )
+
+
+def start_period(name: str, func: str, interval: int) -> bool:
+    """
+    Claim this interval's run and schedule the next one before doing any work,
+    so a run that crashes or hits job_timeout does not end the chain. Every
+    worker start begins a chain; a run that finds the interval already claimed
+    returns False and ends its chain, leaving one.
+    """
+    lease = max(1, int(interval * 0.9))
+    if not redis_conn.set(PERIODIC_LEASE_KEY.format(name=name), INSTANCE_ID, nx=True, ex=lease):
+        logger.info({"event": "periodic_job_already_claimed", "job": name})
+        return False
+    schedule_periodic(name, func, interval, interval)
+    return True
+
+
+def schedule_next_step_precompute(delay_seconds: int = NEXT_STEP_INTERVAL_SECONDS):
+    schedule_periodic(
+        "precompute_next_steps", "agent.core.worker.precompute_next_steps_task",
+        NEXT_STEP_INTERVAL_SECONDS, delay_seconds,
+    )
+
+
+async def _precompute_next_steps() -> int:
+    database = create_database(min_size=1, max_size=2)
+    await database.connect()
+    try:
+        return await precompute_next_steps(database, get_client())
+    finally:
+        await database.disconnect()
+        await close_client()
+
+
+def precompute_next_steps_task():
+    """Periodic job: refresh next-step suggestions for active goals."""
+    if not start_period(
+        "precompute_next_steps", "agent.core.worker.precompute_next_steps_task", NEXT_STEP_INTERVAL_SECONDS
+    ):
+        return None
+    logger.info({"event": "precompute_next_steps"})
+    return asyncio.run(_precompute_next_steps())
+
+
+def schedule_message_partitions(delay_seconds: int = MESSAGE_PARTITION_INTERVAL_SECONDS):
+    schedule_periodic(
+        "maintain_message_partitions", "agent.core.worker.maintain_message_partitions_task",
+        MESSAGE_PARTITION_INTERVAL_SECONDS, delay_seconds,
+    )
+
+
+async def _maintain_message_partitions() -> dict:
+    database = create_database(min_size=1, max_size=2)
+    await database.connect()
+    try:
+        created = await ensure_message_partitions(database, MESSAGE_PARTITIONS_AHEAD)
+        archived = await archive_message_partitions(database, MESSAGE_RETENTION_MONTHS, MESSAGE_ARCHIVE_DIR)
+        return {"created": created, "archived": archived}
+    finally:
+        await database.disconnect()
+
+
+def maintain_message_partitions_task():
+    """Periodic job: create upcoming messages partitions and archive expired ones."""
+    if not start_period(
+        "maintain_message_partitions", "agent.core.worker.maintain_message_partitions_task",
+        MESSAGE_PARTITION_INTERVAL_SECONDS,
+    ):
+        return None
+    logger.info({"event": "maintain_message_partitions"})
+    return asyncio.run(_maintain_message_partitions())
+
+
+async def _consume_progress() -> None:
+    database = create_database(min_size=1, max_size=2)
+    await database.connect()
+    try:
+        await consume_progress(database, get_client())
+    finally:
+        await database.disconnect()
+        await close_client()
+
+
+def start_progress_consumer() -> threading.Thread:
+    """Apply progress/update events alongside RQ jobs, on a thread with its own event loop."""
+    thread = threading.Thread(
+        target=asyncio.run, args=(_consume_progress(),), name="progress-consumer", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+async def _deliver_results() -> None:
+    try:
+        await Deliverer(get_client()).run()
+    finally:
+        await close_telex_client()
+        await close_client()
+
+
+def start_delivery_consumer() -> threading.Thread:
+    """Post queued background results to Telex, on a thread with its own event loop."""
+    thread = threading.Thread(
+        target=asyncio.run, args=(_deliver_results(),), name="telex-delivery", daemon=True
+    )
+    thread.start()
+    return thread
+
+
 if __name__ == "__main__":
     from rq import Worker, connections
 
+    schedule_next_step_precompute(delay_seconds=0)
+    schedule_message_partitions(delay_seconds=0)
+    start_progress_consumer()
+    start_delivery_consumer()
+
     with connections.RedisConnection(redis_conn):
-        worker = Worker([queue])
-        worker.work()
\ No newline at end of file
+        worker = Worker([node_queue(INSTANCE_ID), queue])
+        worker.work(with_scheduler=True)
\ No newline at end of file
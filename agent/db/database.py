@@ -2,22 +2,26 @@
 Logic for establishing database connections for the various app repositories
 """
 
-from typing import Callable, Type
-import redis
+from typing import Callable, Optional, Type
 from databases import Database
+from redis import asyncio as redis_asyncio
 from fastapi import Depends
 from starlette.requests import Request
 from agent.db.repositories.base import BaseRepository
 
 
-def get_redis(request: Request) -> redis.Redis:
-    return request.app.state._redis
+def get_redis(request: Request) -> Optional[redis_asyncio.Redis]:
+    return getattr(request.app.state, "_redis", None)
 
 
 def get_database(request: Request) -> Database:
     return request.app.state._db
 
 
+def get_optional_database(request: Request) -> Optional[Database]:
+    return getattr(request.app.state, "_db", None)
+
+
 def get_repository(repo_type: Type[BaseRepository]) -> Callable:
     def get_repo(db: Database = Depends(get_database)) -> Type[BaseRepository]:
         return repo_type(db)
@@ -0,0 +1,174 @@
+"""Add goal progress summaries maintained by triggers
+
+Revision ID: 4b7d2c9e1f30
+Revises: e38d562a01e6
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7d2c9e1f30'
+down_revision: Union[str, Sequence[str], None] = 'e38d562a01e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_goal_progress_table() -> None:
+    op.create_table(
+        "goal_progress",
+        sa.Column("goal_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False, index=True),
+        sa.Column("total_milestones", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed_milestones", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_due_date", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def create_refresh_function() -> None:
+    # Recounts only the given goals, each through the milestones.goal_id index. The rows are
+    # locked first so that concurrent writers to one goal recount in turn, each from a fresh snapshot.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION refresh_goal_progress(goal_ids uuid[])
+            RETURNS void AS
+        $$
+        BEGIN
+            PERFORM 1 FROM goal_progress WHERE goal_id = ANY(goal_ids) ORDER BY goal_id FOR UPDATE;
+
+            INSERT INTO goal_progress AS p (
+                goal_id, user_id, total_milestones, completed_milestones, next_due_date, updated_at
+            )
+            SELECT
+                g.id,
+                g.user_id,
+                count(m.id),
+                count(m.id) FILTER (WHERE m.completed),
+                min(m.due_date) FILTER (WHERE NOT m.completed),
+                now()
+            FROM goals g
+            LEFT JOIN milestones m ON m.goal_id = g.id
+            WHERE g.id = ANY(goal_ids)
+            GROUP BY g.id
+            ON CONFLICT (goal_id) DO UPDATE SET
+                user_id = EXCLUDED.user_id,
+                total_milestones = EXCLUDED.total_milestones,
+                completed_milestones = EXCLUDED.completed_milestones,
+                next_due_date = EXCLUDED.next_due_date,
+                updated_at = EXCLUDED.updated_at;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+
+
+def create_milestone_triggers() -> None:
+    # Statement-level triggers, so a bulk update refreshes each affected goal once
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION goal_progress_on_milestones()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM refresh_goal_progress(ARRAY(SELECT DISTINCT goal_id FROM new_rows));
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM refresh_goal_progress(ARRAY(
+                    SELECT n.goal_id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE n.completed IS DISTINCT FROM o.completed
+                        OR n.due_date IS DISTINCT FROM o.due_date
+                        OR n.goal_id IS DISTINCT FROM o.goal_id
+                    UNION
+                    SELECT o.goal_id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE n.goal_id IS DISTINCT FROM o.goal_id
+                ));
+            ELSE
+                PERFORM refresh_goal_progress(ARRAY(SELECT DISTINCT goal_id FROM old_rows));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER milestones_progress_insert AFTER INSERT ON milestones
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_progress_on_milestones();
+        CREATE TRIGGER milestones_progress_update AFTER UPDATE ON milestones
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_progress_on_milestones();
+        CREATE TRIGGER milestones_progress_delete AFTER DELETE ON milestones
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_progress_on_milestones();
+        """
+    )
+
+
+def create_goal_triggers() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION goal_progress_on_goals()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM refresh_goal_progress(ARRAY(SELECT id FROM new_rows));
+            ELSIF TG_OP = 'UPDATE' THEN
+                UPDATE goal_progress p SET user_id = n.user_id
+                FROM new_rows n
+                WHERE p.goal_id = n.id AND p.user_id IS DISTINCT FROM n.user_id;
+            ELSE
+                DELETE FROM goal_progress p USING old_rows o WHERE p.goal_id = o.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER goals_progress_insert AFTER INSERT ON goals
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_progress_on_goals();
+        CREATE TRIGGER goals_progress_update AFTER UPDATE ON goals
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_progress_on_goals();
+        CREATE TRIGGER goals_progress_delete AFTER DELETE ON goals
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_progress_on_goals();
+        """
+    )
+
+
+def backfill_goal_progress() -> None:
+    op.execute("SELECT refresh_goal_progress(ARRAY(SELECT id FROM goals));")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_goal_progress_table()
+    create_refresh_function()
+    create_milestone_triggers()
+    create_goal_triggers()
+    backfill_goal_progress()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for trigger, table in (
+        ("goals_progress_delete", "goals"), ("goals_progress_update", "goals"), ("goals_progress_insert", "goals"),
+        ("milestones_progress_delete", "milestones"), ("milestones_progress_update", "milestones"),
+        ("milestones_progress_insert", "milestones"),
+    ):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS goal_progress_on_goals();")
+    op.execute("DROP FUNCTION IF EXISTS goal_progress_on_milestones();")
+    op.execute("DROP FUNCTION IF EXISTS refresh_goal_progress(uuid[]);")
+    op.drop_table("goal_progress")
@@ -0,0 +1,57 @@
+"""Add full-text search vectors to messages and goals
+
+Revision ID: 7a1f3c5d9b24
+Revises: 4b7d2c9e1f30
+Create Date: 2026-10-19 11:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1f3c5d9b24'
+down_revision: Union[str, Sequence[str], None] = '4b7d2c9e1f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def add_search_vectors() -> None:
+    # Generated columns are kept current by Postgres itself; adding them rewrites each table once.
+    op.execute(
+        """
+        ALTER TABLE messages ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED;
+        """
+    )
+    op.execute(
+        """
+        ALTER TABLE goals ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'B')
+            ) STORED;
+        """
+    )
+
+
+def create_search_indexes() -> None:
+    # btree_gin lets user_id live in the same GIN index, so a search only visits that user's rows
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin;")
+    op.execute("CREATE INDEX ix_messages_search ON messages USING gin (user_id, search_vector);")
+    op.execute("CREATE INDEX ix_goals_search ON goals USING gin (user_id, search_vector);")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    add_search_vectors()
+    create_search_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_goals_search;")
+    op.execute("DROP INDEX IF EXISTS ix_messages_search;")
+    op.execute("ALTER TABLE goals DROP COLUMN IF EXISTS search_vector;")
+    op.execute("ALTER TABLE messages DROP COLUMN IF EXISTS search_vector;")
@@ -0,0 +1,114 @@
+"""Partition messages by month on created_at
+
+Revision ID: 9c3e5a7b1d42
+Revises: 7a1f3c5d9b24
+Create Date: 2026-10-19 12:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5a7b1d42'
+down_revision: Union[str, Sequence[str], None] = '7a1f3c5d9b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MESSAGE_COLUMNS = "id, user_id, telex_sender_id, text, created_at, updated_at"
+
+
+def message_columns():
+    return (
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("telex_sender_id", sa.String(), nullable=True),
+        sa.Column("text", sa.String(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('english', coalesce(text, ''))", persisted=True),
+        ),
+    )
+
+
+def create_partition_function() -> None:
+    # One partition per UTC month, named messages_YYYY_MM; months that already exist are skipped.
+    # The worker calls this ahead of time so inserts never run past the last partition.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION create_message_partitions(from_month date, to_month date)
+            RETURNS integer AS
+        $$
+        DECLARE
+            first_day date := date_trunc('month', from_month)::date;
+            part_name text;
+            created integer := 0;
+        BEGIN
+            WHILE first_day <= to_month LOOP
+                part_name := format('messages_%s', to_char(first_day, 'YYYY_MM'));
+                IF to_regclass(part_name) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                        part_name,
+                        first_day::timestamp AT TIME ZONE 'UTC',
+                        (first_day + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+                    );
+                    created := created + 1;
+                END IF;
+                first_day := (first_day + interval '1 month')::date;
+            END LOOP;
+            RETURN created;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+
+
+def create_message_indexes() -> None:
+    # (user_id, created_at) serves the newest-first history scan, which walks partitions newest
+    # first and stops at the LIMIT, so it only reads recent months
+    op.create_primary_key("messages_pkey", "messages", ["id", "created_at"])
+    op.create_index("ix_messages_user_id_created_at", "messages", ["user_id", "created_at"])
+    op.execute("CREATE INDEX ix_messages_search ON messages USING gin (user_id, search_vector);")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table("messages_partitioned", *message_columns(), postgresql_partition_by="RANGE (created_at)")
+    op.execute("ALTER TABLE messages RENAME TO messages_unpartitioned;")
+    op.execute("ALTER TABLE messages_partitioned RENAME TO messages;")
+    create_partition_function()
+    op.execute(
+        """
+        SELECT create_message_partitions(
+            CAST(coalesce(min(created_at), now()) AT TIME ZONE 'UTC' AS date),
+            CAST((now() + interval '3 months') AT TIME ZONE 'UTC' AS date)
+        ) FROM messages_unpartitioned;
+        """
+    )
+    op.execute(
+        f"INSERT INTO messages ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM messages_unpartitioned;"
+    )
+    op.drop_table("messages_unpartitioned")
+    create_message_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table("messages_unpartitioned", *message_columns())
+    op.execute(
+        f"INSERT INTO messages_unpartitioned ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM messages;"
+    )
+    op.drop_table("messages")
+    op.execute("DROP FUNCTION IF EXISTS create_message_partitions(date, date);")
+    op.execute("ALTER TABLE messages_unpartitioned RENAME TO messages;")
+    op.create_primary_key("messages_pkey", "messages", ["id"])
+    for column in ("user_id", "created_at", "updated_at"):
+        op.create_index(f"ix_messages_{column}", "messages", [column])
+    op.execute("CREATE INDEX ix_messages_search ON messages USING gin (user_id, search_vector);")
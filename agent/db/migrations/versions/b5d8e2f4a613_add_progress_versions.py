@@ -0,0 +1,32 @@
+"""Add progress_version to goals and milestones
+
+Revision ID: b5d8e2f4a613
+Revises: 9c3e5a7b1d42
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e2f4a613'
+down_revision: Union[str, Sequence[str], None] = '9c3e5a7b1d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The stream position of the last progress/update applied to the row, so a batch
+    # redelivered after a failure cannot overwrite newer updates. A constant default
+    # does not rewrite the tables.
+    op.execute("ALTER TABLE goals ADD COLUMN progress_version bigint NOT NULL DEFAULT 0;")
+    op.execute("ALTER TABLE milestones ADD COLUMN progress_version bigint NOT NULL DEFAULT 0;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE milestones DROP COLUMN IF EXISTS progress_version;")
+    op.execute("ALTER TABLE goals DROP COLUMN IF EXISTS progress_version;")
@@ -109,7 +109,7 @@ def create_milestones_table() -> None:
         sa.Column("goal_id", postgresql.UUID(as_uuid=True), nullable=False, index=True),
         sa.Column("title", sa.String(), nullable=False),
         sa.Column("due_date", sa.DateTime(), nullable=True),
-        sa.Column("completed", sa.Boolean(), nullable=False, server_default=False),
+        sa.Column("completed", sa.Boolean(), nullable=False, server_default=sa.false()),
         *timestamps(indexed=True),
     )
 
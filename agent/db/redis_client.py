@@ -0,0 +1,140 @@
+"""
+The process's Redis client, built on redis.asyncio
+
+Every cache, stream, rate limiter and job helper shares one connection pool per
+event loop (the API has one loop per worker process; the RQ worker runs one per
+job and one for the progress consumer). Commands are timed and traced like
+repository queries; `pipeline()` batches many keys into one round trip and
+`RedisScript` runs Lua by SHA so the script body is not resent on every call.
+"""
+
+import asyncio
+import hashlib
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+from redis import asyncio as redis_asyncio
+from redis.exceptions import NoScriptError
+from agent.core.config import REDIS_URL, REDIS_HEALTH_CHECK_SECONDS, REDIS_MAX_CONNECTIONS
+from agent.core.logger import logger
+from agent.core.metrics import record_timing, redis_command_duration, redis_connections
+from agent.core.tracing import span
+
+# Script SHA -> metric name, filled as RedisScript objects are created
+SCRIPT_NAMES: Dict[str, str] = {}
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, InstrumentedRedis]" = weakref.WeakKeyDictionary()
+
+
+def _command_name(args: Sequence[Any]) -> str:
+    command = str(args[0]).lower() if args else "unknown"
+    if command == "evalsha" and len(args) > 1:
+        return f"script:{SCRIPT_NAMES.get(args[1], 'unnamed')}"
+    return command
+
+
+class InstrumentedRedis(redis_asyncio.Redis):
+    """redis.asyncio.Redis that records every command's latency under its command name."""
+
+    async def execute_command(self, *args, **options):
+        name = _command_name(args)
+        started = time.perf_counter()
+        try:
+            with span(f"redis.{name}", redis_command=name):
+                return await super().execute_command(*args, **options)
+        finally:
+            elapsed = time.perf_counter() - started
+            redis_command_duration.observe(elapsed, command=name)
+            record_timing("redis", elapsed)
+
+
+def get_client() -> InstrumentedRedis:
+    """The shared client for the running event loop; created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = InstrumentedRedis.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            health_check_interval=REDIS_HEALTH_CHECK_SECONDS,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_client() -> None:
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def ping(client: Optional[redis_asyncio.Redis] = None) -> bool:
+    try:
+        return bool(await (client or get_client()).ping())
+    except Exception as e:
+        logger.warning("Redis health check failed: %s", e)
+        return False
+
+
+def pool_connections() -> Dict[tuple, float]:
+    """In-use and idle connections summed over this process's pools, read at scrape time."""
+    in_use = idle = 0
+    for client in list(_clients.values()):
+        pool = client.connection_pool
+        in_use += len(getattr(pool, "_in_use_connections", ()))
+        idle += len(getattr(pool, "_available_connections", ()))
+    return {("in_use",): in_use, ("idle",): idle}
+
+
+redis_connections.collect = pool_connections
+
+
+@asynccontextmanager
+async def pipeline(client: redis_asyncio.Redis, transaction: bool = False) -> AsyncIterator[Any]:
+    """
+    Queue commands on the yielded pipeline; they are sent together in one round
+    trip when the block exits. Results are not returned, use `execute()` yourself
+    inside the block when you need them.
+    """
+    started = time.perf_counter()
+    try:
+        async with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            if pipe.command_stack:
+                await pipe.execute()
+    finally:
+        elapsed = time.perf_counter() - started
+        redis_command_duration.observe(elapsed, command="pipeline")
+        record_timing("redis", elapsed)
+
+
+async def set_many(client: redis_asyncio.Redis, values: Dict[str, Any], ex: Optional[int] = None) -> None:
+    """SET every key (with an optional TTL) in one round trip."""
+    if not values:
+        return
+    async with pipeline(client) as pipe:
+        for key, value in values.items():
+            pipe.set(key, value, ex=ex)
+
+
+async def get_many(client: redis_asyncio.Redis, keys: Iterable[str]) -> List[Optional[bytes]]:
+    keys = list(keys)
+    return await client.mget(keys) if keys else []
+
+
+class RedisScript:
+    """A Lua script called by SHA, loaded into the server on first use or after a flush."""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+        SCRIPT_NAMES[self.sha] = name
+
+    async def __call__(self, client: redis_asyncio.Redis, keys: Sequence[str] = (), args: Sequence[Any] = ()):
+        try:
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            await client.script_load(self.source)
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
@@ -0,0 +1,173 @@
+"""
+Read replicas: weighted, health-checked routing of repository reads
+
+A ReplicatedDatabase stands in for the primary Database (anything it does not
+override goes to the primary), so code that is not replica-aware keeps working.
+Repositories send their get_* queries through `for_read()`, which picks a healthy
+replica by weight unless the current session wrote within READ_AFTER_WRITE_SECONDS.
+A session is a user: /coach and /rpc both key it by users.id (see read_session_key),
+so a write on either path sends that user's reads on both to the primary.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from databases import Database, DatabaseURL
+from agent.core import config
+from agent.core.logger import logger
+from agent.core.metrics import db_reads, db_replica_healthy, db_replica_lag
+
+# 0 on a primary, or on a replica that has replayed everything it received
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+
+USER_ID_BY_TELEX_ID_QUERY = "SELECT id FROM users WHERE telex_user_id = :telex_user_id;"
+
+# Whose reads are being served (a user id or conversation key) and whether a transaction is open
+_session: ContextVar[Optional[str]] = ContextVar("db_session", default=None)
+_pinned: ContextVar[bool] = ContextVar("db_pinned", default=False)
+
+
+def set_read_session(key: Optional[str]) -> None:
+    """Tie this request's queries to `key` for the read-after-write window."""
+    _session.set(str(key) if key else None)
+
+
+class Replica:
+    def __init__(self, url: str, weight: float = 1.0):
+        self.database = Database(url, min_size=1, max_size=10)
+        self.name = DatabaseURL(url).hostname or "replica"
+        self.weight = weight
+        self.healthy = False
+
+
+def parse_replica_urls(value: str) -> List[Replica]:
+    replicas = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        url, _, weight = item.partition("|")
+        replicas.append(Replica(url, float(weight or 1)))
+    return replicas
+
+
+class ReplicatedDatabase:
+    def __init__(self, primary: Database, replicas: List[Replica]):
+        self.primary = primary
+        self.replicas = replicas
+        self._recent_writes: Dict[str, float] = {}
+        # telex_user_id -> users.id; a user's id never changes, so entries never go stale
+        self._user_ids: Dict[str, str] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.primary, name)
+
+    async def connect(self) -> None:
+        await self.primary.connect()
+        for replica in self.replicas:
+            try:
+                await replica.database.connect()
+            except Exception as e:
+                logger.error("Could not connect to read replica %s: %s", replica.name, e)
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._check_health_forever())
+
+    async def disconnect(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+        for replica in self.replicas:
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+        await self.primary.disconnect()
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        # every read inside a transaction must see its writes, so none go to a replica
+        token = _pinned.set(True)
+        try:
+            async with self.primary.transaction(**kwargs) as transaction:
+                yield transaction
+        finally:
+            _pinned.reset(token)
+
+    async def check_health(self) -> None:
+        timeout = config.DATABASE_REPLICA_CHECK_SECONDS
+        for replica in self.replicas:
+            try:
+                if not replica.database.is_connected:
+                    await asyncio.wait_for(replica.database.connect(), timeout)
+                lag = float(await asyncio.wait_for(replica.database.fetch_val(REPLICA_LAG_QUERY), timeout))
+                healthy = lag <= config.DATABASE_REPLICA_MAX_LAG_SECONDS
+                db_replica_lag.set(lag, replica=replica.name)
+            except Exception as e:
+                logger.warning("Read replica %s failed its health check: %s", replica.name, e)
+                healthy = False
+            if healthy != replica.healthy:
+                logger.info("Read replica %s is now %s", replica.name, "healthy" if healthy else "unhealthy")
+            replica.healthy = healthy
+            db_replica_healthy.set(int(healthy), replica=replica.name)
+
+    async def _check_health_forever(self) -> None:
+        while True:
+            await asyncio.sleep(config.DATABASE_REPLICA_CHECK_SECONDS)
+            await self.check_health()
+
+    async def user_id_for(self, telex_user_id: str) -> Optional[str]:
+        """The users.id behind a Telex sender, read once from the primary so new users are found."""
+        if telex_user_id not in self._user_ids:
+            user_id = await self.primary.fetch_val(USER_ID_BY_TELEX_ID_QUERY, values={"telex_user_id": telex_user_id})
+            if user_id is None:
+                return None
+            if len(self._user_ids) > 10_000:
+                self._user_ids.clear()
+            self._user_ids[telex_user_id] = str(user_id)
+        return self._user_ids[telex_user_id]
+
+    def record_write(self) -> None:
+        key = _session.get()
+        if not key:
+            return
+        now = time.monotonic()
+        if len(self._recent_writes) > 10_000:
+            self._recent_writes = {k: v for k, v in self._recent_writes.items() if v > now}
+        self._recent_writes[key] = now + config.READ_AFTER_WRITE_SECONDS
+
+    def for_read(self) -> Database:
+        """A healthy replica chosen by weight, or the primary when read-your-writes applies."""
+        key = _session.get()
+        if _pinned.get() or (key and self._recent_writes.get(key, 0) > time.monotonic()):
+            db_reads.inc(target="primary")
+            return self.primary
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            db_reads.inc(target="primary")
+            return self.primary
+        db_reads.inc(target="replica")
+        return random.choices(healthy, weights=[replica.weight for replica in healthy])[0].database
+
+    def for_write(self) -> Database:
+        self.record_write()
+        return self.primary
+
+
+async def read_session_key(db: Any, user_id: Any = None, telex_user_id: Optional[str] = None) -> Optional[str]:
+    """
+    The per-user read-after-write key: `user_id` when the request carries one,
+    else the id of the user with this Telex sender id. None for unknown senders.
+    """
+    if user_id:
+        return str(user_id)
+    if not telex_user_id or not isinstance(db, ReplicatedDatabase):
+        return None
+    try:
+        return await db.user_id_for(telex_user_id)
+    except Exception as e:
+        logger.warning("Could not look up the user for read-after-write. Error: %s", e)
+        return None
@@ -1,5 +1,99 @@
+import functools
+import inspect
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator
 from databases import Database
+from agent.core.metrics import db_query_duration, record_timing
+from agent.core.tracing import span
+from agent.db.replicas import ReplicatedDatabase
+
+# SQL text -> metric name, filled from the *_QUERY constants of each repository module
+QUERY_NAMES: Dict[str, str] = {}
+
+
+def query_name(query: Any) -> str:
+    return QUERY_NAMES.get(query, "unnamed") if isinstance(query, str) else "unnamed"
+
+
+# Repository methods whose queries may be served by a read replica
+READ_METHOD_PREFIXES = ("get_", "search")
+
+_reading: ContextVar[bool] = ContextVar("repository_reading", default=False)
+
+
+def _reads(method):
+    @functools.wraps(method)
+    async def read(*args, **kwargs):
+        token = _reading.set(True)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _reading.reset(token)
+
+    return read
+
+
+class InstrumentedDatabase:
+    """Wraps a Database so every repository query is timed and traced under its query name."""
+
+    def __init__(self, db: Database):
+        self._db = db
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+    @property
+    def _target(self) -> Database:
+        if not isinstance(self._db, ReplicatedDatabase):
+            return self._db
+        return self._db.for_read() if _reading.get() else self._db.for_write()
+
+    @contextmanager
+    def _measure(self, query: Any) -> Iterator[None]:
+        name = query_name(query)
+        started = time.perf_counter()
+        try:
+            with span(f"db.{name}", db_query=name):
+                yield
+        finally:
+            elapsed = time.perf_counter() - started
+            db_query_duration.observe(elapsed, query=name)
+            record_timing("db", elapsed)
+
+    async def fetch_one(self, query, values=None):
+        with self._measure(query):
+            return await self._target.fetch_one(query, values=values)
+
+    async def fetch_all(self, query, values=None):
+        with self._measure(query):
+            return await self._target.fetch_all(query, values=values)
+
+    async def fetch_val(self, query, values=None, column: Any = 0):
+        with self._measure(query):
+            return await self._target.fetch_val(query, values=values, column=column)
+
+    async def execute(self, query, values=None):
+        with self._measure(query):
+            return await self._target.execute(query, values=values)
+
+    async def iterate(self, query, values=None) -> AsyncIterator[Any]:
+        with self._measure(query):
+            async for row in self._target.iterate(query, values=values):
+                yield row
+
 
 class BaseRepository:
     def __init__(self, db: Database = None) -> None:
-        self.db = db
+        self.db = InstrumentedDatabase(db) if db is not None else None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if name.startswith(READ_METHOD_PREFIXES) and inspect.iscoroutinefunction(value):
+                setattr(cls, name, _reads(value))
+        for name, value in vars(sys.modules[cls.__module__]).items():
+            if name.endswith("_QUERY") and isinstance(value, str):
+                QUERY_NAMES[value] = name[:-len("_QUERY")].lower()
@@ -1,4 +1,6 @@
-from typing import Optional
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 from uuid import UUID
 from asyncpg import UniqueViolationError
 from databases import Database
@@ -17,11 +19,41 @@ CREATE_GOAL_QUERY = """
         :title,
         :description,
         :status
-    ) RETURNING *;
+    ) RETURNING id, user_id, title, description, status, created_at, updated_at;
+"""
+
+# The goal and all of its milestones in one statement (so one round trip and one transaction)
+CREATE_GOAL_WITH_MILESTONES_QUERY = """
+    WITH goal AS (
+        INSERT INTO goals (
+            user_id,
+            title,
+            description,
+            status
+        ) VALUES (
+            :user_id,
+            :title,
+            :description,
+            :status
+        ) RETURNING id, user_id, title, description, status, created_at, updated_at
+    ), milestones AS (
+        INSERT INTO milestones (goal_id, title, due_date)
+        SELECT goal.id, m.title, m.due_date
+        FROM goal, unnest(CAST(:milestone_titles AS text[]), CAST(:milestone_due_dates AS timestamp[]))
+            AS m(title, due_date)
+        RETURNING id, title, due_date, completed
+    )
+    SELECT
+        goal.*,
+        COALESCE(
+            (SELECT json_agg(milestones ORDER BY milestones.due_date NULLS LAST) FROM milestones),
+            '[]'
+        ) AS milestones
+    FROM goal;
 """
 
 GET_GOALS_BY_USER_ID_QUERY = """
-    SELECT * FROM goals WHERE user_id = :user_id;
+    SELECT id, user_id, title, description, status, created_at, updated_at FROM goals WHERE user_id = :user_id;
 """
 
 DELETE_GOAL_QUERY = """
@@ -29,7 +61,7 @@ DELETE_GOAL_QUERY = """
 """
 
 GET_GOAL_BY_ID_QUERY = """
-    SELECT * FROM goals WHERE id = :id AND user_id = :user_id;
+    SELECT id, user_id, title, description, status, created_at, updated_at FROM goals WHERE id = :id AND user_id = :user_id;
 """
 
 UPDATE_GOAL_QUERY = """
@@ -38,14 +70,101 @@ UPDATE_GOAL_QUERY = """
         description = :description,
         status = :status
     WHERE id = :id AND user_id = :user_id
-    RETURNING *;
+    RETURNING id, user_id, title, description, status, created_at, updated_at;
 """
 
 UPDATE_GOAL_STATUS_QUERY = """
     UPDATE goals SET
         status = :status
     WHERE id = :id AND user_id = :user_id
-    RETURNING *;
+    RETURNING id, user_id, title, description, status, created_at, updated_at;
+"""
+
+# one statement for any number of goals; the arrays are zipped row by row. Only the
+# owner's goals change, and an update older than the last one applied is skipped.
+BULK_UPDATE_GOAL_STATUS_QUERY = """
+    UPDATE goals SET
+        status = v.status,
+        progress_version = v.version,
+        updated_at = now()
+    FROM unnest(
+        CAST(:ids AS uuid[]), CAST(:user_ids AS uuid[]), CAST(:statuses AS text[]), CAST(:versions AS bigint[])
+    ) AS v(id, user_id, status, version)
+    WHERE goals.id = v.id
+        AND goals.user_id = v.user_id
+        AND goals.progress_version < v.version
+        AND goals.status IS DISTINCT FROM v.status
+    RETURNING goals.id;
+"""
+
+# Whole dashboard in one row, read from the trigger-maintained goal_progress counters
+GET_PROGRESS_DASHBOARD_QUERY = """
+    SELECT
+        count(p.goal_id) AS goal_count,
+        count(p.goal_id) FILTER (WHERE g.status = 'completed') AS completed_goals,
+        COALESCE(sum(p.total_milestones), 0) AS total_milestones,
+        COALESCE(sum(p.completed_milestones), 0) AS completed_milestones,
+        min(p.next_due_date) AS next_due_date,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                    'goal_id', g.id, 'title', g.title, 'status', g.status,
+                    'total_milestones', p.total_milestones,
+                    'completed_milestones', p.completed_milestones,
+                    'next_due_date', p.next_due_date
+                )
+                ORDER BY p.next_due_date NULLS LAST, g.created_at
+            ) FILTER (WHERE p.goal_id IS NOT NULL),
+            '[]'
+        ) AS goals
+    FROM goal_progress p
+    JOIN goals g ON g.id = p.goal_id
+    WHERE p.user_id = :user_id;
+"""
+
+# One row per goal with its milestones and a fingerprint of everything the next-step
+# prompt is built from, so it changes whenever the goal or any milestone is created,
+# edited or deleted (updated_at is not maintained by every write path)
+GOAL_SNAPSHOT_SELECT = """
+    SELECT
+        g.id,
+        g.user_id,
+        g.title,
+        g.description,
+        COALESCE(
+            json_agg(
+                json_build_object('title', m.title, 'due_date', m.due_date, 'completed', m.completed)
+                ORDER BY m.due_date NULLS LAST, m.created_at
+            ) FILTER (WHERE m.id IS NOT NULL),
+            '[]'
+        ) AS milestones,
+        md5(
+            json_build_object('title', g.title, 'description', g.description)::text ||
+            COALESCE(
+                string_agg(
+                    json_build_object(
+                        'id', m.id, 'title', m.title, 'due_date', m.due_date, 'completed', m.completed
+                    )::text,
+                    ',' ORDER BY m.id
+                ),
+                ''
+            )
+        ) AS fingerprint
+    FROM goals g
+    LEFT JOIN milestones m ON m.goal_id = g.id
+"""
+
+# keyset pages, so a long rate-limited run never holds one transaction open
+GET_ACTIVE_GOAL_SNAPSHOTS_QUERY = GOAL_SNAPSHOT_SELECT + """
+    WHERE g.status = 'active' AND g.id > :after
+    GROUP BY g.id
+    ORDER BY g.id
+    LIMIT :limit;
+"""
+
+GET_GOAL_SNAPSHOT_QUERY = GOAL_SNAPSHOT_SELECT + """
+    WHERE g.id = :id AND g.user_id = :user_id
+    GROUP BY g.id;
 """
 
 
@@ -83,6 +202,48 @@ class GoalRepository(BaseRepository):
                 detail="Internal Server Error"
             ) from e
 
+    async def create_goal_with_milestones(
+        self, user_id: UUID, title: str, description: Optional[str], _status: str,
+        milestones: List[Tuple[str, Optional[datetime]]]
+    ) -> dict:
+        """Insert a goal and its (title, due_date) milestones atomically in a single round trip."""
+        try:
+            logger.info("Creating goal with %s milestones for user with id: %s", len(milestones), user_id)
+            goal = await self.db.fetch_one(
+                CREATE_GOAL_WITH_MILESTONES_QUERY,
+                values={
+                    "user_id": user_id, "title": title, "description": description, "status": _status,
+                    "milestone_titles": [t for t, _ in milestones],
+                    "milestone_due_dates": [d for _, d in milestones],
+                },
+            )
+
+            if not goal:
+                logger.warning("Error while creating goal for user with id: %s", user_id)
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                    detail="Error while creating goal"
+                )
+
+            goal = dict(goal)
+            if isinstance(goal["milestones"], str):
+                goal["milestones"] = json.loads(goal["milestones"])
+            logger.info("Created goal for user with id: %s", user_id)
+            return goal
+        except UniqueViolationError as uve:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Goal already exists"
+            ) from uve
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
+
     async def get_goals_by_user_id(self, user_id: UUID) -> list:
         logger.info("Getting goals for user with id: %s", user_id)
         try:
@@ -181,3 +342,76 @@ class GoalRepository(BaseRepository):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Internal Server Error"
             ) from e
+
+    async def iter_active_goal_snapshots(self, page_size: int = 100) -> AsyncIterator[dict]:
+        """
+        Yield every active goal with its milestones, one short query per page of
+        `page_size` goals, so no cursor or transaction stays open between pages.
+        """
+        logger.info("Iterating active goal snapshots")
+        after = UUID(int=0)
+        try:
+            while True:
+                page = await self.db.fetch_all(
+                    GET_ACTIVE_GOAL_SNAPSHOTS_QUERY, values={"after": after, "limit": page_size}
+                )
+                for goal in page:
+                    yield goal
+                if len(page) < page_size:
+                    return
+                after = page[-1]["id"]
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
+
+    async def get_goal_snapshot(self, user_id: UUID, goal_id: UUID) -> Optional[dict]:
+        logger.info("Getting goal snapshot with id: %s for user with id: %s", goal_id, user_id)
+        try:
+            return await self.db.fetch_one(GET_GOAL_SNAPSHOT_QUERY, values={"id": goal_id, "user_id": user_id})
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
+
+    async def bulk_update_goal_status(self, updates: List[Tuple[UUID, UUID, str, int]]) -> int:
+        """Apply (user_id, goal_id, status, version) updates in one statement; returns rows changed."""
+        if not updates:
+            return 0
+        logger.info("Bulk updating status of %s goals", len(updates))
+        try:
+            rows = await self.db.fetch_all(
+                BULK_UPDATE_GOAL_STATUS_QUERY,
+                values={
+                    "user_ids": [str(user_id) for user_id, _, _, _ in updates],
+                    "ids": [str(goal_id) for _, goal_id, _, _ in updates],
+                    "statuses": [_status for _, _, _status, _ in updates],
+                    "versions": [version for _, _, _, version in updates],
+                }
+            )
+            return len(rows)
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
+
+    async def get_progress_dashboard(self, user_id: UUID) -> dict:
+        """Totals and per-goal progress for a user, without touching milestones."""
+        logger.info("Getting progress dashboard for user with id: %s", user_id)
+        try:
+            dashboard = dict(await self.db.fetch_one(GET_PROGRESS_DASHBOARD_QUERY, values={"user_id": user_id}))
+            if isinstance(dashboard["goals"], str):
+                dashboard["goals"] = json.loads(dashboard["goals"])
+            return dashboard
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
@@ -14,11 +14,11 @@ CREATE_MESSAGE_QUERY = """
         :user_id,
         :telex_sender_id,
         :text
-    ) RETURNING *;
+    ) RETURNING id, user_id, telex_sender_id, text, created_at, updated_at;
 """
 
 GET_MESSAGES_BY_USER_ID_QUERY = """
-    SELECT * FROM messages
+    SELECT id, user_id, telex_sender_id, text, created_at, updated_at FROM messages
     WHERE user_id = :user_id
     ORDER BY created_at DESC
     LIMIT :limit
@@ -26,7 +26,7 @@ GET_MESSAGES_BY_USER_ID_QUERY = """
 """
 
 GET_MESSAGE_BY_ID_QUERY = """
-    SELECT * FROM messages WHERE id = :id AND user_id = :user_id;
+    SELECT id, user_id, telex_sender_id, text, created_at, updated_at FROM messages WHERE id = :id AND user_id = :user_id;
 """
 
 DELETE_MESSAGE_QUERY = """
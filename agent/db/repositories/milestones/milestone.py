@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
 from asyncpg import UniqueViolationError
 from databases import Database
@@ -49,6 +49,25 @@ UPDATE_MILESTONE_STATUS_QUERY = """
     WHERE id = :id AND goal_id = :goal_id RETURNING *;
 """
 
+# one statement for any number of milestones; the arrays are zipped row by row. Only
+# milestones of the owner's goals change, and an update older than the last applied is skipped.
+BULK_UPDATE_MILESTONE_STATUS_QUERY = """
+    UPDATE milestones SET
+        completed = v.completed,
+        progress_version = v.version,
+        updated_at = now()
+    FROM unnest(
+        CAST(:ids AS uuid[]), CAST(:goal_ids AS uuid[]), CAST(:user_ids AS uuid[]),
+        CAST(:completed AS boolean[]), CAST(:versions AS bigint[])
+    ) AS v(id, goal_id, user_id, completed, version)
+    JOIN goals ON goals.id = v.goal_id AND goals.user_id = v.user_id
+    WHERE milestones.id = v.id
+        AND milestones.goal_id = v.goal_id
+        AND milestones.progress_version < v.version
+        AND milestones.completed IS DISTINCT FROM v.completed
+    RETURNING milestones.id;
+"""
+
 
 class MilestoneRepository(BaseRepository):
     def __init__(self, db: Database):
@@ -191,3 +210,30 @@ class MilestoneRepository(BaseRepository):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Internal Server Error"
             ) from e
+
+    async def bulk_update_milestone_status(self, updates: List[Tuple[UUID, UUID, UUID, bool, int]]) -> int:
+        """
+        Apply (user_id, goal_id, milestone_id, completed, version) updates in one
+        statement; returns rows changed.
+        """
+        if not updates:
+            return 0
+        logger.info("Bulk updating status of %s milestones", len(updates))
+        try:
+            rows = await self.db.fetch_all(
+                BULK_UPDATE_MILESTONE_STATUS_QUERY,
+                values={
+                    "user_ids": [str(user_id) for user_id, _, _, _, _ in updates],
+                    "goal_ids": [str(goal_id) for _, goal_id, _, _, _ in updates],
+                    "ids": [str(milestone_id) for _, _, milestone_id, _, _ in updates],
+                    "completed": [completed for _, _, _, completed, _ in updates],
+                    "versions": [version for _, _, _, _, version in updates],
+                }
+            )
+            return len(rows)
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
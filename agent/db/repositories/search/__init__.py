@@ -0,0 +1 @@
+from agent.db.repositories.search.search import SearchRepository as SearchRepository
\ No newline at end of file
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+from databases import Database
+from fastapi import HTTPException, status
+from agent.core.logger import logger
+from agent.db.repositories.base import BaseRepository
+
+# Each table is ranked through its (user_id, search_vector) GIN index and cut to :limit before the
+# union, so only the final rows pay for ts_headline. Ranks use normalization 32 (rank / (rank + 1))
+# so message and goal scores are comparable.
+SEARCH_QUERY = """
+    WITH q AS (
+        SELECT
+            websearch_to_tsquery('english', :query) AS query,
+            CAST(:user_id AS uuid) AS user_id,
+            CAST(:since AS timestamptz) AS since,
+            CAST(:limit AS integer) AS max_rows
+    ), hits AS (
+        (
+            SELECT 'message' AS kind, m.id, NULL AS title, m.text AS body, m.created_at,
+                ts_rank_cd(m.search_vector, q.query, 32) AS rank
+            FROM messages m, q
+            WHERE m.user_id = q.user_id AND m.search_vector @@ q.query
+                AND (q.since IS NULL OR m.created_at >= q.since)
+            ORDER BY rank DESC, m.created_at DESC
+            LIMIT (SELECT max_rows FROM q)
+        )
+        UNION ALL
+        (
+            SELECT 'goal' AS kind, g.id, g.title, coalesce(g.description, g.title) AS body, g.created_at,
+                ts_rank_cd(g.search_vector, q.query, 32) AS rank
+            FROM goals g, q
+            WHERE g.user_id = q.user_id AND g.search_vector @@ q.query
+                AND (q.since IS NULL OR g.created_at >= q.since)
+            ORDER BY rank DESC, g.created_at DESC
+            LIMIT (SELECT max_rows FROM q)
+        )
+    )
+    SELECT
+        hits.kind,
+        hits.id,
+        hits.title,
+        hits.created_at,
+        hits.rank,
+        ts_headline('english', hits.body, q.query, 'StartSel=**, StopSel=**, MaxWords=25, MinWords=8, MaxFragments=2') AS snippet
+    FROM hits, q
+    ORDER BY hits.rank DESC, hits.created_at DESC
+    LIMIT (SELECT max_rows FROM q);
+"""
+
+
+class SearchRepository(BaseRepository):
+    def __init__(self, db: Database):
+        super().__init__(db)
+        logger.info("Initializing SearchRepository")
+
+    async def search(
+        self, user_id: UUID, query: str, limit: int = 10, since: Optional[datetime] = None
+    ) -> List[dict]:
+        """Ranked full-text matches over a user's messages and goals, best first."""
+        logger.info("Searching messages and goals for user with id: %s", user_id)
+        try:
+            rows = await self.db.fetch_all(
+                SEARCH_QUERY,
+                values={"user_id": user_id, "query": query, "since": since, "limit": limit},
+            )
+            logger.info("Found %s results for user with id: %s", len(rows), user_id)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
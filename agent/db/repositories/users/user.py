@@ -26,6 +26,24 @@ GET_USER_BY_TELEX_ID_QUERY = """
     SELECT * FROM users WHERE telex_user_id = :telex_user_id;
 """
 
+GET_USER_PROFILE_BY_TELEX_ID_QUERY = """
+    SELECT
+        u.id,
+        u.name,
+        COALESCE(
+            json_agg(
+                json_build_object('title', g.title, 'description', g.description)
+                ORDER BY g.created_at
+            ) FILTER (WHERE g.id IS NOT NULL),
+            '[]'
+        ) AS goals
+    FROM users u
+    LEFT JOIN goals g ON g.user_id = u.id AND g.status = 'active'
+    WHERE u.telex_user_id = :telex_user_id
+    GROUP BY u.id
+    LIMIT 1;
+"""
+
 DELETE_USER_QUERY = """
     DELETE FROM users WHERE id = :id;
 """
@@ -117,6 +135,21 @@ class UserRepository(BaseRepository):
                 detail="Internal Server Error"
             ) from e
 
+    async def get_profile_by_telex_id(self, telex_user_id: str) -> Optional[dict]:
+        """The user with their active goals in one query, or None for unknown senders."""
+        logger.info("Getting profile by telex id: %s", telex_user_id)
+        try:
+            return await self.db.fetch_one(
+                GET_USER_PROFILE_BY_TELEX_ID_QUERY,
+                values={"telex_user_id": telex_user_id}
+            )
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error"
+            ) from e
+
     async def delete_user(self, user_id: UUID) -> bool:
         logger.info("Deleting user with id: %s", user_id)
         try:
@@ -1,35 +1,44 @@
 import os
 import asyncio
-import aioredis
 from fastapi import FastAPI
 from databases import Database
-from agent.core.config import DATABASE_URL
+from agent.core import config
+from agent.core.config import DATABASE_REPLICA_URLS
 from agent.core.logger import logger
-from agent.core.config import REDIS_URL
-
-redis = None
+from agent.db.redis_client import close_client, get_client, ping
+from agent.db.replicas import ReplicatedDatabase, parse_replica_urls
 
 MAX_RETRIES = 5
 INITIAL_DELAY = 2
 
 
 async def redis_connect(app: FastAPI):
-    global redis
-    redis = await aioredis.from_url(REDIS_URL)
-    await redis.set("agent_startup", "1")
-    app.state._redis = redis
+    # Redis-backed features (rate limits, caches, progress stream) fail open while it is unreachable
+    client = get_client()
+    if await ping(client):
+        logger.info("Connected to Redis.")
+        app.state._redis = client
+    else:
+        logger.error("Could not reach Redis at startup; continuing without it.")
+        app.state._redis = None
 
 
 async def redis_disconnect(app: FastAPI):
-    global redis
-    if redis:
-        await redis.close()
+    await close_client()
     app.state._redis = None
 
 
+def create_database(min_size: int = 2, max_size: int = 10):
+    """The primary Database, wrapped for replica routing when DATABASE_REPLICA_URLS is set."""
+    db_url = f"""{config.DATABASE_URL}{os.environ.get("DB_SUFFIX", "")}"""
+    database = Database(db_url, min_size=min_size, max_size=max_size)
+    if DATABASE_REPLICA_URLS:
+        database = ReplicatedDatabase(database, parse_replica_urls(DATABASE_REPLICA_URLS))
+    return database
+
+
 async def connect_to_db(app: FastAPI) -> None:
-    db_url = f"""{DATABASE_URL}{os.environ.get("DB_SUFFIX", "")}"""
-    database = Database(db_url, min_size=2, max_size=10)
+    database = create_database()
 
     retries = 0
     delay = INITIAL_DELAY
@@ -1,3 +1,8 @@
+import argparse
+import signal
+import threading
+import time
+from typing import Optional
 import uvicorn
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
@@ -7,8 +12,15 @@ from fastapi import FastAPI, Request
 from agent.core import config
 # from agent.core import tasks
 from agent.core.logger import logger
+from agent.core.metrics import MetricsMiddleware
+from agent.core.signatures import SignatureMiddleware
+from agent.core.tracing import TracingMiddleware
 from agent.api.routes.health_route import router as health_router
+from agent.api.routes.metrics_route import router as metrics_router
 from agent.api.routes.agents.a2a import router as a2a_router
+from agent.db.tasks import close_db_connection, connect_to_db, redis_connect, redis_disconnect
+from agent.services.agent import drain_llm_calls
+from agent.services.delivery import close_telex_client
 
 
 BASE_PATH = "/a2a-coach"
@@ -16,9 +28,53 @@ BASE_PATH = "/a2a-coach"
 tags_metadata = [
     {"name": "Health", "description": "Health status of the API Endpoints"},
     {"name": "A2A-Coach", "description": "Multi-Modal Coach Agent (A2A) API Routes"},
+    {"name": "Metrics", "description": "Prometheus metrics"},
 ]
 
+# when this worker was told to stop; uvicorn's connection drain and ours share one budget from here
+_shutdown_started: Optional[float] = None
+
+
+def record_shutdown_signal() -> None:
+    """Wrap the stop handlers uvicorn installed before startup to note when the signal arrived."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        handler = signal.getsignal(sig)
+        if not callable(handler):
+            continue
+
+        def on_signal(signum, frame, handler=handler):
+            global _shutdown_started
+            if _shutdown_started is None:
+                _shutdown_started = time.monotonic()
+            handler(signum, frame)
+
+        signal.signal(sig, on_signal)
+
+
+def shutdown_time_left() -> float:
+    """Seconds left of SHUTDOWN_GRACE_SECONDS, counted from the stop signal when there was one."""
+    if _shutdown_started is None:
+        return float(config.SHUTDOWN_GRACE_SECONDS)
+    return max(0.0, config.SHUTDOWN_GRACE_SECONDS - (time.monotonic() - _shutdown_started))
+
+
+async def drain_in_flight_llm_calls() -> None:
+    await drain_llm_calls(shutdown_time_left())
+
+
+def require_settings() -> None:
+    """Fail at startup, not on the first request, when a required setting is missing."""
+    required = ["SECRET_KEY"]
+    if config.LLM_PROVIDER == "gemini":
+        # may be empty (template replies only), but must be set
+        required.append("GEMINI_API_KEY")
+    config.require(*required)
+
+
 def get_application():
+    require_settings()
     fast_api = FastAPI(
         title=config.PROJECT_NAME,
         version=config.VERSION,
@@ -38,11 +94,44 @@ def get_application():
     )
 
     fast_api.add_middleware(SessionMiddleware, secret_key=config.SECRET_KEY)
+    fast_api.add_middleware(
+        SignatureMiddleware,
+        paths=(f"{BASE_PATH}/rpc", f"{BASE_PATH}/coach"),
+        secret=config.A2A_SIGNING_SECRET,
+    )
+    fast_api.add_middleware(MetricsMiddleware)
+    fast_api.add_middleware(TracingMiddleware)
 
     # fast_api.add_event_handler("startup", tasks.create_start_app_handler(fast_api))
     # fast_api.add_event_handler("shutdown", tasks.create_stop_app_handler(fast_api))
+    async def connect_database() -> None:
+        # DB-backed methods answer "... unavailable" instead of failing every route when Postgres is down
+        try:
+            await connect_to_db(fast_api)
+        except Exception as e:
+            logger.error("Could not connect to the database; continuing without it. Error: %s", e)
+            fast_api.state._db = None
+
+    async def disconnect_database() -> None:
+        if getattr(fast_api.state, "_db", None) is not None:
+            await close_db_connection(fast_api)
+
+    async def connect_redis() -> None:
+        await redis_connect(fast_api)
+
+    async def disconnect_redis() -> None:
+        await redis_disconnect(fast_api)
+
+    fast_api.add_event_handler("startup", record_shutdown_signal)
+    fast_api.add_event_handler("startup", connect_database)
+    fast_api.add_event_handler("startup", connect_redis)
+    fast_api.add_event_handler("shutdown", drain_in_flight_llm_calls)
+    fast_api.add_event_handler("shutdown", close_telex_client)
+    fast_api.add_event_handler("shutdown", disconnect_redis)
+    fast_api.add_event_handler("shutdown", disconnect_database)
 
     fast_api.include_router(health_router, prefix=BASE_PATH)
+    fast_api.include_router(metrics_router, prefix=BASE_PATH)
     fast_api.include_router(a2a_router, prefix=BASE_PATH)
 
     return fast_api
@@ -55,17 +144,41 @@ app = get_application()
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     status_code, detail, url_path = exc.status_code, exc.detail, request.url.path
     logger.error(f"status code: {status_code}, detail: {detail}, url path: {url_path}")
-    return JSONResponse(status_code=status_code, content=detail)
+    return JSONResponse(status_code=status_code, content=detail, headers=getattr(exc, "headers", None))
 
 
-def main():
-    logger.info("Starting A2A-Coach API Platform...")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the A2A-Coach API")
+    parser.add_argument(
+        "--production", action="store_true", default=config.ENV.startswith("deployment"),
+        help="run WEB_CONCURRENCY workers without reload (default when ENV starts with 'deployment')"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.production:
+        logger.info("Starting A2A-Coach API Platform (development)...")
+        uvicorn.run("agent.main:app", host=config.HOST, port=config.PORT, reload=True, workers=1)
+        return
+
+    workers = config.WEB_CONCURRENCY
+    if config.AFFINITY_NODES and workers > 1:
+        # the ring routes to instances; with several processes behind one port a conversation
+        # would still land on a random process, so each instance runs exactly one
+        logger.warning("AFFINITY_NODES is set: running 1 worker instead of WEB_CONCURRENCY=%s", workers)
+        workers = 1
+    logger.info("Starting A2A-Coach API Platform with %s workers...", workers)
+    # loop/http "auto" pick uvloop and httptools when they are installed
     uvicorn.run(
         "agent.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=False if config.ENV.startswith("deployment") else True,
-        workers=1
+        host=config.HOST,
+        port=config.PORT,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        proxy_headers=True,
+        forwarded_allow_ips=config.FORWARDED_ALLOW_IPS,
+        limit_max_requests=config.WORKER_MAX_REQUESTS or None,
+        timeout_graceful_shutdown=config.SHUTDOWN_GRACE_SECONDS,
     )
 
 
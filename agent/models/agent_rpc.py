@@ -1,5 +1,9 @@
-from typing import Any, Dict, Optional
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
+from uuid import UUID
+from pydantic import BaseModel, ConfigDict, Discriminator, Field, StrictBool, Tag, TypeAdapter
+
+GoalStatus = Literal["active", "completed", "paused", "abandoned"]
 
 
 class JsonRpcRequest(BaseModel):
@@ -16,6 +20,131 @@ class JsonRpcResponse(BaseModel):
     error: Optional[Dict[str, Any]] = None
 
 
+class RpcParams(BaseModel):
+    """Fields every method may carry; unknown keys from A2A clients are kept, not rejected."""
+    model_config = ConfigDict(extra="allow")
+
+    context_id: Optional[str] = None
+    sender: Optional[str] = None
+
+
+class TaskPayload(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: Optional[str] = None
+    title: Optional[str] = None
+    parts: List[Union[str, Dict[str, Any]]] = []
+
+
+class TaskSendParams(RpcParams):
+    task: TaskPayload = Field(default_factory=TaskPayload)
+    mode: Optional[str] = None
+
+
+class MessageSendParams(RpcParams):
+    message: Union[str, Dict[str, Any], None] = None
+
+
+class UserParams(RpcParams):
+    user_id: UUID
+
+
+class ProgressUpdateParams(UserParams):
+    goal_id: UUID
+    milestone_id: Optional[UUID] = None
+    completed: Optional[StrictBool] = None
+    status: Optional[GoalStatus] = None
+
+
+class NextStepParams(UserParams):
+    goal_id: UUID
+
+
+class GoalFromPlanParams(UserParams):
+    title: Annotated[str, Field(min_length=1)]
+    plan: Optional[str] = None
+
+
+class SearchParams(UserParams):
+    query: Annotated[str, Field(min_length=1)]
+    limit: Annotated[int, Field(ge=1, le=50)] = 10
+    since: Optional[datetime] = None
+
+
+class _Rpc(BaseModel):
+    jsonrpc: str
+    id: Optional[str] = None
+
+
+class TaskSendRequest(_Rpc):
+    method: Literal["tasks/send", "tasks/sendSubscribe"]
+    params: TaskSendParams = Field(default_factory=TaskSendParams)
+
+
+class MessageSendRequest(_Rpc):
+    method: Literal["message/send"]
+    params: MessageSendParams = Field(default_factory=MessageSendParams)
+
+
+class ProgressUpdateRequest(_Rpc):
+    method: Literal["progress/update"]
+    params: ProgressUpdateParams
+
+
+class NextStepRequest(_Rpc):
+    method: Literal["goals/next_step"]
+    params: NextStepParams
+
+
+class GoalProgressRequest(_Rpc):
+    method: Literal["goals/progress"]
+    params: UserParams
+
+
+class GoalFromPlanRequest(_Rpc):
+    method: Literal["goals/from_plan"]
+    params: GoalFromPlanParams
+
+
+class SearchRequest(_Rpc):
+    method: Literal["search/query"]
+    params: SearchParams
+
+
+class UnknownMethodRequest(_Rpc):
+    method: str
+    params: Optional[Dict[str, Any]] = None
+
+
+RPC_METHODS = {
+    "tasks/send": TaskSendRequest,
+    "tasks/sendSubscribe": TaskSendRequest,
+    "message/send": MessageSendRequest,
+    "progress/update": ProgressUpdateRequest,
+    "goals/next_step": NextStepRequest,
+    "goals/progress": GoalProgressRequest,
+    "goals/from_plan": GoalFromPlanRequest,
+    "search/query": SearchRequest,
+}
+
+
+def _method_tag(value: Any) -> str:
+    method = value.get("method") if isinstance(value, dict) else getattr(value, "method", None)
+    return method if method in RPC_METHODS else "unknown"
+
+
+# One pass from raw bytes to the method's typed request: the method picks the model,
+# so params are validated once, against only that method's fields
+RpcRequest = Annotated[
+    Union[
+        tuple(Annotated[model, Tag(method)] for method, model in RPC_METHODS.items())
+        + (Annotated[UnknownMethodRequest, Tag("unknown")],)
+    ],
+    Discriminator(_method_tag),
+]
+rpc_request_adapter = TypeAdapter(RpcRequest)
+
+
 class TelexRequest(BaseModel):
     id: str | None = None
     message: str | None = None
@@ -1,9 +1,18 @@
-import google.generativeai as genai
-from agent.core.config import GEMINI_API_KEY
+import asyncio
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Sequence, Set
+from agent.core.admission import admission, Overloaded, HIGH_PRIORITY
+from agent.core.config import GEMINI_MODEL
 from agent.core.logger import logger
+from agent.core.metrics import llm_request_duration, llm_tokens, record_timing
+from agent.core.tracing import span
 from agent.core.utils import short_plan_from_prompt
+from agent.services.attachments import Attachment
+from agent.services.prompts import PromptPrefix, model_for, render_profile
+from agent.services.provider import llm_available
 
-genai.configure(api_key=GEMINI_API_KEY)
+if TYPE_CHECKING:
+    from databases import Database
 
 SYSTEM_PROMPT = """
 You are a smart multi-modal learning & productivity AI coach.
@@ -22,24 +31,128 @@ Format:
 - ALWAYS provide next-step suggestions
 """
 
+DEFAULT_PREFIX = PromptPrefix(SYSTEM_PROMPT)
 
-async def run_gemini(user_text: str) -> str:
-    if not GEMINI_API_KEY:
-        return short_plan_from_prompt(user_text)
+
+class FallbackReply(str):
+    """A template reply served because the LLM was unavailable, failed or shed the request."""
+
+
+async def user_prompt_prefix(db: Optional["Database"], telex_user_id: Optional[str]) -> PromptPrefix:
+    """The coach prefix extended with the sender's profile and goals, when known."""
+    if db is None or not telex_user_id:
+        return DEFAULT_PREFIX
+
+    from agent.db.repositories.users import UserRepository
 
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
+        profile = await UserRepository(db).get_profile_by_telex_id(telex_user_id)
+    except Exception as e:
+        logger.warning("Could not load profile for prompt prefix. Error: %s", e)
+        return DEFAULT_PREFIX
+
+    return PromptPrefix(SYSTEM_PROMPT, render_profile(profile))
+
+
+async def run_gemini(
+    user_text: str, prefix: Optional[PromptPrefix] = None,
+    attachments: Sequence[Attachment] = ()
+) -> str:
+    if not llm_available():
+        return FallbackReply(short_plan_from_prompt(user_text))
+
+    started, outcome = time.perf_counter(), "error"
+    with span("llm.generate", model=GEMINI_MODEL, attachments=len(attachments)) as llm_span:
+        try:
+            contents = [a.as_part() for a in attachments] + [f"User: {user_text}"]
+            async with model_for(prefix or DEFAULT_PREFIX) as model:
+                response = await model.generate_content_async(contents)
+            outcome = "ok"
+            llm_span.set(**record_usage(response))
+
+            if hasattr(response, "text"):
+                return response.text.strip()
+
+            return str(response).strip()
+
+        except Exception as e:
+            logger.exception(e)
+            llm_span.record_error(e)
+            return FallbackReply(short_plan_from_prompt(user_text) + "\n\n(LLM unavailable — served fallback)")
 
-        model = genai.GenerativeModel("gemini-2.5-flash")
+        finally:
+            elapsed = time.perf_counter() - started
+            llm_span.set(outcome=outcome)
+            llm_request_duration.observe(elapsed, model=GEMINI_MODEL, outcome=outcome)
+            record_timing("llm", elapsed)
 
-        prompt = f"{SYSTEM_PROMPT}\nUser: {user_text}"
-        response = model.generate_content(prompt)
 
-        if hasattr(response, "text"):
-            return response.text.strip()
+def record_usage(response) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    tokens = {
+        "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+    }
+    llm_tokens.inc(tokens["input_tokens"], model=GEMINI_MODEL, direction="input")
+    llm_tokens.inc(tokens["output_tokens"], model=GEMINI_MODEL, direction="output")
+    return tokens
 
-        return str(response).strip()
 
+async def generate_reply(
+    user_text: str, priority: int = HIGH_PRIORITY,
+    prefix: Optional[PromptPrefix] = None,
+    attachments: Sequence[Attachment] = ()
+) -> str:
+    """run_gemini behind admission control; shed requests get the template plan."""
+    try:
+        async with admission.admit(priority):
+            return await run_gemini(user_text, prefix, attachments)
+    except Overloaded:
+        return FallbackReply(short_plan_from_prompt(user_text))
+
+
+_late_replies: Set[asyncio.Task] = set()
+
+
+async def _deliver_late(generation: asyncio.Task, on_late: Callable[[str], Awaitable[None]]) -> None:
+    try:
+        reply = await generation
+        await on_late(reply)
     except Exception as e:
         logger.exception(e)
-        return short_plan_from_prompt(user_text) + "\n\n(LLM unavailable — served fallback)"
+
+
+async def run_gemini_with_deadline(
+    user_text: str, deadline: float,
+    on_late: Callable[[str], Awaitable[None]],
+    prefix: Optional[PromptPrefix] = None
+) -> Optional[str]:
+    """
+    Run the LLM but stop waiting after `deadline` seconds.
+
+    Returns the reply when it arrives in time. Otherwise returns None and keeps
+    the generation running; its reply is handed to `on_late` once ready.
+    """
+    generation = asyncio.create_task(generate_reply(user_text, prefix=prefix))
+    try:
+        return await asyncio.wait_for(asyncio.shield(generation), timeout=deadline)
+    except asyncio.TimeoutError:
+        logger.info({"event": "llm_deadline_exceeded", "deadline": deadline})
+        delivery = asyncio.create_task(_deliver_late(generation, on_late))
+        _late_replies.add(delivery)
+        delivery.add_done_callback(_late_replies.discard)
+        return None
+
+
+async def drain_llm_calls(timeout: float) -> None:
+    """Wait for in-flight generations and pending late replies before shutdown."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    if _late_replies:
+        await asyncio.wait(set(_late_replies), timeout=timeout)
+    while admission.in_flight and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.1)
+    logger.info({
+        "event": "llm_drain_finished", "in_flight": admission.in_flight, "late_replies": len(_late_replies)
+    })
@@ -0,0 +1,246 @@
+"""
+Ingestion of A2A file parts (inline base64 or by URI) for multimodal prompts
+"""
+
+import asyncio
+import binascii
+import hashlib
+import ipaddress
+import json
+import socket
+import tempfile
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from dataclasses import dataclass
+from typing import Dict, IO, List, Optional, Tuple
+import httpx
+from agent.core.config import (
+    ATTACHMENT_MAX_BYTES, ATTACHMENT_MAX_COUNT, ATTACHMENT_SPOOL_BYTES, ATTACHMENT_UPLOAD_TTL_SECONDS
+)
+from agent.core.logger import logger
+from agent.core.metrics import cache_requests
+from agent.services.provider import gemini
+
+ALLOWED_MIME_PREFIXES = ("image/", "audio/", "application/pdf")
+PROVIDER_FILE_PREFIX = "https://generativelanguage.googleapis.com/"
+
+# attachments by uri: only https, at most this many redirects, each hop checked again
+ALLOWED_URI_SCHEMES = ("https",)
+MAX_URI_REDIRECTS = 3
+
+# base64 is decoded this many characters at a time (a multiple of 4)
+DECODE_CHUNK_CHARS = 64 * 1024
+
+
+class AttachmentError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Attachment:
+    mime_type: str
+    file_uri: str
+
+    def as_part(self):
+        protos = gemini().protos
+        return protos.Part(
+            file_data=protos.FileData(mime_type=self.mime_type, file_uri=self.file_uri)
+        )
+
+
+# sha256 -> (provider file uri, expiry); mirrors the Redis entries to skip a round trip
+_uploads: Dict[str, Tuple[str, float]] = {}
+
+
+def _spool() -> IO[bytes]:
+    return tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_BYTES)
+
+
+def spool_base64(data: str) -> Tuple[IO[bytes], str]:
+    """Decode base64 into a spooled temp file chunk by chunk, returning it with its sha256."""
+    spool, digest, size, carry = _spool(), hashlib.sha256(), 0, ""
+    try:
+        for start in range(0, len(data), DECODE_CHUNK_CHARS):
+            chunk = carry + "".join(data[start:start + DECODE_CHUNK_CHARS].split())
+            usable = len(chunk) - len(chunk) % 4
+            chunk, carry = chunk[:usable], chunk[usable:]
+            decoded = binascii.a2b_base64(chunk)
+            size += len(decoded)
+            if size > ATTACHMENT_MAX_BYTES:
+                raise AttachmentError(f"Attachment exceeds {ATTACHMENT_MAX_BYTES} bytes")
+            digest.update(decoded)
+            spool.write(decoded)
+        if carry:
+            raise AttachmentError("Invalid base64 attachment")
+    except binascii.Error as e:
+        spool.close()
+        raise AttachmentError("Invalid base64 attachment") from e
+    except AttachmentError:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
+
+async def check_uri(uri: str) -> str:
+    """Refuse uris that are not https or whose host resolves to a non-public address.
+
+    Returns the address that was checked, so the fetch connects to it instead of resolving again.
+    """
+    parts = urlsplit(uri)
+    if parts.scheme not in ALLOWED_URI_SCHEMES or not parts.hostname:
+        raise AttachmentError(f"Attachment uri must be https: {uri}")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, parts.port or 443, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror as e:
+        raise AttachmentError(f"Could not resolve attachment host: {parts.hostname}") from e
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        address = getattr(address, "ipv4_mapped", None) or address
+        # covers loopback, private, link-local (cloud metadata), shared and reserved ranges
+        if not address.is_global or address.is_multicast:
+            raise AttachmentError(f"Attachment host is not allowed: {parts.hostname}")
+        addresses.append(address)
+    if not addresses:
+        raise AttachmentError(f"Could not resolve attachment host: {parts.hostname}")
+    return str(addresses[0])
+
+
+def pinned_request(uri: str, address: str) -> Tuple[str, dict, dict]:
+    """The url, headers and extensions for fetching `uri` from an already checked `address`.
+
+    The connection goes to the address; Host and TLS SNI keep the original name, so the
+    certificate is still verified against it and a second DNS answer is never used.
+    """
+    parts = urlsplit(uri)
+    host = f"[{address}]" if ":" in address else address
+    port = f":{parts.port}" if parts.port else ""
+    url = urlunsplit((parts.scheme, host + port, parts.path, parts.query, ""))
+    return url, {"Host": parts.hostname + port}, {"sni_hostname": parts.hostname}
+
+
+async def spool_uri(uri: str) -> Tuple[IO[bytes], str]:
+    """Stream a remote file into a spooled temp file, returning it with its sha256."""
+    spool, digest, size = _spool(), hashlib.sha256(), 0
+    try:
+        async with httpx.AsyncClient(timeout=30, follow_redirects=False) as client:
+            for _ in range(MAX_URI_REDIRECTS + 1):
+                url, headers, extensions = pinned_request(uri, await check_uri(uri))
+                async with client.stream("GET", url, headers=headers, extensions=extensions) as response:
+                    if response.is_redirect:
+                        uri = urljoin(uri, response.headers.get("location", ""))
+                        continue
+                    response.raise_for_status()
+                    length = response.headers.get("content-length")
+                    if length and length.isdigit() and int(length) > ATTACHMENT_MAX_BYTES:
+                        raise AttachmentError(f"Attachment exceeds {ATTACHMENT_MAX_BYTES} bytes")
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > ATTACHMENT_MAX_BYTES:
+                            raise AttachmentError(f"Attachment exceeds {ATTACHMENT_MAX_BYTES} bytes")
+                        digest.update(chunk)
+                        spool.write(chunk)
+                    break
+            else:
+                raise AttachmentError(f"Too many redirects fetching attachment: {uri}")
+    except httpx.HTTPError as e:
+        spool.close()
+        raise AttachmentError(f"Could not fetch attachment: {uri}") from e
+    except AttachmentError:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
+
+def _upload(spool: IO[bytes], mime_type: str, sha: str) -> str:
+    genai = gemini()
+    uploaded = genai.upload_file(spool, mime_type=mime_type, display_name=sha)
+    # audio and large PDFs are processed before they can be referenced
+    deadline = time.monotonic() + 60
+    while uploaded.state.name == "PROCESSING" and time.monotonic() < deadline:
+        time.sleep(1)
+        uploaded = genai.get_file(uploaded.name)
+    if uploaded.state.name == "FAILED":
+        raise AttachmentError("Attachment could not be processed")
+    return uploaded.uri
+
+
+async def _provider_uri(spool: IO[bytes], sha: str, mime_type: str, redis_) -> str:
+    """Upload once per unique content hash; later turns reuse the stored file uri."""
+    now = time.time()
+    known = _uploads.get(sha)
+    if known and known[1] > now:
+        cache_requests.inc(cache="attachment_upload", result="hit")
+        return known[0]
+
+    key = f"attachment:{sha}"
+    uri = None
+    if redis_ is not None:
+        cached = await redis_.get(key)
+        uri = cached.decode() if isinstance(cached, bytes) else cached
+
+    cache_requests.inc(cache="attachment_upload", result="hit" if uri else "miss")
+    if not uri:
+        uri = await asyncio.to_thread(_upload, spool, mime_type, sha)
+        logger.info({"event": "attachment_uploaded", "sha256": sha, "mime_type": mime_type})
+        if redis_ is not None:
+            await redis_.set(key, uri, ex=ATTACHMENT_UPLOAD_TTL_SECONDS)
+
+    _uploads[sha] = (uri, now + ATTACHMENT_UPLOAD_TTL_SECONDS)
+    return uri
+
+
+async def ingest_file_part(part: dict, redis_=None) -> Attachment:
+    file = part.get("file") or {}
+    mime_type = file.get("mimeType") or file.get("mime_type") or ""
+    if not mime_type.startswith(ALLOWED_MIME_PREFIXES):
+        raise AttachmentError(f"Unsupported attachment type: {mime_type or 'unknown'}")
+
+    uri = file.get("uri")
+    if uri and uri.startswith(PROVIDER_FILE_PREFIX):
+        return Attachment(mime_type, uri)
+
+    if file.get("bytes"):
+        spool, sha = await asyncio.to_thread(spool_base64, file["bytes"])
+    elif uri:
+        spool, sha = await spool_uri(uri)
+    else:
+        raise AttachmentError("File part has neither bytes nor uri")
+
+    try:
+        return Attachment(mime_type, await _provider_uri(spool, sha, mime_type, redis_))
+    finally:
+        spool.close()
+
+
+def part_kind(part) -> Optional[str]:
+    if isinstance(part, dict):
+        return part.get("type") or part.get("kind")
+    return None
+
+
+async def ingest_parts(parts: list, redis_=None) -> Tuple[List[str], List[Attachment]]:
+    """Split A2A task parts into text inputs and uploaded file attachments."""
+    texts, files = [], []
+    for p in parts:
+        kind = part_kind(p)
+        if isinstance(p, str):
+            texts.append(p)
+        elif kind == "file" or (isinstance(p, dict) and "file" in p):
+            files.append(p)
+        elif kind == "data" or (isinstance(p, dict) and "data" in p):
+            texts.append(json.dumps(p.get("data")))
+        elif isinstance(p, dict) and p.get("text"):
+            texts.append(p["text"])
+
+    if len(files) > ATTACHMENT_MAX_COUNT:
+        raise AttachmentError(f"At most {ATTACHMENT_MAX_COUNT} attachments are allowed")
+
+    attachments = await asyncio.gather(*(ingest_file_part(f, redis_) for f in files))
+    return texts, list(attachments)
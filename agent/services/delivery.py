@@ -0,0 +1,282 @@
+"""
+Delivery of background results to Telex channels
+
+Jobs only XADD their result to a Redis Stream. A consumer group in the worker
+posts each result to its channel's webhook through one pooled HTTP client, with
+at most DELIVERY_CHANNEL_CONCURRENCY requests per channel and
+DELIVERY_MAX_IN_FLIGHT overall. Small results for the same channel arriving
+within DELIVERY_BATCH_WINDOW_MS are combined into one message. Failed posts are
+retried with jittered exponential backoff; after DELIVERY_MAX_ATTEMPTS, or on a
+response that will not change on retry, the result goes to a dead-letter stream.
+Entries are acknowledged only once delivered or dead-lettered; while they wait
+for a window, a channel slot or a retry, the consumer re-claims them every half
+DELIVERY_CLAIM_IDLE_MS so no other worker takes them over and posts them twice.
+"""
+
+import asyncio
+import os
+import random
+import weakref
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+import httpx
+from agent.core.config import (
+    INSTANCE_ID, PROJECT_NAME, TELEX_WEBHOOK_BASE, DELIVERY_BACKOFF_SECONDS, DELIVERY_BATCH_MAX_CHARS,
+    DELIVERY_BATCH_WINDOW_MS, DELIVERY_CHANNEL_CONCURRENCY, DELIVERY_CLAIM_IDLE_MS, DELIVERY_MAX_ATTEMPTS,
+    DELIVERY_MAX_CONNECTIONS, DELIVERY_MAX_IN_FLIGHT
+)
+from agent.core.logger import logger
+from agent.core.metrics import telex_deliveries
+from agent.core.tracing import span
+
+DELIVERY_STREAM = "telex_deliveries"
+DELIVERY_GROUP = "telex_deliverers"
+DEAD_LETTER_STREAM = "telex_deliveries:dead"
+DELIVERY_STREAM_MAXLEN = 100_000
+DELIVERY_BACKOFF_MAX_SECONDS = 60.0
+DELIVERY_TIMEOUT_SECONDS = 10.0
+BATCH_SEPARATOR = "\n\n---\n\n"
+
+# Statuses worth retrying; any other 4xx is dead-lettered on the first attempt
+RETRYABLE_STATUSES = {408, 425, 429}
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, retryable: bool, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def telex_client() -> httpx.AsyncClient:
+    """The shared Telex client for the running event loop; created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=DELIVERY_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=DELIVERY_MAX_CONNECTIONS, max_keepalive_connections=DELIVERY_MAX_CONNECTIONS
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_telex_client() -> None:
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+async def post_to_telex(channel_id: str, content: str, status: str = "success") -> None:
+    """POST one coach reply to a channel's webhook; raises DeliveryError on failure."""
+    payload = {
+        "event_name": "coach_reply",
+        "message": content,
+        "status": status,
+        "username": PROJECT_NAME,
+    }
+    with span("telex.push_message", channel_id=channel_id):
+        try:
+            response = await telex_client().post(f"{TELEX_WEBHOOK_BASE}/{channel_id}", json=payload)
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}", retryable=True) from e
+    if response.status_code >= 400:
+        raise DeliveryError(
+            f"HTTP {response.status_code}",
+            retryable=response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES,
+            retry_after=_retry_after(response.headers.get("retry-after")),
+        )
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff, so a Telex outage does not end in a synchronized retry burst."""
+    return random.uniform(0, min(DELIVERY_BACKOFF_MAX_SECONDS, DELIVERY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+async def publish_delivery(redis_, channel_id: str, text: str, status: str = "success") -> str:
+    entry_id = await redis_.xadd(
+        DELIVERY_STREAM, {"channel_id": channel_id, "text": text, "status": status},
+        maxlen=DELIVERY_STREAM_MAXLEN, approximate=True,
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class Deliverer:
+    """One consumer of the delivery group; `run()` loops forever."""
+
+    def __init__(self, redis_, consumer: Optional[str] = None):
+        self.redis = redis_
+        self.consumer = consumer or f"{INSTANCE_ID}-{os.getpid()}"
+        # per-channel limits, kept only while a delivery to the channel is queued or running
+        self.channels: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+        # channel -> (window deadline, [(entry_id, text)]) for small results waiting to be combined
+        self.windows: Dict[str, Tuple[float, List[Tuple[str, str]]]] = {}
+        self.pending_ids: Set[str] = set()
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(DELIVERY_STREAM, DELIVERY_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def add(self, entry_id: str, channel_id: str, text: str, status: str = "success") -> None:
+        loop = asyncio.get_running_loop()
+        # failure notices keep their own status, so they are never combined with replies
+        if status != "success" or len(text) > DELIVERY_BATCH_MAX_CHARS // 2:
+            self.dispatch(channel_id, [(entry_id, text)], status)
+            return
+        deadline, batch = self.windows.get(channel_id, (loop.time() + DELIVERY_BATCH_WINDOW_MS / 1000, []))
+        if batch and sum(len(t) + len(BATCH_SEPARATOR) for _, t in batch) + len(text) > DELIVERY_BATCH_MAX_CHARS:
+            self.dispatch(channel_id, batch)
+            deadline, batch = loop.time() + DELIVERY_BATCH_WINDOW_MS / 1000, []
+        batch.append((entry_id, text))
+        self.windows[channel_id] = (deadline, batch)
+
+    def flush(self) -> None:
+        now = asyncio.get_running_loop().time()
+        for channel_id, (deadline, batch) in list(self.windows.items()):
+            if deadline <= now:
+                del self.windows[channel_id]
+                self.dispatch(channel_id, batch)
+
+    def dispatch(self, channel_id: str, batch: List[Tuple[str, str]], status: str = "success") -> None:
+        task = asyncio.create_task(self.deliver(channel_id, batch, status))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def deliver(self, channel_id: str, batch: List[Tuple[str, str]], status: str = "success") -> None:
+        text = BATCH_SEPARATOR.join(t for _, t in batch)
+        entry_ids = [entry_id for entry_id, _ in batch]
+        limit, users = self.channels.get(channel_id, (asyncio.Semaphore(DELIVERY_CHANNEL_CONCURRENCY), 0))
+        self.channels[channel_id] = (limit, users + 1)
+        try:
+            async with limit:
+                for attempt in range(DELIVERY_MAX_ATTEMPTS):
+                    try:
+                        await post_to_telex(channel_id, text, status)
+                        telex_deliveries.inc(outcome="delivered")
+                        break
+                    except DeliveryError as e:
+                        if not e.retryable or attempt + 1 >= DELIVERY_MAX_ATTEMPTS:
+                            await self.dead_letter(channel_id, text, entry_ids, attempt + 1, str(e))
+                            break
+                        telex_deliveries.inc(outcome="retry")
+                        delay = max(backoff(attempt), e.retry_after or 0)
+                        logger.warning(
+                            "Telex delivery to %s failed (%s), retry %s in %.1fs",
+                            channel_id, e, attempt + 1, delay,
+                        )
+                        await asyncio.sleep(delay)
+            await self.redis.xack(DELIVERY_STREAM, DELIVERY_GROUP, *entry_ids)
+        except Exception as e:
+            # left pending: claimed again after DELIVERY_CLAIM_IDLE_MS
+            logger.error("Telex delivery to %s could not be completed. Error: %s", channel_id, e)
+        finally:
+            self.pending_ids.difference_update(entry_ids)
+            limit, users = self.channels[channel_id]
+            if users == 1:
+                del self.channels[channel_id]
+            else:
+                self.channels[channel_id] = (limit, users - 1)
+
+    async def dead_letter(self, channel_id: str, text: str, entry_ids: List[str], attempts: int, error: str) -> None:
+        telex_deliveries.inc(outcome="dead_letter")
+        logger.error({
+            "event": "telex_delivery_dead_lettered", "channel_id": channel_id,
+            "attempts": attempts, "error": error, "entries": len(entry_ids),
+        })
+        await self.redis.xadd(
+            DEAD_LETTER_STREAM,
+            {
+                "channel_id": channel_id, "text": text, "attempts": attempts,
+                "error": error, "entry_ids": ",".join(entry_ids),
+            },
+            maxlen=DELIVERY_STREAM_MAXLEN, approximate=True,
+        )
+
+    async def touch(self) -> None:
+        """Reset the idle time of every entry this consumer still holds."""
+        await self.redis.xclaim(
+            DELIVERY_STREAM, DELIVERY_GROUP, self.consumer,
+            min_idle_time=0, message_ids=list(self.pending_ids), justid=True,
+        )
+
+    async def read(self, claim: bool) -> list:
+        if claim:
+            _, entries, *_ = await self.redis.xautoclaim(
+                DELIVERY_STREAM, DELIVERY_GROUP, self.consumer,
+                min_idle_time=DELIVERY_CLAIM_IDLE_MS, start_id="0-0", count=DELIVERY_MAX_IN_FLIGHT,
+            )
+            return entries
+        # block no longer than the earliest open window, so batches go out on time
+        loop = asyncio.get_running_loop()
+        deadlines = [deadline for deadline, _ in self.windows.values()]
+        block = min([1000] + [max(1, int((d - loop.time()) * 1000)) for d in deadlines])
+        response = await self.redis.xreadgroup(
+            DELIVERY_GROUP, self.consumer, {DELIVERY_STREAM: ">"},
+            count=DELIVERY_MAX_IN_FLIGHT, block=block,
+        )
+        return response[0][1] if response else []
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        logger.info("Consuming %s as %s", DELIVERY_STREAM, self.consumer)
+
+        loop = asyncio.get_running_loop()
+        next_claim, next_touch, delay = 0.0, 0.0, 1
+        while True:
+            try:
+                if self.pending_ids and loop.time() >= next_touch:
+                    next_touch = loop.time() + DELIVERY_CLAIM_IDLE_MS / 2000
+                    await self.touch()
+                # stop reading while the backlog of unfinished deliveries is at its limit
+                if len(self.pending_ids) >= DELIVERY_MAX_IN_FLIGHT:
+                    await asyncio.sleep(0.1)
+                    self.flush()
+                    continue
+                claim = loop.time() >= next_claim
+                if claim:
+                    next_claim = loop.time() + DELIVERY_CLAIM_IDLE_MS / 1000
+                for entry_id, fields in await self.read(claim):
+                    entry_id = _text(entry_id)
+                    fields = {_text(k): _text(v) for k, v in (fields or {}).items()}
+                    if entry_id in self.pending_ids:
+                        continue
+                    if not fields.get("channel_id"):
+                        # trimmed from the stream while pending, or malformed
+                        await self.redis.xack(DELIVERY_STREAM, DELIVERY_GROUP, entry_id)
+                        continue
+                    self.pending_ids.add(entry_id)
+                    self.add(entry_id, fields["channel_id"], fields.get("text") or "", fields.get("status") or "success")
+                self.flush()
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Reading %s failed, retrying in %ss. Error: %s", DELIVERY_STREAM, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
@@ -0,0 +1,76 @@
+"""
+Stand-in for google.generativeai used by load tests (LLM_PROVIDER=fake)
+
+Exposes the handful of SDK entry points the app calls. Replies take
+FAKE_LLM_LATENCY_SECONDS to first token plus FAKE_LLM_OUTPUT_TOKENS at
+FAKE_LLM_TOKENS_PER_SECOND, and report token usage like the real SDK.
+"""
+
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+from agent.core.config import FAKE_LLM_LATENCY_SECONDS, FAKE_LLM_OUTPUT_TOKENS, FAKE_LLM_TOKENS_PER_SECOND
+
+WORDS = ("plan", "practice", "review", "focus", "build", "study", "week", "goal", "habit", "progress")
+
+
+def _duration() -> float:
+    return FAKE_LLM_LATENCY_SECONDS + FAKE_LLM_OUTPUT_TOKENS / max(FAKE_LLM_TOKENS_PER_SECOND, 1e-9)
+
+
+def _response(contents) -> SimpleNamespace:
+    prompt = " ".join(str(c) for c in (contents if isinstance(contents, (list, tuple)) else [contents]))
+    text = " ".join(WORDS[i % len(WORDS)] for i in range(FAKE_LLM_OUTPUT_TOKENS))
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=max(1, len(prompt) // 4), candidates_token_count=FAKE_LLM_OUTPUT_TOKENS
+        ),
+    )
+
+
+class GenerativeModel:
+    def __init__(self, model_name: str = "fake", system_instruction: str = "", **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    @classmethod
+    def from_cached_content(cls, cached_content, **kwargs) -> "GenerativeModel":
+        return cls(cached_content.model, cached_content.system_instruction)
+
+    async def generate_content_async(self, contents, **kwargs) -> SimpleNamespace:
+        await asyncio.sleep(_duration())
+        return _response(contents)
+
+    def generate_content(self, contents, **kwargs) -> SimpleNamespace:
+        time.sleep(_duration())
+        return _response(contents)
+
+
+class CachedContent:
+    def __init__(self, model: str, system_instruction: str):
+        self.model = model
+        self.system_instruction = system_instruction
+
+    @classmethod
+    def create(cls, model: str, system_instruction: str = "", **kwargs) -> "CachedContent":
+        return cls(model, system_instruction)
+
+    def delete(self) -> None:
+        pass
+
+
+caching = SimpleNamespace(CachedContent=CachedContent)
+protos = SimpleNamespace(Part=dict, FileData=dict)
+
+
+def upload_file(path, mime_type: str = "", display_name: str = "", **kwargs) -> SimpleNamespace:
+    name = f"files/{hashlib.sha256(display_name.encode()).hexdigest()[:16]}"
+    return SimpleNamespace(
+        name=name, uri=f"https://generativelanguage.googleapis.com/v1beta/{name}", state=SimpleNamespace(name="ACTIVE")
+    )
+
+
+def get_file(name: str) -> SimpleNamespace:
+    return upload_file(None, display_name=name)
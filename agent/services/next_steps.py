@@ -0,0 +1,145 @@
+"""
+Precomputed "what should I do next?" suggestions for active goals
+"""
+
+import asyncio
+import json
+import time
+from typing import List, Optional
+from uuid import UUID
+from databases import Database
+from agent.core.admission import LOW_PRIORITY
+from agent.core.config import NEXT_STEP_BATCH_SIZE, NEXT_STEP_REQUESTS_PER_MINUTE, NEXT_STEP_TTL_SECONDS
+from agent.core.logger import logger
+from agent.core.metrics import cache_requests
+from agent.db.redis_client import get_many, set_many
+from agent.db.repositories.goals import GoalRepository
+from agent.services.agent import FallbackReply, generate_reply
+
+NEXT_STEP_PROMPT = """
+The user is working towards this goal: {title}
+{description}
+
+Milestones (title, due date, done):
+{milestones}
+
+Suggest the single most useful next step for the coming days: what to do, why it matters now,
+and how long it should take. Keep it under 120 words.
+"""
+
+
+class NextStepUnavailable(Exception):
+    pass
+
+
+def next_step_key(goal_id) -> str:
+    return f"next_step:{goal_id}"
+
+
+def next_step_prompt(goal: dict) -> str:
+    milestones = goal["milestones"]
+    if isinstance(milestones, str):
+        milestones = json.loads(milestones)
+
+    lines = [
+        f"- {m['title']} ({m['due_date'] or 'no due date'}, {'done' if m['completed'] else 'open'})"
+        for m in milestones
+    ]
+    return NEXT_STEP_PROMPT.format(
+        title=goal["title"],
+        description=goal["description"] or "",
+        milestones="\n".join(lines) or "- none yet",
+    )
+
+
+def _decode(cached) -> Optional[dict]:
+    if not cached:
+        return None
+    try:
+        return json.loads(cached)
+    except ValueError:
+        return None
+
+
+def _encode(fingerprint: str, text: str) -> str:
+    return json.dumps({"fingerprint": fingerprint, "text": text, "generated_at": int(time.time())})
+
+
+async def precompute_next_steps(db: Database, redis_) -> int:
+    """
+    Refresh stored suggestions for every active goal whose data has changed.
+
+    Goals are read a page at a time and generated in batches of
+    NEXT_STEP_BATCH_SIZE, pausing between batches to stay under
+    NEXT_STEP_REQUESTS_PER_MINUTE. Generations go through admission control at
+    low priority; shed ones stay stale for the next run. Cached suggestions are
+    read and written one pipelined round trip per batch.
+    Returns the number of suggestions generated.
+    """
+    goals = GoalRepository(db)
+    generated = 0
+    batch: List[dict] = []
+
+    async def flush() -> int:
+        cached = await get_many(redis_, [next_step_key(g["id"]) for g in batch])
+        stale = [
+            g for g, c in zip(batch, cached)
+            if (_decode(c) or {}).get("fingerprint") != g["fingerprint"]
+        ]
+        batch.clear()
+        if not stale:
+            return 0
+
+        started = time.monotonic()
+        replies = await asyncio.gather(*(
+            generate_reply(next_step_prompt(g), priority=LOW_PRIORITY) for g in stale
+        ))
+
+        # template fallbacks echo the prompt; leave those goals stale so the next run retries them
+        await set_many(redis_, {
+            next_step_key(goal["id"]): _encode(goal["fingerprint"], text)
+            for goal, text in zip(stale, replies) if not isinstance(text, FallbackReply)
+        }, ex=NEXT_STEP_TTL_SECONDS)
+
+        budget = len(stale) * 60 / NEXT_STEP_REQUESTS_PER_MINUTE
+        await asyncio.sleep(max(0.0, budget - (time.monotonic() - started)))
+        return len(stale)
+
+    async for goal in goals.iter_active_goal_snapshots(page_size=NEXT_STEP_BATCH_SIZE):
+        batch.append(dict(goal))
+        if len(batch) >= NEXT_STEP_BATCH_SIZE:
+            generated += await flush()
+    if batch:
+        generated += await flush()
+
+    logger.info({"event": "next_steps_precomputed", "generated": generated})
+    return generated
+
+
+async def get_next_step(db: Database, redis_, user_id: UUID, goal_id: UUID) -> Optional[dict]:
+    """
+    Serve the stored suggestion for a goal, regenerating it only when the goal
+    or its milestones changed since it was computed. None if the goal is unknown.
+    When the LLM cannot answer, an outdated suggestion is served if there is one,
+    otherwise NextStepUnavailable is raised.
+    """
+    goal = await GoalRepository(db).get_goal_snapshot(user_id, goal_id)
+    if not goal:
+        return None
+
+    key = next_step_key(goal_id)
+    cached = _decode(await redis_.get(key)) if redis_ else None
+    if cached and cached.get("fingerprint") == goal["fingerprint"]:
+        cache_requests.inc(cache="next_step", result="hit")
+        return {"goal_id": str(goal_id), "next_step": cached["text"], "precomputed": True}
+
+    cache_requests.inc(cache="next_step", result="stale" if cached else "miss")
+
+    text = await generate_reply(next_step_prompt(dict(goal)))
+    if isinstance(text, FallbackReply):
+        if cached:
+            return {"goal_id": str(goal_id), "next_step": cached["text"], "precomputed": True, "outdated": True}
+        raise NextStepUnavailable("Next step suggestion is unavailable, please retry later")
+    if redis_:
+        await redis_.set(key, _encode(goal["fingerprint"], text), ex=NEXT_STEP_TTL_SECONDS)
+    return {"goal_id": str(goal_id), "next_step": text, "precomputed": False}
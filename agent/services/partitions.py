@@ -0,0 +1,115 @@
+"""
+Monthly partitions of messages: created ahead of time, archived and dropped past retention
+
+Partitions are named messages_YYYY_MM and cover one UTC month each. Expired months are
+detached concurrently (inserts and reads on messages are not blocked), copied to a gzipped
+CSV under the archive directory, and only then dropped. A month that was detached but not
+yet archived, e.g. because the worker died, is picked up again by the next run.
+"""
+
+import gzip
+import os
+import pathlib
+import re
+from datetime import date, datetime, timezone
+from typing import List
+from databases import Database
+from agent.core.logger import logger
+from agent.core.tracing import span
+
+PARTITION_NAME = re.compile(r"^messages_(\d{4})_(\d{2})$")
+
+CREATE_PARTITIONS_QUERY = """
+    SELECT create_message_partitions(CAST(:from_month AS date), CAST(:to_month AS date));
+"""
+
+# Attached partitions of messages plus tables left detached by an interrupted run
+LIST_PARTITIONS_QUERY = """
+    SELECT c.relname AS name, i.inhrelid IS NOT NULL AS attached, coalesce(i.inhdetachpending, false) AS pending
+    FROM pg_class c
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = 'messages'::regclass
+    WHERE c.relkind = 'r' AND pg_table_is_visible(c.oid) AND c.relname ~ '^messages_[0-9]{4}_[0-9]{2}$';
+"""
+
+
+def add_months(day: date, months: int) -> date:
+    """First day of the month `months` after (or before) the month of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_month(name: str) -> date:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def current_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+async def ensure_message_partitions(db: Database, months_ahead: int) -> int:
+    """Create any missing partitions from this month through `months_ahead` months out."""
+    this_month = current_month()
+    created = await db.fetch_val(
+        CREATE_PARTITIONS_QUERY,
+        values={"from_month": this_month, "to_month": add_months(this_month, months_ahead)},
+    )
+    if created:
+        logger.info({"event": "message_partitions_created", "count": created})
+    return created or 0
+
+
+async def export_partition(db: Database, name: str, archive_dir: pathlib.Path) -> pathlib.Path:
+    """COPY a detached partition into archive_dir/<name>.csv.gz, replacing the file atomically."""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{name}.csv.gz"
+    partial = path.with_name(path.name + ".partial")
+
+    expected = await db.fetch_val(f"SELECT count(*) FROM {name}")
+    async with db.connection() as connection:
+        with gzip.open(partial, "wb") as archive:
+            async def write(chunk: bytes) -> None:
+                archive.write(chunk)
+
+            status = await connection.raw_connection.copy_from_table(
+                name, output=write, format="csv", header=True
+            )
+        with open(partial, "rb") as written:
+            os.fsync(written.fileno())
+
+    copied = int(status.split()[-1])
+    if copied != expected:
+        partial.unlink(missing_ok=True)
+        raise RuntimeError(f"Archived {copied} of {expected} rows from {name}")
+    os.replace(partial, path)
+    return path
+
+
+async def archive_message_partitions(db: Database, retention_months: int, archive_dir: str) -> List[str]:
+    """Detach, archive and drop every partition older than `retention_months`; 0 keeps everything."""
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(current_month(), -retention_months)
+    partitions = [
+        dict(row) for row in await db.fetch_all(LIST_PARTITIONS_QUERY)
+        if partition_month(row["name"]) < cutoff
+    ]
+
+    archived = []
+    for partition in sorted(partitions, key=lambda p: p["name"]):
+        name = partition["name"]
+        with span("partitions.archive", partition=name):
+            async with db.connection() as connection:
+                # simple-protocol statements: DETACH ... CONCURRENTLY refuses to run in a transaction block
+                ddl = connection.raw_connection
+                if partition["pending"]:
+                    await ddl.execute(f"ALTER TABLE messages DETACH PARTITION {name} FINALIZE")
+                elif partition["attached"]:
+                    await ddl.execute(f"ALTER TABLE messages DETACH PARTITION {name} CONCURRENTLY")
+
+                path = await export_partition(db, name, pathlib.Path(archive_dir))
+                await ddl.execute(f"DROP TABLE {name}")
+        logger.info({"event": "message_partition_archived", "partition": name, "path": str(path)})
+        archived.append(name)
+    return archived
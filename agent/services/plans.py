@@ -0,0 +1,198 @@
+"""
+Decomposed generation of long, multi-section coaching plans
+"""
+
+import asyncio
+import re
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+from uuid import UUID
+from databases import Database
+from agent.core.admission import admission, Overloaded
+from agent.core.config import (
+    PLAN_FANOUT_MIN_SECTIONS, PLAN_FANOUT_MAX_SECTIONS, PLAN_FANOUT_CONCURRENCY
+)
+from agent.core.logger import logger
+from agent.db.repositories.goals import GoalRepository
+from agent.services.agent import FallbackReply, generate_reply, run_gemini
+from agent.services.provider import llm_available
+
+PLAN_LENGTH_PATTERN = re.compile(r"(\d+)[\s-]*(week|module|month)s?\b", re.IGNORECASE)
+OUTLINE_LINE_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+OUTLINE_PROMPT = """
+Break the following {count}-{unit} request into exactly {sections} sequential parts:
+{labels}.
+Return {sections} lines, one short title per part in that order, and nothing else.
+
+Request: {request}
+"""
+
+SECTION_PROMPT = """
+You are writing one part of a {count}-{unit} plan for this request: {request}
+
+Full outline:
+{outline}
+
+Write ONLY {label}: "{title}". Include goals, concrete tasks and a small deliverable.
+Do not repeat other parts or add an introduction.
+"""
+
+SECTION_UNAVAILABLE = "This part could not be written because the coach is busy. Ask for {label} again to get it."
+
+
+class PlanOutlineUnavailable(Exception):
+    """The outline call was shed or failed; `reply` is the template to send instead of a plan."""
+
+    def __init__(self, reply: str):
+        super().__init__("plan outline unavailable")
+        self.reply = reply
+
+
+def plan_sections(user_text: str, mode: Optional[str] = None) -> Optional[Tuple[int, str]]:
+    """
+    Return (length in units, unit) when a request should be generated in parallel.
+
+    `mode` comes from the task params: "single" never decomposes, "decompose"
+    always does, and anything else decides from the length asked for.
+    """
+    if not llm_available() or mode == "single":
+        return None
+
+    match = PLAN_LENGTH_PATTERN.search(user_text)
+    if not match:
+        return (PLAN_FANOUT_MIN_SECTIONS, "week") if mode == "decompose" else None
+
+    count = int(match.group(1))
+    if count < PLAN_FANOUT_MIN_SECTIONS and mode != "decompose":
+        return None
+    return max(count, 1), match.group(2).lower()
+
+
+def section_spans(count: int) -> List[Tuple[int, int]]:
+    """
+    Split `count` units into at most PLAN_FANOUT_MAX_SECTIONS (first, last) ranges.
+
+    A 52-week plan becomes 13 sections of 4 weeks, so long plans keep their
+    full length instead of being cut down to the section limit.
+    """
+    per_section = -(-count // PLAN_FANOUT_MAX_SECTIONS)
+    return [(first, min(first + per_section - 1, count)) for first in range(1, count + 1, per_section)]
+
+
+def plan_section_count(count: int) -> int:
+    return len(section_spans(count))
+
+
+def section_label(unit: str, first: int, last: int) -> str:
+    return f"{unit.title()} {first}" if first == last else f"{unit.title()}s {first}–{last}"
+
+
+async def outline_plan(user_text: str, count: int, unit: str) -> List[str]:
+    labels = [section_label(unit, first, last) for first, last in section_spans(count)]
+    raw = await generate_reply(OUTLINE_PROMPT.format(
+        count=count, unit=unit, sections=len(labels), labels=", ".join(labels), request=user_text
+    ))
+    if isinstance(raw, FallbackReply):
+        raise PlanOutlineUnavailable(raw)
+    titles = [OUTLINE_LINE_PREFIX.sub("", line).strip() for line in raw.splitlines()]
+    titles = [t for t in titles if t][:len(labels)]
+    titles += labels[len(titles):]
+    return titles
+
+
+async def iter_plan_sections(user_text: str, count: int, unit: str) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Generate every section of a plan concurrently, yielding them in order.
+
+    One short outline call fixes the section titles, then each section is its
+    own LLM call. Sections go through admission control and a per-plan
+    semaphore, so one large plan cannot take every LLM slot. Raises
+    PlanOutlineUnavailable, before yielding anything, when the outline is shed.
+    """
+    spans = section_spans(count)
+    titles = await outline_plan(user_text, count, unit)
+    labels = [section_label(unit, first, last) for first, last in spans]
+    outline = "\n".join(f"{label}. {title}" for label, title in zip(labels, titles))
+    per_plan = asyncio.Semaphore(PLAN_FANOUT_CONCURRENCY)
+
+    async def section(label: str, title: str) -> str:
+        prompt = SECTION_PROMPT.format(
+            count=count, unit=unit, request=user_text, outline=outline, label=label, title=title
+        )
+        async with per_plan:
+            try:
+                async with admission.admit():
+                    body = await run_gemini(prompt)
+            except Overloaded:
+                body = None
+        if body is None or isinstance(body, FallbackReply):
+            body = SECTION_UNAVAILABLE.format(label=label)
+        return f"{label} — {title}\n{body}"
+
+    tasks = [asyncio.create_task(section(label, title)) for label, title in zip(labels, titles)]
+    try:
+        for index, task in enumerate(tasks):
+            yield index, await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def generate_plan(user_text: str, count: int, unit: str) -> str:
+    logger.info({"event": "plan_fanout", "length": count, "sections": plan_section_count(count), "unit": unit})
+    try:
+        sections = [text async for _, text in iter_plan_sections(user_text, count, unit)]
+    except PlanOutlineUnavailable as e:
+        return e.reply
+    return "\n\n".join(sections)
+
+
+PLAN_HEADING = re.compile(
+    r"^\W*(week|day|month|module|step|phase)s?\s+(\d+)(?:[–-](\d+))?\s*(?:[—–:.)-]+\s*)?(.*)$",
+    re.IGNORECASE,
+)
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30}
+MAX_PLAN_MILESTONES = 52
+
+
+def _clean(line: str) -> str:
+    return re.sub(r"[*_#`]+", "", line).strip()
+
+
+def plan_milestones(plan_text: str, start: Optional[datetime] = None) -> List[Tuple[str, datetime]]:
+    """
+    Parse a generated plan into (title, due_date) milestones.
+
+    Headings such as "Week 3 — Mini Projects" are used when present, otherwise
+    numbered or bulleted items. A heading is due once the units it covers are over;
+    items are due one week after the previous one.
+    """
+    start = start or datetime.utcnow()
+    milestones = []
+    for line in plan_text.splitlines():
+        match = PLAN_HEADING.match(_clean(line))
+        if match:
+            unit, first, title = match.group(1).lower(), int(match.group(2)), match.group(4)
+            last = int(match.group(3) or first)
+            label = section_label(unit, first, last)
+            title = title.split(":")[0].strip() or label
+            days = UNIT_DAYS.get(unit, 7) * last
+            milestones.append((f"{label} — {title}", start + timedelta(days=days)))
+
+    if not milestones:
+        items = [
+            OUTLINE_LINE_PREFIX.sub("", _clean(line)).strip()
+            for line in plan_text.splitlines() if OUTLINE_LINE_PREFIX.match(line)
+        ]
+        milestones = [(item, start + timedelta(weeks=i + 1)) for i, item in enumerate(items) if item]
+
+    return milestones[:MAX_PLAN_MILESTONES]
+
+
+async def save_plan(db: Database, user_id: UUID, title: str, plan_text: str) -> dict:
+    """Store a plan as a goal with its milestones in one statement."""
+    milestones = plan_milestones(plan_text)
+    return await GoalRepository(db).create_goal_with_milestones(
+        user_id, title, plan_text, "active", milestones
+    )
@@ -0,0 +1,208 @@
+"""
+progress/update ingestion: one XADD on the request path, batched writes in the worker
+
+The API appends each update to a Redis Stream. A consumer group in the worker
+reads it in batches, keeps only the latest update per goal and per milestone,
+and applies each batch with one bulk UPDATE per table, so database writes grow
+with the number of distinct entities rather than the number of events.
+
+Updates only touch the sender's own goals. Each row remembers the stream position
+of the last update applied to it, so a batch that failed and is redelivered later
+cannot overwrite newer updates. A redelivered batch that fails again is applied
+one event at a time; an event that still fails after PROGRESS_MAX_DELIVERIES
+deliveries is moved to the dead-letter stream.
+"""
+
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+from databases import Database
+from agent.core.config import (
+    INSTANCE_ID, PROGRESS_BATCH_SIZE, PROGRESS_BLOCK_MS, PROGRESS_CLAIM_IDLE_MS, PROGRESS_MAX_DELIVERIES,
+    PROGRESS_STREAM_MAXLEN
+)
+from agent.core.logger import logger
+from agent.core.tracing import span
+from agent.db.repositories.goals import GoalRepository
+from agent.db.repositories.milestones import MilestoneRepository
+from agent.models.agent_rpc import ProgressUpdateParams
+
+PROGRESS_STREAM = "progress_updates"
+PROGRESS_GROUP = "progress_appliers"
+DEAD_LETTER_STREAM = "progress_updates:dead"
+
+
+class ProgressError(ValueError):
+    pass
+
+
+def progress_fields(params: ProgressUpdateParams) -> Dict[str, str]:
+    """Flatten progress/update params (ids and status already validated) into stream fields."""
+    fields = {"user_id": str(params.user_id), "goal_id": str(params.goal_id)}
+    if params.milestone_id is not None:
+        if params.completed is None:
+            raise ProgressError("completed (true/false) is required with milestone_id")
+        fields["milestone_id"] = str(params.milestone_id)
+        fields["completed"] = "1" if params.completed else "0"
+
+    if params.status is not None:
+        fields["status"] = params.status
+
+    if len(fields) == 2:
+        raise ProgressError("Nothing to update: pass status, or milestone_id with completed")
+    return fields
+
+
+async def publish_progress(redis_, params: ProgressUpdateParams) -> str:
+    """Append one update to the stream; the only work done on the request path."""
+    entry_id = await redis_.xadd(
+        PROGRESS_STREAM, progress_fields(params), maxlen=PROGRESS_STREAM_MAXLEN, approximate=True
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def entry_version(entry_id: str) -> int:
+    """A stream id ("<ms>-<seq>") as one increasing integer that fits a bigint."""
+    ms, seq = entry_id.split("-")
+    return int(ms) * 1_000_000 + int(seq)
+
+
+def coalesce(
+    entries: List[Tuple[str, dict]]
+) -> Tuple[Dict[Tuple[str, str], Tuple[str, int]], Dict[Tuple[str, str, str], Tuple[bool, int]]]:
+    """Reduce stream entries (oldest first) to the last status, and its version, per goal and milestone."""
+    goals: Dict[Tuple[str, str], Tuple[str, int]] = {}
+    milestones: Dict[Tuple[str, str, str], Tuple[bool, int]] = {}
+    for entry_id, raw in entries:
+        fields = {_text(k): _text(v) for k, v in raw.items()}
+        user_id, goal_id = fields.get("user_id"), fields.get("goal_id")
+        if not user_id or not goal_id:
+            continue
+        version = entry_version(_text(entry_id))
+        if fields.get("status"):
+            goals[(user_id, goal_id)] = (fields["status"], version)
+        if fields.get("milestone_id"):
+            milestones[(user_id, goal_id, fields["milestone_id"])] = (fields.get("completed") == "1", version)
+    return goals, milestones
+
+
+async def apply_progress(db: Database, entries: List[Tuple[str, dict]]) -> Tuple[int, int]:
+    goals, milestones = coalesce(entries)
+    with span("progress.apply", events=len(entries), goals=len(goals), milestones=len(milestones)):
+        async with db.transaction():
+            changed_goals = await GoalRepository(db).bulk_update_goal_status([
+                (user_id, goal_id, _status, version) for (user_id, goal_id), (_status, version) in goals.items()
+            ])
+            changed_milestones = await MilestoneRepository(db).bulk_update_milestone_status([
+                (user_id, goal_id, milestone_id, completed, version)
+                for (user_id, goal_id, milestone_id), (completed, version) in milestones.items()
+            ])
+    logger.info({
+        "event": "progress_applied", "events": len(entries),
+        "goals": changed_goals, "milestones": changed_milestones,
+    })
+    return changed_goals, changed_milestones
+
+
+async def delivery_counts(redis_, consumer: str, entry_ids: List[str]) -> Dict[str, int]:
+    pending = await redis_.xpending_range(
+        PROGRESS_STREAM, PROGRESS_GROUP, min=entry_ids[0], max=entry_ids[-1],
+        count=len(entry_ids), consumername=consumer,
+    )
+    return {_text(p["message_id"]): p["times_delivered"] for p in pending}
+
+
+async def dead_letter(redis_, entry_id: str, fields: dict, deliveries: int, error: str) -> None:
+    logger.error({
+        "event": "progress_update_dead_lettered", "entry_id": entry_id, "deliveries": deliveries, "error": error,
+    })
+    await redis_.xadd(
+        DEAD_LETTER_STREAM,
+        {**{_text(k): _text(v) for k, v in fields.items()}, "entry_id": entry_id, "deliveries": deliveries,
+         "error": error},
+        maxlen=PROGRESS_STREAM_MAXLEN, approximate=True,
+    )
+
+
+async def apply_batch(db: Database, redis_, consumer: str, entries: List[Tuple[str, dict]], redelivered: bool) -> None:
+    """Apply a batch and acknowledge what was applied or dead-lettered."""
+    entry_ids = [_text(entry_id) for entry_id, _ in entries]
+    # entries trimmed from the stream while pending come back without fields
+    valid = [(entry_id, fields) for entry_id, (_, fields) in zip(entry_ids, entries) if fields]
+    try:
+        await apply_progress(db, valid)
+        await redis_.xack(PROGRESS_STREAM, PROGRESS_GROUP, *entry_ids)
+        return
+    except Exception:
+        if not redelivered:
+            raise
+
+    # failed again after redelivery: isolate the events that cannot be applied
+    counts = await delivery_counts(redis_, consumer, entry_ids)
+    done = [entry_id for entry_id, (_, fields) in zip(entry_ids, entries) if not fields]
+    for entry_id, fields in valid:
+        try:
+            await apply_progress(db, [(entry_id, fields)])
+            done.append(entry_id)
+        except Exception as e:
+            if counts.get(entry_id, 0) >= PROGRESS_MAX_DELIVERIES:
+                await dead_letter(redis_, entry_id, fields, counts[entry_id], str(e))
+                done.append(entry_id)
+    if done:
+        await redis_.xack(PROGRESS_STREAM, PROGRESS_GROUP, *done)
+
+
+async def ensure_group(redis_) -> None:
+    try:
+        await redis_.xgroup_create(PROGRESS_STREAM, PROGRESS_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def consume_progress(db: Database, redis_, consumer: Optional[str] = None) -> None:
+    """
+    Run forever as one consumer of the group. Entries are acknowledged only after
+    their batch is committed; a crashed consumer's entries are claimed by another
+    once they have been pending for PROGRESS_CLAIM_IDLE_MS.
+    """
+    consumer = consumer or f"{INSTANCE_ID}-{os.getpid()}"
+    await ensure_group(redis_)
+    logger.info("Consuming %s as %s", PROGRESS_STREAM, consumer)
+
+    loop = asyncio.get_running_loop()
+    claim_from, next_claim, delay = "0-0", 0.0, 1
+    while True:
+        try:
+            entries, redelivered = [], False
+            if loop.time() >= next_claim:
+                claimed = await redis_.xautoclaim(
+                    PROGRESS_STREAM, PROGRESS_GROUP, consumer,
+                    min_idle_time=PROGRESS_CLAIM_IDLE_MS, start_id=claim_from, count=PROGRESS_BATCH_SIZE,
+                )
+                claim_from, entries = _text(claimed[0]), claimed[1]
+                redelivered = bool(entries)
+                if claim_from == "0-0":
+                    next_claim = loop.time() + PROGRESS_CLAIM_IDLE_MS / 1000
+            if not entries:
+                response = await redis_.xreadgroup(
+                    PROGRESS_GROUP, consumer, {PROGRESS_STREAM: ">"},
+                    count=PROGRESS_BATCH_SIZE, block=PROGRESS_BLOCK_MS,
+                )
+                entries = response[0][1] if response else []
+            if not entries:
+                continue
+
+            await apply_batch(db, redis_, consumer, entries, redelivered)
+            delay = 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # unacknowledged entries stay pending and are claimed again after the idle time
+            logger.error("Progress batch failed, retrying in %ss. Error: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
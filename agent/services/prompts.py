@@ -0,0 +1,163 @@
+"""
+Prompt assembly: a static, cacheable prefix and a per-turn suffix
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional, Tuple
+from agent.core.config import (
+    GEMINI_MODEL, PROMPT_CACHE_MIN_CHARS, PROMPT_CACHE_TTL_SECONDS, PROMPT_PREFIX_CACHE_SIZE
+)
+from agent.core.logger import logger
+from agent.core.metrics import cache_requests
+from agent.core.tracing import span
+from agent.services.provider import gemini
+
+if TYPE_CHECKING:
+    from google.generativeai import GenerativeModel
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """
+    Everything that stays the same across a user's turns: the coach instructions
+    plus the user's profile and goals. Its version is a hash of the content, so a
+    profile or goal change yields a new version and never reuses a stale handle.
+    """
+    system_instruction: str
+    context: str = ""
+
+    @property
+    def text(self) -> str:
+        return f"{self.system_instruction}\n{self.context}".strip()
+
+    @property
+    def version(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()[:16]
+
+
+def render_profile(profile: Optional[dict]) -> str:
+    if not profile:
+        return ""
+
+    goals = profile["goals"]
+    if isinstance(goals, str):
+        goals = json.loads(goals)
+
+    lines = [f"About the user: {profile['name'] or 'unknown name'}"]
+    if goals:
+        lines.append("Their active goals:")
+        lines += [f"- {g['title']}" + (f": {g['description']}" if g["description"] else "") for g in goals]
+    return "\n".join(lines)
+
+
+@dataclass
+class _Handle:
+    model: "GenerativeModel"
+    # provider cached content, or None when the prefix is sent as a system instruction
+    cached: object
+    expires: float
+    # requests currently generating with this handle; its cache is deleted only once this is 0
+    users: int = 0
+    retired: bool = False
+
+
+_handles: "OrderedDict[str, _Handle]" = OrderedDict()
+# version -> the one creation in progress, awaited by every request that missed meanwhile
+_creating: Dict[str, "asyncio.Future[_Handle]"] = {}
+
+
+def _create_handle(prefix: PromptPrefix) -> Tuple["GenerativeModel", object]:
+    genai = gemini()
+    # Provider-side caching only pays off (and is only accepted) for long prefixes;
+    # shorter ones are still sent once per model as a system instruction.
+    if len(prefix.text) >= PROMPT_CACHE_MIN_CHARS:
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=f"models/{GEMINI_MODEL}",
+                display_name=f"coach-prefix-{prefix.version}",
+                system_instruction=prefix.text,
+                ttl=timedelta(seconds=PROMPT_CACHE_TTL_SECONDS),
+            )
+            return genai.GenerativeModel.from_cached_content(cached_content=cached), cached
+        except Exception as e:
+            logger.warning("Prompt prefix caching unavailable, using system instruction. Error: %s", e)
+
+    return genai.GenerativeModel(GEMINI_MODEL, system_instruction=prefix.text), None
+
+
+def _release(cached) -> None:
+    if cached is None:
+        return
+    try:
+        cached.delete()
+    except Exception as e:
+        logger.debug("Could not delete cached prompt prefix. Error: %s", e)
+
+
+def _retire(handle: _Handle) -> None:
+    """Drop a replaced or evicted handle, deleting its cache once no request holds it."""
+    handle.retired = True
+    if not handle.users and handle.cached is not None:
+        cached, handle.cached = handle.cached, None
+        asyncio.get_running_loop().run_in_executor(None, _release, cached)
+
+
+async def _create(prefix: PromptPrefix) -> _Handle:
+    model, cached = await asyncio.to_thread(_create_handle, prefix)
+    # expire locally a little before the provider does
+    handle = _Handle(model, cached, time.monotonic() + PROMPT_CACHE_TTL_SECONDS * 0.9)
+    stale = _handles.pop(prefix.version, None)
+    if stale is not None:
+        _retire(stale)
+    _handles[prefix.version] = handle
+
+    while len(_handles) > PROMPT_PREFIX_CACHE_SIZE:
+        _, evicted = _handles.popitem(last=False)
+        _retire(evicted)
+
+    return handle
+
+
+async def _handle_for(prefix: PromptPrefix) -> _Handle:
+    handle = _handles.get(prefix.version)
+    if handle and handle.expires > time.monotonic():
+        _handles.move_to_end(prefix.version)
+        cache_requests.inc(cache="prompt_prefix", result="hit")
+        return handle
+
+    creating = _creating.get(prefix.version)
+    if creating is None:
+        cache_requests.inc(cache="prompt_prefix", result="miss")
+        creating = asyncio.ensure_future(_create(prefix))
+        _creating[prefix.version] = creating
+        creating.add_done_callback(lambda _: _creating.pop(prefix.version, None))
+    else:
+        cache_requests.inc(cache="prompt_prefix", result="coalesced")
+    # a cancelled request must not cancel the creation other requests are waiting on
+    return await asyncio.shield(creating)
+
+
+@asynccontextmanager
+async def model_for(prefix: PromptPrefix) -> AsyncIterator["GenerativeModel"]:
+    """
+    Hold a model bound to `prefix` for one request.
+
+    Concurrent misses for the same prefix share one handle creation, and a
+    handle's provider cache is only deleted once no request holds it.
+    """
+    with span("llm.model_for"):
+        handle = await _handle_for(prefix)
+    handle.users += 1
+    try:
+        yield handle.model
+    finally:
+        handle.users -= 1
+        if handle.retired:
+            _retire(handle)
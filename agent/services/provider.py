@@ -0,0 +1,40 @@
+"""
+Lazy access to the Gemini SDK
+
+google.generativeai is slow to import, so it is loaded and configured on the
+first LLM call instead of when the API process starts. With LLM_PROVIDER=fake
+the stand-in in agent.services.fake_llm is returned instead.
+"""
+
+import functools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+
+def llm_available() -> bool:
+    """Whether LLM calls can be made, rather than served from templates."""
+    from agent.core.config import LLM_PROVIDER
+
+    if LLM_PROVIDER == "fake":
+        return True
+    from agent.core.config import GEMINI_API_KEY
+
+    return bool(GEMINI_API_KEY)
+
+
+@functools.lru_cache(maxsize=None)
+def gemini() -> "genai":
+    from agent.core.config import LLM_PROVIDER
+
+    if LLM_PROVIDER == "fake":
+        from agent.services import fake_llm
+
+        return fake_llm
+
+    import google.generativeai as genai
+    from agent.core.config import GEMINI_API_KEY
+
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
@@ -0,0 +1,31 @@
+"""
+Full-text search over a user's history, shaped for RPC results and prompt context
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+from databases import Database
+from agent.db.repositories.search import SearchRepository
+
+MAX_SEARCH_RESULTS = 50
+
+
+def search_context(results: List[dict], max_chars: int = 2000) -> str:
+    """One line per hit, best first, cut at max_chars so it can be pasted into a prompt."""
+    lines, used = [], 0
+    for hit in results:
+        label = hit["kind"] if not hit.get("title") else f'{hit["kind"]} "{hit["title"]}"'
+        line = f'[{hit["created_at"]:%Y-%m-%d}] {label}: {" ".join(hit["snippet"].split())}'
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+async def search_history(
+    db: Database, user_id: UUID, query: str, limit: int = 10, since: Optional[datetime] = None
+) -> dict:
+    results = await SearchRepository(db).search(user_id, query, min(max(limit, 1), MAX_SEARCH_RESULTS), since)
+    return {"results": results, "context": search_context(results)}
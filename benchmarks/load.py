@@ -0,0 +1,299 @@
+"""
+Load test: drive /coach, /rpc and /health/status at a target rate against a fake LLM
+
+The app runs in-process (httpx ASGITransport) or under uvicorn in a subprocess,
+with LLM_PROVIDER=fake so latency comes from FAKE_LLM_* rather than the network.
+Arrivals are open-loop: requests start on schedule whether or not earlier ones
+finished, and latency is measured from the scheduled start. The in-process app
+runs its startup handlers, so Redis and Postgres are used when reachable. A JSON-RPC
+reply carrying an `error` counts as an error, under status "<http>/rpc<code>".
+
+    python benchmarks/load.py --rps 50 --duration 30 --output load.json
+    python benchmarks/load.py --target uvicorn --workers 4 --rps 200 --llm-latency 1.0
+    python benchmarks/load.py --baseline load.json --tolerance 0.2
+
+With --baseline the script exits non-zero when throughput drops or any
+scenario's p95 grows by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+BASE = "/a2a-coach"
+
+SCENARIOS = {
+    "coach": ("POST", f"{BASE}/coach", lambda i: {
+        "id": f"load-{i}", "message": "Help me plan a study week for SQL",
+        "sender": f"load-user-{i % 100}", "channel_id": None,
+    }),
+    "tasks_send": ("POST", f"{BASE}/rpc", lambda i: {
+        "jsonrpc": "2.0", "method": "tasks/send", "id": f"load-{i}",
+        "params": {"task": {"id": f"task-{i}", "parts": [{"type": "text", "text": "Coach me on public speaking"}]},
+                   "mode": "single"},
+    }),
+    "message_send": ("POST", f"{BASE}/rpc", lambda i: {
+        "jsonrpc": "2.0", "method": "message/send", "id": f"load-{i}",
+        "params": {"message": "What should I focus on today?", "sender": f"load-user-{i % 100}"},
+    }),
+    "progress_update": ("POST", f"{BASE}/rpc", lambda i: {
+        "jsonrpc": "2.0", "method": "progress/update", "id": f"load-{i}",
+        "params": {"user_id": str(uuid.uuid5(uuid.NAMESPACE_OID, f"user-{i % 100}")),
+                   "goal_id": str(uuid.uuid5(uuid.NAMESPACE_OID, f"goal-{i % 500}")),
+                   "milestone_id": str(uuid.uuid5(uuid.NAMESPACE_OID, f"milestone-{i % 4000}")),
+                   "completed": i % 3 == 0, "sender": f"load-user-{i % 100}"},
+    }),
+    "health": ("GET", f"{BASE}/health/status", None),
+}
+
+DEFAULT_MIX = "coach=1,tasks_send=1,message_send=2,progress_update=4,health=1"
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def app_env(args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("GEMINI_API_KEY", "")
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.update({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_SECONDS": str(args.llm_latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.llm_tokens_per_second),
+        "FAKE_LLM_OUTPUT_TOKENS": str(args.llm_output_tokens),
+    })
+    return env
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": max(values, default=0.0) * 1000,
+    }
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Record how late the event loop wakes a timer; the app shares this loop in-process."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def rpc_error_code(response):
+    """The JSON-RPC error code of a 2xx reply, None when it succeeded or is not JSON-RPC."""
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    error = body.get("error") if isinstance(body, dict) and "jsonrpc" in body else None
+    if error is None:
+        return None
+    return error.get("code", "") if isinstance(error, dict) else ""
+
+
+async def drive(client, mix: Dict[str, float], rps: float, duration: float, max_in_flight: int) -> dict:
+    names, weights = list(mix), list(mix.values())
+    results: Dict[str, dict] = {n: {"latencies": [], "errors": 0, "status": {}} for n in names}
+    gate = asyncio.Semaphore(max_in_flight)
+    loop = asyncio.get_running_loop()
+    tasks = []
+
+    async def one(i: int, name: str, scheduled: float) -> None:
+        method, path, body = SCENARIOS[name]
+        result = results[name]
+        async with gate:
+            try:
+                response = await client.request(method, path, json=body(i) if body else None)
+                status = str(response.status_code)
+                rpc_error = rpc_error_code(response)
+                if rpc_error is not None:
+                    status = f"{status}/rpc{rpc_error}"
+                if response.status_code >= 400 or rpc_error is not None:
+                    result["errors"] += 1
+            except Exception as e:
+                status = type(e).__name__
+                result["errors"] += 1
+        result["latencies"].append(loop.time() - scheduled)
+        result["status"][status] = result["status"].get(status, 0) + 1
+
+    started = loop.time()
+    total = int(rps * duration)
+    for i in range(total):
+        scheduled = started + i / rps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i, random.choices(names, weights)[0], scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+
+    report = {}
+    for name, result in results.items():
+        report[name] = {
+            "requests": len(result["latencies"]),
+            "errors": result["errors"],
+            "status": result["status"],
+            **summarize(result["latencies"]),
+        }
+    all_latencies = [v for r in results.values() for v in r["latencies"]]
+    completed = len(all_latencies)
+    return {
+        "elapsed_s": elapsed,
+        "requests": completed,
+        "throughput_rps": completed / elapsed if elapsed else 0.0,
+        "overall": summarize(all_latencies),
+        "scenarios": report,
+    }
+
+
+async def run_in_process(args, mix) -> dict:
+    os.environ.update(app_env(args))
+    import httpx
+    import agent.main
+
+    lag: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+    app = agent.main.app
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport sends no lifespan events; run startup/shutdown so Redis and the database connect
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            report = await drive(client, mix, args.rps, args.duration, args.max_in_flight)
+    stop.set()
+    await monitor
+    report["event_loop_lag"] = {"source": "app", **summarize(lag)}
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_under_uvicorn(args, mix) -> dict:
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "agent.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=app_env(args),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get(f"{BASE}/health/status")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise SystemExit("uvicorn did not become ready")
+                await asyncio.sleep(0.2)
+
+            lag: List[float] = []
+            stop = asyncio.Event()
+            monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+            report = await drive(client, mix, args.rps, args.duration, args.max_in_flight)
+            stop.set()
+            await monitor
+        # the server is out of process; this only shows whether the load generator kept up
+        report["event_loop_lag"] = {"source": "client", **summarize(lag)}
+        return report
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['throughput_rps']:.1f} -> {report['throughput_rps']:.1f} rps")
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name} p95: {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (--target uvicorn)")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="seconds of arrivals")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,...")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--llm-output-tokens", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=pathlib.Path)
+    parser.add_argument("--baseline", type=pathlib.Path)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    runner = run_under_uvicorn if args.target == "uvicorn" else run_in_process
+    report = asyncio.run(runner(args, mix))
+    report["config"] = {
+        k: v for k, v in vars(args).items() if k not in ("output", "baseline")
+    }
+    report["python"] = sys.version.split()[0]
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Cold-start benchmark: import time of agent.main and latency of the first requests
+
+Each run happens in a fresh interpreter so nothing is cached between samples.
+
+    python benchmarks/startup.py --runs 10 --output startup.json
+    python benchmarks/startup.py --baseline startup.json --tolerance 0.25
+
+With --baseline the script exits non-zero when any median regresses by more
+than the tolerance, so it can guard CI against slow imports creeping back in.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+PROBE = r"""
+import asyncio, json, time
+started = time.perf_counter()
+import agent.main
+imported = time.perf_counter()
+
+import httpx
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=agent.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        await client.get("/a2a-coach/health/status")
+        t1 = time.perf_counter()
+        await client.post("/a2a-coach/rpc", json={
+            "jsonrpc": "2.0", "method": "message/send", "id": "bench",
+            "params": {"message": "help me plan a study week"},
+        })
+        t2 = time.perf_counter()
+    return t1 - t0, t2 - t1
+
+health, rpc = asyncio.run(first_requests())
+print(json.dumps({
+    "import_s": imported - started,
+    "first_health_s": health,
+    "first_rpc_s": rpc,
+}))
+"""
+
+
+def probe_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    # an empty key keeps run_gemini on the template path, so no network is involved
+    env.setdefault("GEMINI_API_KEY", "")
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    return env
+
+
+def run_once() -> dict:
+    env = probe_env()
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    )
+    sample = json.loads(out.stdout.strip().splitlines()[-1])
+    sample["process_s"] = time.perf_counter() - started
+    return sample
+
+
+def slowest_imports(limit: int) -> list:
+    """Top modules by cumulative import time, from python -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import agent.main"],
+        cwd=ROOT, env=probe_env(), check=True, capture_output=True, text=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:limit]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to report")
+    parser.add_argument("--output", type=pathlib.Path)
+    parser.add_argument("--baseline", type=pathlib.Path)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    samples = [run_once() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "median": {k: statistics.median(s[k] for s in samples) for k in samples[0]},
+        "max": {k: max(s[k] for s in samples) for k in samples[0]},
+        "slowest_imports": slowest_imports(args.top),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["median"]
+        regressions = {
+            k: (baseline[k], v) for k, v in report["median"].items()
+            if k in baseline and v > baseline[k] * (1 + args.tolerance)
+        }
+        for k, (before, after) in regressions.items():
+            print(f"REGRESSION {k}: {before:.3f}s -> {after:.3f}s", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import asyncio
+import uuid
+import pytest
+from agent.api.routes.agents import a2a
+from agent.core import admission as admission_module
+from agent.core.admission import HIGH_PRIORITY, LOW_PRIORITY, AdmissionController, Overloaded
+from agent.services import agent
+from agent.services.agent import FallbackReply
+
+
+def controller(**overrides):
+    limits = {"max_in_flight": 2, "max_queue": 2, "max_queue_wait": 1.0, "low_priority_queue": 1}
+    return AdmissionController(**{**limits, **overrides})
+
+
+def test_in_flight_is_bounded_and_waiters_get_freed_slots():
+    async def run():
+        gate = controller(max_queue=8)
+        release = asyncio.Event()
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with gate.admit(HIGH_PRIORITY):
+                peak = max(peak, gate.in_flight)
+                await release.wait()
+
+        calls = [asyncio.create_task(call()) for _ in range(4)]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert (gate.in_flight, gate.waiting) == (2, 2)
+        release.set()
+        await asyncio.gather(*calls)
+        return gate, peak
+
+    gate, peak = asyncio.run(run())
+    assert peak == 2
+    assert (gate.in_flight, gate.waiting, gate.shed) == (0, 0, 0)
+
+
+def test_high_priority_is_refused_once_the_queue_is_full():
+    gate = controller()
+    gate.waiting = 2
+    with pytest.raises(Overloaded) as refused:
+        gate.check(HIGH_PRIORITY)
+    assert refused.value.retry_after >= 1
+    assert gate.shed == 1
+
+
+def test_waiting_past_the_budget_is_refused():
+    async def run():
+        gate = controller(max_in_flight=1, max_queue_wait=0.05)
+        async with gate.admit():
+            with pytest.raises(Overloaded):
+                async with gate.admit():
+                    pass
+        return gate
+
+    gate = asyncio.run(run())
+    assert gate.shed == 1
+    assert gate.waiting == 0
+    assert gate._queue_wait > 0
+
+
+def test_low_priority_is_shed_first_and_never_takes_a_slot():
+    async def run():
+        gate = controller()
+        async with gate.admit(LOW_PRIORITY):
+            assert gate.in_flight == 0
+        gate.waiting = 1
+        gate.check(HIGH_PRIORITY)
+        with pytest.raises(Overloaded):
+            gate.check(LOW_PRIORITY)
+
+    asyncio.run(run())
+
+
+def test_queue_wait_decays_and_is_zero_once_a_slot_is_free(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+    gate = controller(max_in_flight=1)
+    gate.in_flight = 1
+    gate._record_wait(5.0)
+    assert gate.queue_wait == pytest.approx(1.0)
+
+    now[0] += admission_module.QUEUE_WAIT_HALF_LIFE
+    assert gate.queue_wait == pytest.approx(0.5)
+
+    gate.in_flight = 0
+    assert gate.queue_wait == 0
+
+
+def test_shed_reply_is_the_template_plan(monkeypatch):
+    gate = controller()
+    gate.waiting = 2
+    monkeypatch.setattr(agent, "admission", gate)
+
+    reply = asyncio.run(agent.generate_reply("Give me a 2-week plan to learn Go"))
+    assert isinstance(reply, FallbackReply)
+
+
+def test_low_priority_rpc_gets_503_when_overloaded(client, monkeypatch):
+    gate = controller()
+    gate.waiting = 1
+    monkeypatch.setattr(a2a, "admission", gate)
+
+    response = client.post("/a2a-coach/rpc", json={
+        "jsonrpc": "2.0", "id": "1", "method": "progress/update",
+        "params": {"user_id": str(uuid.uuid4()), "goal_id": str(uuid.uuid4()), "completed": True},
+    })
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
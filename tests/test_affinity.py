@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from starlette.responses import Response
+from agent.api.routes import metrics_route
+from agent.api.routes.agents import a2a
+from agent.core.affinity import (
+    AFFINITY_NODE_HEADER, ROUTING_KEY_HEADER, HashRing, routing_key, routing_token, set_affinity_headers
+)
+from agent.services.agent import FallbackReply
+
+KEYS = [f"conversation-{i}" for i in range(5000)]
+
+
+def test_non_latin1_keys_are_hashed_into_the_header():
+    response = Response()
+    set_affinity_headers(response, routing_key(None, "канал-😀"))
+
+    assert response.headers[ROUTING_KEY_HEADER] == routing_token("канал-😀")
+    assert len(routing_token("канал-😀")) == 16
+
+
+def test_routing_token_is_stable():
+    assert routing_token("session_123") == routing_token("session_123")
+    assert routing_token("session_123") != routing_token("session_124")
+
+
+def test_a_routing_key_sent_by_the_client_wins():
+    assert routing_key("ctx-42", "sender-1") == "ctx-42"
+    assert routing_key(None, "sender-1") == routing_token("sender-1")
+    assert routing_key(None, None) is None
+
+
+def test_ring_assignment_is_stable_and_spread():
+    ring = HashRing(["app-0", "app-1", "app-2"])
+    again = HashRing(["app-2", "app-0", "app-1"])
+
+    owners = [ring.node_for(k) for k in KEYS]
+    assert owners == [again.node_for(k) for k in KEYS]
+    for node in ring.nodes:
+        assert 0.2 < owners.count(node) / len(KEYS) < 0.47
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    ring = HashRing(["app-0", "app-1", "app-2"])
+    before = {k: ring.node_for(k) for k in KEYS}
+    ring.add("app-3")
+
+    moved = [k for k in KEYS if ring.node_for(k) != before[k]]
+    assert all(ring.node_for(k) == "app-3" for k in moved)
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+
+def test_removing_a_node_only_moves_its_keys():
+    ring = HashRing(["app-0", "app-1", "app-2", "app-3"])
+    before = {k: ring.node_for(k) for k in KEYS}
+    ring.remove("app-3")
+
+    assert all(ring.node_for(k) == before[k] for k in KEYS if before[k] != "app-3")
+    assert all(ring.node_for(k) != "app-3" for k in KEYS)
+
+
+def test_shed_coach_request_is_queued_for_the_owning_worker(client, monkeypatch):
+    queued = []
+
+    async def shed(*args, **kwargs):
+        return FallbackReply("template")
+
+    monkeypatch.setattr(a2a, "run_gemini_with_deadline", shed)
+    monkeypatch.setattr(a2a, "llm_available", lambda: True)
+    monkeypatch.setattr(a2a, "enqueue_for", lambda key, func, *args: queued.append((key, func, args)))
+
+    response = client.post(
+        "/a2a-coach/coach", json={"message": "Plan my week", "channel_id": "ch-1", "sender": "u-1"},
+        headers={ROUTING_KEY_HEADER: "ctx-7"},
+    )
+
+    assert response.json()["message"] == a2a.COACH_ACK_MESSAGE
+    assert response.headers[ROUTING_KEY_HEADER] == "ctx-7"
+    assert response.headers[AFFINITY_NODE_HEADER]
+    assert queued == [("ctx-7", "agent.core.worker.long_coach_task", ("Plan my week", "ch-1"))]
+
+
+def test_metrics_report_every_affinity_queue(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(metrics_route, "ring", HashRing(["app-0", "app-1"]))
+    redis_ = fakeredis.FakeAsyncRedis()
+
+    async def scrape():
+        await redis_.rpush("rq:queue:telex_tasks:app-1", "job-1", "job-2")
+        return (await metrics_route.metrics(redis_)).body.decode()
+
+    body = asyncio.run(scrape())
+    assert metrics_route.queue_names() == ("telex_tasks", "telex_tasks:app-0", "telex_tasks:app-1")
+    assert 'queue="telex_tasks:app-1"} 2' in body
+    assert 'queue="telex_tasks:app-0"} 0' in body
@@ -0,0 +1,92 @@
+import asyncio
+import socket
+import pytest
+from agent.services import attachments
+from agent.services.attachments import AttachmentError, check_uri, pinned_request
+
+
+def resolving_to(*addresses):
+    async def getaddrinfo(host, port, **kwargs):
+        return [
+            (socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, port))
+            for a in addresses
+        ]
+
+    return getaddrinfo
+
+
+def test_check_uri_returns_the_address_it_checked():
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.getaddrinfo = resolving_to("93.184.216.34")
+        return await check_uri("https://files.example.com/a.png")
+
+    assert asyncio.run(run()) == "93.184.216.34"
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "::ffff:192.168.1.1"])
+def test_check_uri_refuses_non_public_hosts(address):
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.getaddrinfo = resolving_to("93.184.216.34", address)
+        await check_uri("https://files.example.com/a.png")
+
+    with pytest.raises(AttachmentError):
+        asyncio.run(run())
+
+
+def test_pinned_request_connects_to_the_address_but_keeps_the_name():
+    url, headers, extensions = pinned_request("https://files.example.com:8443/a.png?x=1", "2606:2800::1")
+    assert url == "https://[2606:2800::1]:8443/a.png?x=1"
+    assert headers == {"Host": "files.example.com:8443"}
+    assert extensions == {"sni_hostname": "files.example.com"}
+
+
+def test_spool_uri_fetches_the_checked_address(monkeypatch):
+    seen = {}
+
+    async def check(uri):
+        return "93.184.216.34"
+
+    class Response:
+        is_redirect = False
+        headers = {}
+
+        def raise_for_status(self):
+            pass
+
+        async def aiter_bytes(self):
+            yield b"data"
+
+    class Stream:
+        def __init__(self, method, url, headers, extensions):
+            seen.update(url=url, headers=headers, extensions=extensions)
+
+        async def __aenter__(self):
+            return Response()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def stream(self, method, url, headers=None, extensions=None):
+            return Stream(method, url, headers, extensions)
+
+    monkeypatch.setattr(attachments, "check_uri", check)
+    monkeypatch.setattr(attachments.httpx, "AsyncClient", Client)
+    spool, sha = asyncio.run(attachments.spool_uri("https://files.example.com/a.png"))
+    assert spool.read() == b"data"
+    assert seen == {
+        "url": "https://93.184.216.34/a.png",
+        "headers": {"Host": "files.example.com"},
+        "extensions": {"sni_hostname": "files.example.com"},
+    }
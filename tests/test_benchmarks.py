@@ -0,0 +1,122 @@
+import asyncio
+import importlib.util
+import inspect
+import pathlib
+import uuid
+import pytest
+from fastapi import HTTPException
+from agent.db.repositories.goals import GoalRepository
+from agent.db.repositories.messages import MessageRepository
+from agent.db.repositories.milestones import MilestoneRepository
+from agent.db.repositories.search import SearchRepository
+from agent.db.repositories.users import UserRepository
+
+REPOSITORIES = {
+    "users": UserRepository, "goals": GoalRepository, "milestones": MilestoneRepository,
+    "messages": MessageRepository, "search": SearchRepository,
+}
+
+
+def load(name):
+    path = pathlib.Path(__file__).resolve().parents[1] / "benchmarks" / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(f"benchmarks_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+repositories = load("repositories")
+
+
+class EmptyDatabase:
+    """Answers every query with no rows."""
+
+    async def fetch_one(self, query, values=None):
+        return None
+
+    async def fetch_all(self, query, values=None):
+        return []
+
+    async def fetch_val(self, query, values=None, column=0):
+        return None
+
+    async def execute(self, query, values=None):
+        return None
+
+    async def iterate(self, query, values=None):
+        return
+        yield
+
+
+def sample():
+    user_id, goal_id = uuid.uuid4(), uuid.uuid4()
+    return {
+        "user": {"id": user_id, "telex_user_id": "bench-user-1", "email": "bench-user-1@example.com"},
+        "goal": {"id": goal_id, "user_id": user_id},
+        "milestone": {"id": uuid.uuid4(), "goal_id": goal_id, "user_id": user_id},
+        "message": {"id": uuid.uuid4(), "user_id": user_id},
+        "new": "bench-new-0",
+    }
+
+
+def test_every_repository_method_has_a_case():
+    covered = {case.name.split("[")[0] for case in repositories.cases()}
+    methods = {
+        f"{scope}.{name}" for scope, cls in REPOSITORIES.items() for name, value in vars(cls).items()
+        if not name.startswith("_") and (inspect.iscoroutinefunction(value) or inspect.isasyncgenfunction(value))
+    }
+    assert methods - covered == set()
+
+
+@pytest.mark.parametrize("case", repositories.cases(), ids=lambda case: case.name)
+def test_case_calls_its_method_and_records_the_sql(case):
+    recorder = repositories.RecordingDatabase(EmptyDatabase())
+    repository = REPOSITORIES[case.repository](recorder)
+
+    async def run():
+        try:
+            await case.call(repository, sample())
+        except HTTPException:
+            # not-found and empty-result errors, counted by the benchmark as errors
+            pass
+
+    asyncio.run(run())
+    assert recorder.calls, f"{case.name} issued no query"
+
+
+def test_seed_binds_only_the_values_each_statement_uses():
+    executed = []
+
+    class Seeding(EmptyDatabase):
+        async def execute(self, query, values=None):
+            executed.append((query, values))
+
+    class Args:
+        users, goals_per_user, milestones_per_goal, messages = 10, 2, 3, 100
+
+    timings = asyncio.run(repositories.seed(Seeding(), Args()))
+    assert set(timings) == {"users", "goals", "milestones", "partitions", "messages"}
+    by_table = {q.split("INSERT INTO ")[1].split()[0]: v for q, v in executed if "INSERT INTO" in q}
+    assert by_table["users"] == {"users": 10}
+    assert by_table["goals"] == {"goals_per_user": 2}
+    assert by_table["messages"] == {"messages": 100, "users": 10}
+    assert executed[-1] == ("ANALYZE", None)
+
+
+def test_regressions_respect_the_tolerance():
+    baseline = {"a": {"p95_ms": 10.0}, "b": {"p95_ms": 10.0}}
+    current = {"a": {"p95_ms": 12.0}, "b": {"p95_ms": 13.0}, "new": {"p95_ms": 99.0}}
+    assert repositories.regressions(baseline, current, 0.25) == {"b": (10.0, 13.0)}
+
+
+def test_plan_summary_lists_seq_scans():
+    plan = {
+        "Node Type": "Nested Loop", "Actual Rows": 3, "Actual Total Time": 0.5, "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "goals", "Actual Rows": 3, "Actual Total Time": 0.2},
+            {"Node Type": "Index Scan", "Relation Name": "milestones", "Index Name": "ix_milestones_goal_id",
+             "Actual Rows": 1, "Actual Total Time": 0.1},
+        ],
+    }
+    assert list(repositories._seq_scans(plan)) == ["goals"]
+    tree = repositories._summarize_plan(plan)
+    assert tree[2].strip().startswith("Index Scan on milestones using ix_milestones_goal_id")
@@ -0,0 +1,55 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+import agent.main
+import agent.db.tasks
+
+
+class FakeDatabase:
+    """Stands in for databases.Database: answers the progress dashboard query."""
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        self.is_connected = False
+        self.queries = []
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def fetch_one(self, query, values=None):
+        self.queries.append((query, values))
+        return {
+            "goal_count": 1, "completed_goals": 0, "total_milestones": 4,
+            "completed_milestones": 1, "next_due_date": None, "goals": "[]",
+        }
+
+
+@pytest.fixture
+def client(monkeypatch, no_redis):
+    monkeypatch.setattr(agent.db.tasks, "Database", FakeDatabase)
+    monkeypatch.setattr(agent.db.tasks, "DATABASE_REPLICA_URLS", "")
+    app = agent.main.get_application()
+    with TestClient(app) as test_client:
+        yield test_client, app
+
+
+def test_startup_connects_the_database(client):
+    _, app = client
+    assert app.state._db.is_connected
+
+
+def test_goals_progress_reaches_the_database(client):
+    test_client, app = client
+    user_id = str(uuid.uuid4())
+    response = test_client.post("/a2a-coach/rpc", json={
+        "jsonrpc": "2.0", "id": "1", "method": "goals/progress", "params": {"user_id": user_id},
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["error"] is None
+    assert body["result"]["total_milestones"] == 4
+    assert app.state._db.queries[0][1] == {"user_id": uuid.UUID(user_id)}
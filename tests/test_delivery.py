@@ -0,0 +1,60 @@
+import asyncio
+from agent.core import worker
+from agent.services import delivery
+from agent.services.agent import FallbackReply
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+        self.claimed = []
+
+    async def xadd(self, stream, fields, **kwargs):
+        self.published.append(fields)
+        return b"1-0"
+
+    async def xclaim(self, *args, **kwargs):
+        self.claimed.append(kwargs)
+
+
+def run_long_coach(monkeypatch, run_gemini):
+    redis_ = FakeRedis()
+
+    async def close_client():
+        pass
+
+    monkeypatch.setattr(worker, "run_gemini", run_gemini)
+    monkeypatch.setattr(worker, "get_client", lambda: redis_)
+    monkeypatch.setattr(worker, "close_client", close_client)
+    asyncio.run(worker._long_coach("plan my week", "channel-1"))
+    return redis_.published
+
+
+def test_failed_background_task_notifies_the_channel(monkeypatch):
+    async def fails(user_input):
+        raise RuntimeError("boom")
+
+    [entry] = run_long_coach(monkeypatch, fails)
+    assert entry["status"] == "error"
+    assert entry["text"] == worker.BACKGROUND_FAILED_NOTICE
+
+
+def test_degraded_background_reply_is_marked(monkeypatch):
+    async def degraded(user_input):
+        return FallbackReply("1. Start small")
+
+    [entry] = run_long_coach(monkeypatch, degraded)
+    assert entry["text"].startswith(worker.BACKGROUND_DEGRADED_NOTICE)
+    assert entry["text"].endswith("1. Start small")
+
+
+def test_held_entries_are_reclaimed_while_they_wait():
+    redis_ = FakeRedis()
+    deliverer = delivery.Deliverer(redis_, consumer="c1")
+    deliverer.pending_ids.update({"1-0", "2-0"})
+
+    asyncio.run(deliverer.touch())
+
+    [claim] = redis_.claimed
+    assert claim["justid"] and claim["min_idle_time"] == 0
+    assert sorted(claim["message_ids"]) == ["1-0", "2-0"]
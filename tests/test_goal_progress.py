@@ -0,0 +1,156 @@
+import importlib.util
+import pathlib
+import re
+import uuid
+from datetime import datetime
+from agent.db.repositories.goals import GoalRepository
+
+MIGRATION = (
+    pathlib.Path(__file__).resolve().parents[1]
+    / "agent/db/migrations/versions/4b7d2c9e1f30_add_goal_progress_summaries.py"
+)
+
+PROGRESS_QUERY = """
+    SELECT total_milestones, completed_milestones, next_due_date, user_id
+    FROM goal_progress WHERE goal_id = :goal_id
+"""
+
+
+class FakeOp:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+
+def test_downgrade_drops_everything_upgrade_creates(monkeypatch):
+    spec = importlib.util.spec_from_file_location("goal_progress_migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    op = FakeOp()
+    monkeypatch.setattr(module, "op", op)
+
+    module.upgrade()
+    created = " ".join(args[0] for name, args, _ in op.calls if name == "execute")
+    triggers = set(re.findall(r"CREATE TRIGGER (\w+)", created))
+    functions = set(re.findall(r"CREATE OR REPLACE FUNCTION (\w+)", created))
+    assert op.calls[-1][1][0].startswith("SELECT refresh_goal_progress(")
+
+    op.calls.clear()
+    module.downgrade()
+    dropped = " ".join(args[0] for name, args, _ in op.calls if name == "execute")
+    assert triggers == set(re.findall(r"DROP TRIGGER IF EXISTS (\w+)", dropped)) and len(triggers) == 6
+    assert functions == set(re.findall(r"DROP FUNCTION IF EXISTS (\w+)", dropped))
+    assert ("drop_table", ("goal_progress",), {}) in op.calls
+
+
+async def add_goal(db, user_id, title="Learn SQL"):
+    return await db.fetch_val(
+        "INSERT INTO goals (user_id, title) VALUES (:user_id, :title) RETURNING id",
+        values={"user_id": user_id, "title": title},
+    )
+
+
+async def add_milestones(db, goal_id, rows):
+    # one multi-row statement, so the statement-level trigger sees all of them at once
+    values, params = [], {"goal_id": goal_id}
+    for i, (due, completed) in enumerate(rows):
+        values.append(f"(:goal_id, 'Milestone {i}', :due{i}, :completed{i})")
+        params.update({f"due{i}": due, f"completed{i}": completed})
+    return [
+        row["id"] for row in await db.fetch_all(
+            f"INSERT INTO milestones (goal_id, title, due_date, completed) VALUES {', '.join(values)} RETURNING id",
+            values=params,
+        )
+    ]
+
+
+async def progress(db, goal_id):
+    row = await db.fetch_one(PROGRESS_QUERY, values={"goal_id": goal_id})
+    return dict(row) if row else None
+
+
+def test_new_goal_starts_with_empty_progress(in_database):
+    user_id = uuid.uuid4()
+
+    async def test(db):
+        return await progress(db, await add_goal(db, user_id))
+
+    assert in_database(test) == {
+        "total_milestones": 0, "completed_milestones": 0, "next_due_date": None, "user_id": user_id,
+    }
+
+
+def test_milestone_writes_keep_counts_and_next_due_date(in_database):
+    march, april, may = datetime(2026, 3, 1), datetime(2026, 4, 1), datetime(2026, 5, 1)
+
+    async def test(db):
+        goal_id = await add_goal(db, uuid.uuid4())
+        first, second, third = await add_milestones(db, goal_id, [(march, False), (april, False), (may, True)])
+        after_insert = await progress(db, goal_id)
+
+        await db.execute(
+            "UPDATE milestones SET completed = true WHERE id = ANY(:ids)",
+            values={"ids": [str(first), str(second)]},
+        )
+        after_update = await progress(db, goal_id)
+
+        await db.execute("DELETE FROM milestones WHERE id = :id", values={"id": third})
+        after_delete = await progress(db, goal_id)
+        return after_insert, after_update, after_delete
+
+    after_insert, after_update, after_delete = in_database(test)
+    assert (after_insert["total_milestones"], after_insert["completed_milestones"]) == (3, 1)
+    assert after_insert["next_due_date"] == march
+    assert (after_update["total_milestones"], after_update["completed_milestones"]) == (3, 3)
+    assert after_update["next_due_date"] is None
+    assert (after_delete["total_milestones"], after_delete["completed_milestones"]) == (2, 2)
+
+
+def test_moving_a_milestone_recounts_both_goals(in_database):
+    async def test(db):
+        user_id = uuid.uuid4()
+        source, target = await add_goal(db, user_id), await add_goal(db, user_id, "Learn Go")
+        [moved] = await add_milestones(db, source, [(None, True)])
+        await db.execute("UPDATE milestones SET goal_id = :goal_id WHERE id = :id", values={
+            "goal_id": target, "id": moved,
+        })
+        return await progress(db, source), await progress(db, target)
+
+    source, target = in_database(test)
+    assert (source["total_milestones"], source["completed_milestones"]) == (0, 0)
+    assert (target["total_milestones"], target["completed_milestones"]) == (1, 1)
+
+
+def test_goal_owner_changes_and_deletes_follow_the_goal(in_database):
+    async def test(db):
+        goal_id = await add_goal(db, uuid.uuid4())
+        new_owner = uuid.uuid4()
+        await db.execute("UPDATE goals SET user_id = :user_id WHERE id = :id", values={
+            "user_id": new_owner, "id": goal_id,
+        })
+        owner = (await progress(db, goal_id))["user_id"]
+        await db.execute("DELETE FROM goals WHERE id = :id", values={"id": goal_id})
+        return owner == new_owner, await progress(db, goal_id)
+
+    assert in_database(test) == (True, None)
+
+
+def test_dashboard_sums_the_summaries(in_database):
+    user_id = uuid.uuid4()
+
+    async def test(db):
+        sql, go = await add_goal(db, user_id), await add_goal(db, user_id, "Learn Go")
+        await add_milestones(db, sql, [(datetime(2026, 6, 1), False), (None, True)])
+        await add_milestones(db, go, [(datetime(2026, 5, 1), False)])
+        await db.execute("UPDATE goals SET status = 'completed' WHERE id = :id", values={"id": sql})
+        await add_goal(db, uuid.uuid4(), "Someone else's goal")
+        return await GoalRepository(db).get_progress_dashboard(user_id)
+
+    dashboard = in_database(test)
+    assert dashboard["goal_count"] == 2
+    assert dashboard["completed_goals"] == 1
+    assert (dashboard["total_milestones"], dashboard["completed_milestones"]) == (3, 1)
+    assert dashboard["next_due_date"] == datetime(2026, 5, 1)
+    assert [g["title"] for g in dashboard["goals"]] == ["Learn Go", "Learn SQL"]
@@ -0,0 +1,94 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from agent.core import logger as logger_module
+from agent.core.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+
+def record(msg, level=logging.INFO, **extra):
+    entry = logging.LogRecord("A2A-Coach", level, __file__, 1, msg, None, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_json_formatter_merges_dict_messages():
+    line = json.loads(JsonFormatter().format(record({"event": "llm_call", "ms": 12})))
+    assert line["event"] == "llm_call"
+    assert line["ms"] == 12
+    assert line["level"] == "INFO"
+
+
+def test_json_formatter_keeps_plain_messages_and_exceptions():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        entry = record("failed")
+        entry.exc_info = sys.exc_info()
+    line = json.loads(JsonFormatter().format(entry))
+    assert line["message"] == "failed"
+    assert "ValueError: boom" in line["exc"]
+
+
+def test_sampling_by_event_name_and_per_call_rate():
+    sampler = SamplingFilter({"verifying_signature": 0.0})
+    assert not sampler.filter(record({"event": "verifying_signature"}))
+    assert sampler.filter(record({"event": "other"}))
+    assert not sampler.filter(record("hot path", sample_rate=0.0))
+    assert sampler.filter(record("hot path", sample_rate=1.0))
+
+
+def test_warnings_are_never_sampled():
+    sampler = SamplingFilter({"verifying_signature": 0.0})
+    assert sampler.filter(record({"event": "verifying_signature"}, level=logging.WARNING))
+    assert sampler.filter(record("hot path", level=logging.ERROR, sample_rate=0.0))
+
+
+def test_full_queue_drops_instead_of_blocking(monkeypatch):
+    monkeypatch.setattr(NonBlockingQueueHandler, "dropped", 0)
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(record("first"))
+    handler.handle(record("second"))
+    assert handler.queue.qsize() == 1
+    assert NonBlockingQueueHandler.dropped == 1
+
+
+def test_records_are_queued_unformatted():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    entry = record({"event": "x"})
+    handler.handle(entry)
+    assert handler.queue.get_nowait() is entry
+
+
+def test_listener_writes_queued_records():
+    written = []
+
+    class Capture(logging.Handler):
+        def emit(self, entry):
+            written.append(entry.msg)
+
+    listener = logging.handlers.QueueListener(queue.Queue(), Capture())
+    handler = NonBlockingQueueHandler(listener.queue)
+    listener.start()
+    try:
+        handler.handle(record({"event": "queued"}))
+    finally:
+        listener.stop()
+    assert written == [{"event": "queued"}]
+
+
+def test_restart_in_child_gives_a_fresh_queue_and_thread():
+    handler = logger_module.LogHandler
+    handler.listener.stop()
+    old_queue = handler.records
+    handler.restart_in_child()
+    try:
+        assert handler.records is not old_queue
+        assert handler.handler.queue is handler.records
+        assert handler.listener.queue is handler.records
+        assert handler.listener._thread.is_alive()
+    finally:
+        handler.listener.stop()
+        handler.records = handler.handler.queue = handler.listener.queue = old_queue
+        handler.listener.start()
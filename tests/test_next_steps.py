@@ -0,0 +1,114 @@
+import asyncio
+import json
+import uuid
+import pytest
+from agent.services import next_steps
+from agent.services.agent import FallbackReply
+
+GOAL = {"id": uuid.uuid4(), "title": "Learn Go", "description": None, "milestones": "[]", "fingerprint": "v2"}
+
+
+class FakeRedis:
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+@pytest.fixture(autouse=True)
+def goal_snapshot(monkeypatch):
+    async def get_goal_snapshot(self, user_id, goal_id):
+        return GOAL
+
+    monkeypatch.setattr(next_steps.GoalRepository, "get_goal_snapshot", get_goal_snapshot)
+
+
+def reply_with(monkeypatch, text):
+    async def generate_reply(prompt, *args, **kwargs):
+        return text
+
+    monkeypatch.setattr(next_steps, "generate_reply", generate_reply)
+
+
+def run(redis_):
+    return asyncio.run(next_steps.get_next_step(None, redis_, uuid.uuid4(), GOAL["id"]))
+
+
+def test_fresh_reply_is_cached(monkeypatch):
+    reply_with(monkeypatch, "Write a CLI tool today")
+    redis_ = FakeRedis()
+
+    assert run(redis_)["next_step"] == "Write a CLI tool today"
+    assert json.loads(redis_.values[next_steps.next_step_key(GOAL["id"])])["fingerprint"] == "v2"
+
+
+def test_fallback_reply_is_not_cached(monkeypatch):
+    reply_with(monkeypatch, FallbackReply("template"))
+    redis_ = FakeRedis()
+
+    with pytest.raises(next_steps.NextStepUnavailable):
+        run(redis_)
+    assert redis_.values == {}
+
+
+def test_fallback_serves_the_outdated_suggestion(monkeypatch):
+    reply_with(monkeypatch, FallbackReply("template"))
+    key = next_steps.next_step_key(GOAL["id"])
+    redis_ = FakeRedis({key: next_steps._encode("v1", "Read chapter 3")})
+
+    result = run(redis_)
+    assert result["next_step"] == "Read chapter 3" and result["outdated"]
+    assert json.loads(redis_.values[key])["fingerprint"] == "v1"
+
+
+def test_precompute_goes_through_admission_at_low_priority(monkeypatch):
+    priorities = []
+
+    async def generate_reply(prompt, priority=None, **kwargs):
+        priorities.append(priority)
+        return "Do one exercise"
+
+    async def iter_active_goal_snapshots(self, page_size=100):
+        yield {**GOAL, "fingerprint": "v3"}
+
+    class PipelineRedis(FakeRedis):
+        async def mget(self, keys):
+            return [self.values.get(k) for k in keys]
+
+    monkeypatch.setattr(next_steps, "generate_reply", generate_reply)
+    monkeypatch.setattr(next_steps.GoalRepository, "iter_active_goal_snapshots", iter_active_goal_snapshots)
+    monkeypatch.setattr(next_steps, "NEXT_STEP_REQUESTS_PER_MINUTE", 10 ** 6)
+
+    async def set_many(redis_, values, ex=None):
+        redis_.values.update(values)
+
+    monkeypatch.setattr(next_steps, "set_many", set_many)
+    redis_ = PipelineRedis()
+
+    assert asyncio.run(next_steps.precompute_next_steps(None, redis_)) == 1
+    assert priorities == [next_steps.LOW_PRIORITY]
+
+
+def test_active_goals_are_read_in_keyset_pages():
+    goals = [{"id": uuid.UUID(int=i)} for i in range(1, 6)]
+
+    class PagedDatabase:
+        def __init__(self):
+            self.pages = []
+
+        async def fetch_all(self, query, values=None):
+            self.pages.append(values)
+            rows = [g for g in goals if g["id"] > values["after"]]
+            return rows[:values["limit"]]
+
+    db = PagedDatabase()
+
+    async def read():
+        return [g async for g in next_steps.GoalRepository(db).iter_active_goal_snapshots(page_size=2)]
+
+    assert asyncio.run(read()) == goals
+    assert [p["after"] for p in db.pages] == [uuid.UUID(int=0), uuid.UUID(int=2), uuid.UUID(int=4)]
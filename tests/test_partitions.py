@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import gzip
+import importlib.util
+import pathlib
+from datetime import date
+import pytest
+from agent.core import worker
+from agent.services import partitions
+
+MIGRATION = pathlib.Path(partitions.__file__).parents[1] / "db/migrations/versions/9c3e5a7b1d42_partition_messages_by_month.py"
+
+
+class FakeOp:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+
+def load_migration(monkeypatch):
+    spec = importlib.util.spec_from_file_location("partition_migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    op = FakeOp()
+    monkeypatch.setattr(module, "op", op)
+    return module, op
+
+
+def test_migration_creates_partitions_before_copying_rows(monkeypatch):
+    module, op = load_migration(monkeypatch)
+    module.upgrade()
+
+    sql = [" ".join(args[0].split()) for name, args, _ in op.calls if name == "execute"]
+    create_function = next(i for i, s in enumerate(sql) if "FUNCTION create_message_partitions" in s)
+    create_months = next(i for i, s in enumerate(sql) if s.startswith("SELECT create_message_partitions("))
+    copy_rows = next(i for i, s in enumerate(sql) if s.startswith("INSERT INTO messages ("))
+    assert create_function < create_months < copy_rows
+    assert "interval '3 months'" in sql[create_months]
+
+    [(_, args, _)] = [c for c in op.calls if c[0] == "create_primary_key"]
+    assert args == ("messages_pkey", "messages", ["id", "created_at"])
+    assert op.calls[0][2]["postgresql_partition_by"] == "RANGE (created_at)"
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.raw_connection = self
+        self.db = db
+
+    async def execute(self, statement):
+        self.db.ddl.append(statement)
+
+    async def copy_from_table(self, name, output, format, header):
+        await output(b"id,text\n1,hi\n2,yo\n")
+        return f"COPY {self.db.copied}"
+
+
+class FakeDatabase:
+    def __init__(self, rows, copied=2):
+        self.rows = rows
+        self.copied = copied
+        self.ddl = []
+        self.values = []
+
+    async def fetch_all(self, query):
+        return self.rows
+
+    async def fetch_val(self, query, values=None):
+        self.values.append(values)
+        return 2
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        yield FakeConnection(self)
+
+
+@pytest.fixture
+def this_month(monkeypatch):
+    monkeypatch.setattr(partitions, "current_month", lambda: date(2026, 10, 1))
+
+
+def test_expired_partitions_are_detached_archived_and_dropped(this_month, tmp_path):
+    db = FakeDatabase([
+        {"name": "messages_2026_01", "attached": True, "pending": False},
+        {"name": "messages_2026_02", "attached": False, "pending": True},
+        {"name": "messages_2026_09", "attached": True, "pending": False},
+    ])
+
+    archived = asyncio.run(partitions.archive_message_partitions(db, 6, str(tmp_path)))
+
+    assert archived == ["messages_2026_01", "messages_2026_02"]
+    assert db.ddl == [
+        "ALTER TABLE messages DETACH PARTITION messages_2026_01 CONCURRENTLY",
+        "DROP TABLE messages_2026_01",
+        "ALTER TABLE messages DETACH PARTITION messages_2026_02 FINALIZE",
+        "DROP TABLE messages_2026_02",
+    ]
+    with gzip.open(tmp_path / "messages_2026_01.csv.gz") as archive:
+        assert archive.read() == b"id,text\n1,hi\n2,yo\n"
+
+
+def test_short_copy_keeps_the_partition(this_month, tmp_path):
+    db = FakeDatabase([{"name": "messages_2026_01", "attached": True, "pending": False}], copied=1)
+
+    with pytest.raises(RuntimeError, match="Archived 1 of 2"):
+        asyncio.run(partitions.archive_message_partitions(db, 6, str(tmp_path)))
+    assert "DROP TABLE messages_2026_01" not in db.ddl
+    assert not list(tmp_path.iterdir())
+
+
+def test_zero_retention_keeps_everything(tmp_path):
+    db = FakeDatabase([{"name": "messages_2000_01", "attached": True, "pending": False}])
+    assert asyncio.run(partitions.archive_message_partitions(db, 0, str(tmp_path))) == []
+    assert db.ddl == []
+
+
+def test_partitions_are_created_months_ahead(this_month):
+    db = FakeDatabase([])
+    asyncio.run(partitions.ensure_message_partitions(db, 3))
+    assert db.values == [{"from_month": date(2026, 10, 1), "to_month": date(2027, 1, 1)}]
+
+
+def test_partition_job_keeps_its_chain(monkeypatch):
+    scheduled = []
+
+    class FakeQueue:
+        def enqueue_in(self, delay, func, **kwargs):
+            scheduled.append(kwargs["job_id"])
+
+    class FakeRedis:
+        def set(self, *args, **kwargs):
+            return True
+
+    async def maintain():
+        return {"created": 0, "archived": []}
+
+    monkeypatch.setattr(worker, "queue", FakeQueue())
+    monkeypatch.setattr(worker, "redis_conn", FakeRedis())
+    monkeypatch.setattr(worker, "_maintain_message_partitions", maintain)
+
+    worker.maintain_message_partitions_task()
+    worker.maintain_message_partitions_task()
+    assert len(set(scheduled)) == 2
+    assert all(job_id.startswith("maintain_message_partitions:") for job_id in scheduled)
@@ -0,0 +1,62 @@
+import pytest
+from agent.core import worker
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+
+class FakeQueue:
+    def __init__(self):
+        self.scheduled = []
+
+    def enqueue_in(self, delay, func, **kwargs):
+        self.scheduled.append((delay.total_seconds(), func, kwargs))
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(worker, "queue", queue)
+    monkeypatch.setattr(worker, "redis_conn", FakeRedis())
+    return queue
+
+
+def test_every_run_is_scheduled_under_a_fresh_job_id(scheduler):
+    worker.schedule_next_step_precompute(delay_seconds=0)
+    worker.schedule_next_step_precompute(delay_seconds=0)
+
+    ids = [kwargs["job_id"] for _, _, kwargs in scheduler.scheduled]
+    assert len(set(ids)) == 2
+    assert all(job_id.startswith("precompute_next_steps:") for job_id in ids)
+
+
+def test_run_schedules_the_next_one_before_working(scheduler, monkeypatch):
+    async def fails():
+        raise RuntimeError("job_timeout")
+
+    monkeypatch.setattr(worker, "_precompute_next_steps", fails)
+
+    with pytest.raises(RuntimeError):
+        worker.precompute_next_steps_task()
+    [(delay, func, _)] = scheduler.scheduled
+    assert delay == worker.NEXT_STEP_INTERVAL_SECONDS
+    assert func == "agent.core.worker.precompute_next_steps_task"
+
+
+def test_a_second_chain_in_the_same_interval_stops(scheduler, monkeypatch):
+    async def done():
+        return 0
+
+    monkeypatch.setattr(worker, "_precompute_next_steps", done)
+
+    assert worker.precompute_next_steps_task() == 0
+    assert worker.precompute_next_steps_task() is None
+    assert len(scheduler.scheduled) == 1
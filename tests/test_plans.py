@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from agent.db.repositories.goals import GoalRepository
+from agent.services import plans
+from agent.services.agent import FallbackReply
+
+
+def test_long_plans_are_grouped_not_truncated():
+    spans = plans.section_spans(52)
+
+    assert len(spans) == 13
+    assert spans[0] == (1, 4) and spans[-1] == (49, 52)
+    assert plans.section_spans(6) == [(i, i) for i in range(1, 7)]
+
+
+def test_grouped_headings_become_milestones_due_at_the_end_of_the_range():
+    milestones = plans.plan_milestones("Weeks 5–8 — Projects\nBuild things")
+
+    title, due = milestones[0]
+    assert title == "Weeks 5–8 — Projects"
+    assert (due - plans.datetime.utcnow()).days in (55, 56)
+
+
+def test_shed_outline_returns_the_template_instead_of_a_plan(monkeypatch):
+    async def shed(prompt, *args, **kwargs):
+        return FallbackReply("1. Start\n2. Keep going")
+
+    monkeypatch.setattr(plans, "generate_reply", shed)
+
+    assert asyncio.run(plans.generate_plan("an 8 week plan", 8, "week")) == "1. Start\n2. Keep going"
+
+
+def test_failed_sections_say_they_are_unavailable(monkeypatch):
+    async def outline(prompt, *args, **kwargs):
+        return "Basics\nPractice"
+
+    async def failed(prompt, *args, **kwargs):
+        return FallbackReply("template")
+
+    monkeypatch.setattr(plans, "generate_reply", outline)
+    monkeypatch.setattr(plans, "run_gemini", failed)
+
+    plan = asyncio.run(plans.generate_plan("a 2 week plan", 2, "week"))
+    assert plan.startswith("Week 1 — Basics\nThis part could not be written")
+    assert "template" not in plan
+
+
+def test_headings_and_items_become_dated_milestones():
+    start = datetime(2026, 1, 1)
+    headed = plans.plan_milestones("Week 1 — Basics: syntax\nnotes\nWeek 2: Projects", start)
+    assert headed == [
+        ("Week 1 — Basics", start + timedelta(days=7)),
+        ("Week 2 — Projects", start + timedelta(days=14)),
+    ]
+
+    listed = plans.plan_milestones("1. Read the docs\n- Build a CLI\nplain text", start)
+    assert listed == [("Read the docs", start + timedelta(weeks=1)), ("Build a CLI", start + timedelta(weeks=2))]
+    assert plans.plan_milestones("no structure at all") == []
+
+
+def test_plans_are_capped_at_max_milestones():
+    plan = "\n".join(f"Day {i} — Practice" for i in range(1, 101))
+    assert len(plans.plan_milestones(plan)) == plans.MAX_PLAN_MILESTONES
+
+
+def test_from_plan_without_milestones_or_storage_is_an_error(client):
+    def call(params):
+        return client.post("/a2a-coach/rpc", json={
+            "jsonrpc": "2.0", "id": "1", "method": "goals/from_plan",
+            "params": {"user_id": str(uuid.uuid4()), **params},
+        }).json()["error"]
+
+    assert call({"title": "SQL", "plan": "just do it"})["message"] == "No milestones found in plan"
+    assert call({"title": "SQL", "plan": "Week 1 — Joins"})["message"] == "Goal storage unavailable"
+
+
+def test_plan_is_stored_as_a_goal_with_its_milestones(in_database):
+    user_id = uuid.uuid4()
+    plan = "\n".join(f"Week {i} — Topic {i}" for i in range(12, 0, -1))
+
+    async def test(db):
+        goal = await plans.save_plan(db, user_id, "Learn SQL", plan)
+        progress = await db.fetch_one(
+            "SELECT total_milestones, next_due_date FROM goal_progress WHERE goal_id = :id", values={"id": goal["id"]}
+        )
+        stored = await db.fetch_val("SELECT count(*) FROM milestones WHERE goal_id = :id", values={"id": goal["id"]})
+        return goal, dict(progress), stored
+
+    goal, progress, stored = in_database(test)
+    assert (goal["user_id"], goal["title"], goal["status"]) == (user_id, "Learn SQL", "active")
+    # returned in due order even though the plan listed them backwards
+    assert [m["title"] for m in goal["milestones"]][:2] == ["Week 1 — Topic 1", "Week 2 — Topic 2"]
+    assert stored == 12
+    # the statement-level triggers saw the goal and its milestones together
+    assert progress["total_milestones"] == 12
+    assert progress["next_due_date"] == datetime.fromisoformat(goal["milestones"][0]["due_date"])
+
+
+def test_goal_without_milestones_is_stored(in_database):
+    async def test(db):
+        return await GoalRepository(db).create_goal_with_milestones(uuid.uuid4(), "Empty", None, "active", [])
+
+    assert in_database(test)["milestones"] == []
@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+import uuid
+import pytest
+from agent.db.repositories.goals.goal import BULK_UPDATE_GOAL_STATUS_QUERY
+from agent.models.agent_rpc import ProgressUpdateParams, rpc_request_adapter
+from agent.services import progress
+
+USER, GOAL, POISON = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.updates = []
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetch_all(self, query, values=None):
+        if POISON in values.get("ids", []) + values.get("goal_ids", []):
+            raise RuntimeError("invalid input value for enum")
+        self.updates.append(values)
+        return [{"id": i} for i in values["ids"]]
+
+
+class FakeRedis:
+    def __init__(self, deliveries):
+        self.deliveries = deliveries
+        self.acked = []
+        self.dead = []
+
+    async def xack(self, stream, group, *entry_ids):
+        self.acked += entry_ids
+
+    async def xpending_range(self, stream, group, min, max, count, consumername=None):
+        return [{"message_id": k.encode(), "times_delivered": v} for k, v in self.deliveries.items()]
+
+    async def xadd(self, stream, fields, **kwargs):
+        self.dead.append((stream, fields))
+
+
+def status(goal_id, value, user_id=USER):
+    return {b"user_id": user_id.encode(), b"goal_id": goal_id.encode(), b"status": value.encode()}
+
+
+def test_updates_carry_the_owner():
+    params = ProgressUpdateParams(user_id=USER, goal_id=GOAL, status="completed")
+    assert progress.progress_fields(params) == {"user_id": USER, "goal_id": GOAL, "status": "completed"}
+
+    with pytest.raises(Exception):
+        rpc_request_adapter.validate_python({
+            "jsonrpc": "2.0", "method": "progress/update", "params": {"goal_id": GOAL, "status": "completed"},
+        })
+
+
+def test_latest_update_wins_with_its_stream_version():
+    goals, _ = progress.coalesce([
+        ("1700000000000-0", status(GOAL, "active")),
+        ("1700000000000-1", status(GOAL, "completed")),
+        ("1700000000001-0", {b"goal_id": GOAL.encode(), b"status": b"paused"}),
+    ])
+    assert goals == {(USER, GOAL): ("completed", 1700000000000 * 1_000_000 + 1)}
+
+
+def test_bulk_update_is_scoped_by_owner_and_version():
+    db = FakeDatabase()
+    asyncio.run(progress.apply_progress(db, [("5-2", status(GOAL, "completed"))]))
+
+    [goals] = db.updates
+    assert goals["user_ids"] == [USER] and goals["ids"] == [GOAL]
+    assert goals["versions"] == [5_000_002]
+    assert "goals.user_id = v.user_id" in BULK_UPDATE_GOAL_STATUS_QUERY
+    assert "goals.progress_version < v.version" in BULK_UPDATE_GOAL_STATUS_QUERY
+
+
+def test_redelivered_batch_isolates_and_dead_letters_a_poison_event():
+    db = FakeDatabase()
+    redis_ = FakeRedis({"1-0": 2, "2-0": progress.PROGRESS_MAX_DELIVERIES})
+    entries = [("1-0", status(GOAL, "completed")), ("2-0", status(POISON, "bogus")), ("3-0", {})]
+
+    asyncio.run(progress.apply_batch(db, redis_, "c1", entries, redelivered=True))
+
+    assert sorted(redis_.acked) == ["1-0", "2-0", "3-0"]
+    [(stream, fields)] = redis_.dead
+    assert stream == progress.DEAD_LETTER_STREAM
+    assert fields["goal_id"] == POISON and fields["entry_id"] == "2-0"
+
+
+def test_poison_event_below_the_limit_stays_pending():
+    redis_ = FakeRedis({"2-0": 1})
+    asyncio.run(progress.apply_batch(FakeDatabase(), redis_, "c1", [("2-0", status(POISON, "x"))], redelivered=True))
+    assert redis_.acked == [] and redis_.dead == []
+
+
+def test_first_failure_leaves_the_batch_pending():
+    redis_ = FakeRedis({})
+    # repositories re-raise database errors as HTTPException
+    with pytest.raises(Exception):
+        asyncio.run(progress.apply_batch(FakeDatabase(), redis_, "c1", [("2-0", status(POISON, "x"))], False))
+    assert redis_.acked == []
@@ -0,0 +1,58 @@
+import asyncio
+from agent.services import prompts
+from agent.services.prompts import PromptPrefix, model_for
+
+
+class FakeCached:
+    def __init__(self):
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+
+def fake_handles(monkeypatch):
+    created = []
+
+    def create_handle(prefix):
+        cached = FakeCached()
+        created.append(cached)
+        return f"model-{prefix.version}", cached
+
+    monkeypatch.setattr(prompts, "_create_handle", create_handle)
+    monkeypatch.setattr(prompts, "_handles", prompts.OrderedDict())
+    monkeypatch.setattr(prompts, "_creating", {})
+    return created
+
+
+def test_concurrent_misses_create_one_handle(monkeypatch):
+    created = fake_handles(monkeypatch)
+
+    async def use():
+        async with model_for(PromptPrefix("coach")) as model:
+            await asyncio.sleep(0)
+            return model
+
+    async def main():
+        return await asyncio.gather(*(use() for _ in range(10)))
+
+    models = asyncio.run(main())
+    assert len(created) == 1
+    assert set(models) == {f"model-{PromptPrefix('coach').version}"}
+
+
+def test_evicted_handle_is_deleted_only_after_its_last_user(monkeypatch):
+    created = fake_handles(monkeypatch)
+    monkeypatch.setattr(prompts, "PROMPT_PREFIX_CACHE_SIZE", 1)
+
+    async def main():
+        async with model_for(PromptPrefix("first")):
+            async with model_for(PromptPrefix("second")):
+                pass
+            await asyncio.sleep(0.05)
+            assert not created[0].deleted
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert created[0].deleted
+    assert not created[1].deleted
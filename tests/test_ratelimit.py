@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from agent.core.ratelimit import TokenBucketLimiter, parse_members, parse_tiers
+
+TIERS = {"default": (3, 1), "pro": (10, 5)}
+
+
+def test_tiers_parse_capacity_and_refill():
+    assert parse_tiers("default=60/1, pro=240/4") == {"default": (60, 1), "pro": (240, 4)}
+
+
+@pytest.mark.parametrize("raw", ["default=10/0", "default=0/1", "default=-5/1", "default=10", "pro=10/1", ""])
+def test_invalid_tiers_are_refused_at_load(raw):
+    with pytest.raises(ValueError):
+        parse_tiers(raw)
+
+
+def test_members_must_name_a_known_tier():
+    assert parse_members("channel_a=pro", TIERS) == {"channel_a": "pro"}
+    with pytest.raises(ValueError):
+        parse_members("channel_a=gold", TIERS)
+
+
+def fake_redis():
+    # the bucket is a Lua script; fakeredis runs it through lupa
+    pytest.importorskip("lupa")
+    return pytest.importorskip("fakeredis").FakeAsyncRedis()
+
+
+def acquire_many(limiter, identities, times):
+    async def run():
+        redis_ = fake_redis()
+        return [await limiter.acquire(redis_, identities) for _ in range(times)], redis_
+
+    return asyncio.run(run())
+
+
+def test_bucket_allows_its_capacity_then_asks_to_wait():
+    limiter = TokenBucketLimiter(TIERS, {})
+    results, _ = acquire_many(limiter, {"sender": "alice"}, 4)
+    assert results[:3] == [0, 0, 0]
+    # one token short at one token per second
+    assert 0.9 < results[3] <= 1
+
+
+def test_members_get_their_tier():
+    limiter = TokenBucketLimiter(TIERS, {"alice": "pro"})
+    results, _ = acquire_many(limiter, {"sender": "alice"}, 10)
+    assert results == [0] * 10
+
+
+def test_refused_request_charges_no_bucket():
+    async def run():
+        redis_ = fake_redis()
+        limiter = TokenBucketLimiter(TIERS, {"bob": "pro"})
+        for _ in range(3):
+            assert await limiter.acquire(redis_, {"channel": "room"}) == 0
+        # the channel is empty, so bob's sender bucket is left untouched
+        assert await limiter.acquire(redis_, {"sender": "bob", "channel": "room"}) > 0
+        return float((await redis_.hget("ratelimit:sender:bob", "tokens")).decode())
+
+    assert asyncio.run(run()) == 10
+
+
+def test_buckets_expire_once_they_would_be_full():
+    limiter = TokenBucketLimiter(TIERS, {})
+    _, redis_ = acquire_many(limiter, {"sender": "alice"}, 1)
+    ttl = asyncio.run(redis_.pttl("ratelimit:sender:alice"))
+    assert 0 < ttl <= 3000
+
+
+def test_limiter_fails_open_without_redis():
+    limiter = TokenBucketLimiter(TIERS, {})
+    assert asyncio.run(limiter.acquire(None, {"sender": "alice"})) == 0
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from redis.exceptions import NoScriptError
+from agent.db import redis_client
+from agent.db.redis_client import (
+    InstrumentedRedis, RedisScript, get_client, get_many, pipeline, pool_connections, set_many
+)
+
+
+def fake_client(monkeypatch):
+    """An InstrumentedRedis over a fakeredis pool, with the commands it ran."""
+    fakeredis = pytest.importorskip("fakeredis")
+    commands = []
+    monkeypatch.setattr(
+        redis_client.redis_command_duration, "observe", lambda seconds, command: commands.append(command)
+    )
+    return InstrumentedRedis(connection_pool=fakeredis.FakeAsyncRedis().connection_pool), commands
+
+
+def test_one_client_per_event_loop():
+    async def clients():
+        first, second = get_client(), get_client()
+        await redis_client.close_client()
+        return first, second, get_client()
+
+    first, second, reopened = asyncio.run(clients())
+    other_loop, _, _ = asyncio.run(clients())
+    assert first is second
+    assert reopened is not first
+    assert other_loop is not first
+
+
+def test_commands_are_named_for_metrics():
+    script = RedisScript("example_script", "return 1")
+    assert redis_client._command_name(("GET", "key")) == "get"
+    assert redis_client._command_name(("EVALSHA", script.sha, 0)) == "script:example_script"
+    assert redis_client._command_name(("EVALSHA", "0" * 40, 0)) == "script:unnamed"
+    assert redis_client._command_name(()) == "unknown"
+
+
+def test_set_many_and_get_many_take_one_round_trip_each(monkeypatch):
+    client, commands = fake_client(monkeypatch)
+
+    async def run():
+        await set_many(client, {"a": "1", "b": "2"}, ex=60)
+        values = await get_many(client, ["a", "missing", "b"])
+        return values, await client.ttl("a")
+
+    values, ttl = asyncio.run(run())
+    assert values == [b"1", None, b"2"]
+    assert 0 < ttl <= 60
+    assert commands[:2] == ["pipeline", "mget"]
+
+
+def test_empty_batches_send_nothing(monkeypatch):
+    client, commands = fake_client(monkeypatch)
+
+    async def run():
+        await set_many(client, {})
+        async with pipeline(client):
+            pass
+        return await get_many(client, [])
+
+    assert asyncio.run(run()) == []
+    assert commands == ["pipeline"]
+
+
+def test_script_is_loaded_once_then_called_by_sha(monkeypatch):
+    client, commands = fake_client(monkeypatch)
+    pytest.importorskip("lupa")
+    script = RedisScript("add", "return tonumber(ARGV[1]) + tonumber(ARGV[2])")
+
+    async def run():
+        first = await script(client, [], [1, 2])
+        second = await script(client, [], [3, 4])
+        return first, second
+
+    assert asyncio.run(run()) == (3, 7)
+    assert commands == ["script:add", "script load", "script:add", "script:add"]
+
+
+def test_script_reraises_other_errors():
+    class Failing:
+        async def evalsha(self, *args):
+            raise NoScriptError("NOSCRIPT")
+
+        async def script_load(self, source):
+            raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(RedisScript("broken", "return 1")(Failing()))
+
+
+def test_pool_gauge_sums_every_loops_pool(monkeypatch):
+    class Pool:
+        def __init__(self, in_use, idle):
+            self._in_use_connections = [object()] * in_use
+            self._available_connections = [object()] * idle
+
+    class Client:
+        def __init__(self, in_use, idle):
+            self.connection_pool = Pool(in_use, idle)
+
+    monkeypatch.setattr(redis_client, "_clients", {"loop-a": Client(2, 3), "loop-b": Client(1, 0)})
+    assert pool_connections() == {("in_use",): 3, ("idle",): 3}
@@ -0,0 +1,59 @@
+import asyncio
+import uuid
+import agent.db.tasks
+from agent.db.replicas import Replica, ReplicatedDatabase, read_session_key, set_read_session
+
+
+def test_create_database_wraps_replicas(monkeypatch):
+    monkeypatch.setattr(
+        agent.db.tasks, "DATABASE_REPLICA_URLS", "postgresql://r:r@replica-a/agent|3,postgresql://r:r@replica-b/agent"
+    )
+    database = agent.db.tasks.create_database(min_size=1, max_size=2)
+
+    assert isinstance(database, ReplicatedDatabase)
+    assert [(r.name, r.weight) for r in database.replicas] == [("replica-a", 3.0), ("replica-b", 1.0)]
+
+
+def test_create_database_without_replicas(monkeypatch):
+    monkeypatch.setattr(agent.db.tasks, "DATABASE_REPLICA_URLS", "")
+    assert not isinstance(agent.db.tasks.create_database(), ReplicatedDatabase)
+
+
+class Primary:
+    def __init__(self):
+        self.lookups = []
+
+    async def fetch_val(self, query, values=None):
+        self.lookups.append(values["telex_user_id"])
+        return {"telex-1": uuid.UUID(int=1)}.get(values["telex_user_id"])
+
+
+def replicated():
+    replica = Replica("postgresql://r:r@replica-a/agent")
+    replica.healthy = True
+    return ReplicatedDatabase(Primary(), [replica]), replica
+
+
+def test_rpc_and_coach_share_one_read_after_write_key():
+    database, replica = replicated()
+
+    async def coach_reads():
+        set_read_session(await read_session_key(database, telex_user_id="telex-1"))
+        return database.for_read()
+
+    async def rpc_writes():
+        set_read_session(await read_session_key(database, user_id=uuid.UUID(int=1)))
+        database.for_write()
+
+    assert asyncio.run(coach_reads()) is replica.database
+    asyncio.run(rpc_writes())
+    assert asyncio.run(coach_reads()) is database.primary
+    # the sender's id is looked up once, then remembered
+    assert database.primary.lookups == ["telex-1"]
+
+
+def test_unknown_senders_and_plain_databases_have_no_user_key():
+    database, _ = replicated()
+    assert asyncio.run(read_session_key(database, telex_user_id="telex-unknown")) is None
+    assert asyncio.run(read_session_key(Primary(), telex_user_id="telex-1")) is None
+    assert asyncio.run(read_session_key(None, user_id="u-1")) == "u-1"
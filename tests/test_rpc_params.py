@@ -0,0 +1,40 @@
+from agent.models.agent_rpc import TaskSendRequest, rpc_request_adapter
+
+
+def test_string_task_parts_are_accepted():
+    rpc = rpc_request_adapter.validate_json(
+        b'{"jsonrpc": "2.0", "method": "tasks/send", "params": {"task": {"parts": ["hello", {"text": "hi"}]}}}'
+    )
+    assert isinstance(rpc, TaskSendRequest)
+    assert rpc.params.task.parts == ["hello", {"text": "hi"}]
+
+
+def test_invalid_params_of_a_known_method(client):
+    response = client.post("/a2a-coach/rpc", json={
+        "jsonrpc": "2.0", "id": "1", "method": "goals/progress", "params": {"user_id": "not-a-uuid"},
+    })
+    assert response.status_code == 200
+    assert response.json()["error"]["code"] == -32602
+    assert "user_id" in response.json()["error"]["message"]
+
+
+def test_invalid_params_of_an_unknown_method(client):
+    response = client.post("/a2a-coach/rpc", json={
+        "jsonrpc": "2.0", "id": "2", "method": "no/such", "params": {"sender": {"nested": True}},
+    })
+    assert response.status_code == 200
+    assert response.json()["error"]["code"] == -32602
+
+
+def test_unknown_method(client):
+    response = client.post("/a2a-coach/rpc", json={"jsonrpc": "2.0", "id": "3", "method": "no/such"})
+    assert response.json()["error"] == {"code": -32601, "message": "Method not found"}
+
+
+def test_unknown_methods_share_one_metric_label(client):
+    from agent.core.metrics import http_request_duration
+
+    client.post("/a2a-coach/rpc", json={"jsonrpc": "2.0", "id": "4", "method": "attacker/abc123"})
+    rendered = http_request_duration.render()
+    assert "attacker/abc123" not in rendered
+    assert 'rpc_method="unknown"' in rendered
@@ -0,0 +1,96 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from agent.db.repositories.search import SearchRepository
+from agent.services.search import search_context, search_history
+
+NOW = datetime.now(timezone.utc)
+
+
+def test_context_is_one_dated_line_per_hit_within_the_budget():
+    hits = [
+        {"kind": "goal", "title": "Learn SQL", "created_at": datetime(2026, 3, 1), "snippet": "**SQL**\n joins"},
+        {"kind": "message", "title": None, "created_at": datetime(2026, 3, 2), "snippet": "more **SQL**"},
+    ]
+    assert search_context(hits) == '[2026-03-01] goal "Learn SQL": **SQL** joins\n[2026-03-02] message: more **SQL**'
+    assert search_context(hits, max_chars=50) == '[2026-03-01] goal "Learn SQL": **SQL** joins'
+
+
+def test_search_rpc_validates_its_params(client):
+    def call(params):
+        return client.post("/a2a-coach/rpc", json={
+            "jsonrpc": "2.0", "id": "1", "method": "search/query",
+            "params": {"user_id": str(uuid.uuid4()), **params},
+        }).json()["error"]
+
+    assert call({"query": "sql", "limit": 51})["code"] == -32602
+    assert call({"query": "   "})["message"] == "query is required"
+    assert call({"query": "sql"})["message"] == "Search unavailable"
+
+
+async def seed(db, user_id, other_user_id):
+    await db.execute("SELECT create_message_partitions(CAST(:start AS date), CAST(:end AS date))", values={
+        "start": (NOW - timedelta(days=90)).date(), "end": NOW.date(),
+    })
+    messages = [
+        (user_id, "Practised SQL joins on the orders table", NOW - timedelta(days=1)),
+        (user_id, "SQL window functions are hard, more SQL tomorrow", NOW - timedelta(days=2)),
+        (user_id, "Old note about SQL indexes", NOW - timedelta(days=60)),
+        (user_id, "Went for a run", NOW - timedelta(days=1)),
+        (other_user_id, "Someone else's SQL question", NOW - timedelta(days=1)),
+    ]
+    for owner, text, created_at in messages:
+        await db.execute(
+            "INSERT INTO messages (user_id, text, created_at) VALUES (:user_id, :text, :created_at)",
+            values={"user_id": owner, "text": text, "created_at": created_at},
+        )
+    await db.execute(
+        "INSERT INTO goals (user_id, title, description) VALUES (:user_id, 'Master SQL', 'Joins and indexes')",
+        values={"user_id": user_id},
+    )
+
+
+def test_search_ranks_the_users_own_messages_and_goals(in_database):
+    user_id = uuid.uuid4()
+
+    async def test(db):
+        await seed(db, user_id, uuid.uuid4())
+        return await SearchRepository(db).search(user_id, "sql", 10)
+
+    results = in_database(test)
+    assert len(results) == 4
+    assert {r["kind"] for r in results} == {"message", "goal"}
+    assert not any("Someone else" in r["snippet"] for r in results)
+    assert [r["rank"] for r in results] == sorted((r["rank"] for r in results), reverse=True)
+    assert all("**SQL**" in r["snippet"] for r in results if r["kind"] == "message")
+
+
+def test_since_and_limit_narrow_the_results(in_database):
+    user_id = uuid.uuid4()
+
+    async def test(db):
+        await seed(db, user_id, uuid.uuid4())
+        repository = SearchRepository(db)
+        recent = await repository.search(user_id, "sql", 10, since=NOW - timedelta(days=30))
+        limited = await repository.search(user_id, "sql", 2)
+        excluded = await repository.search(user_id, "sql -joins", 10)
+        return recent, limited, excluded
+
+    recent, limited, excluded = in_database(test)
+    assert not any("Old note" in r["snippet"] for r in recent)
+    assert len(recent) == 3
+    assert len(limited) == 2
+    # web-search syntax: "-joins" drops the message and the goal that mention joins
+    assert [r["kind"] for r in excluded] == ["message", "message"]
+    assert not any("join" in r["snippet"].lower() for r in excluded)
+
+
+def test_search_history_builds_prompt_context(in_database):
+    user_id = uuid.uuid4()
+
+    async def test(db):
+        await seed(db, user_id, uuid.uuid4())
+        return await search_history(db, user_id, "window functions", 5)
+
+    history = in_database(test)
+    assert len(history["results"]) == 1
+    assert history["context"].startswith(f"[{(NOW - timedelta(days=2)):%Y-%m-%d}] message:")
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from agent import main
+from agent.core import config
+from agent.db import tasks
+
+
+def test_missing_gemini_key_fails_at_startup(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY")
+    monkeypatch.setitem(config._pending, "GEMINI_API_KEY", config.lazy("GEMINI_API_KEY", cast=str))
+    monkeypatch.delitem(vars(config), "GEMINI_API_KEY", raising=False)
+
+    with pytest.raises(KeyError, match="GEMINI_API_KEY"):
+        main.get_application()
+
+
+def test_fake_provider_needs_no_gemini_key(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY")
+    monkeypatch.setattr(config, "LLM_PROVIDER", "fake", raising=False)
+    monkeypatch.setitem(config._pending, "GEMINI_API_KEY", config.lazy("GEMINI_API_KEY", cast=str))
+    monkeypatch.delitem(vars(config), "GEMINI_API_KEY", raising=False)
+
+    main.get_application()
+
+
+def test_concurrent_first_access_resolves_once(monkeypatch):
+    calls = []
+
+    def resolve():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    monkeypatch.setitem(config._pending, "SLOW_SETTING", config._Lazy(resolve))
+    monkeypatch.delitem(vars(config), "SLOW_SETTING", raising=False)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        values = list(pool.map(lambda _: config.get("SLOW_SETTING"), range(8)))
+    del vars(config)["SLOW_SETTING"]
+
+    assert values == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_database_url_is_read_when_a_database_is_created(monkeypatch):
+    config.get("DATABASE_URL")  # resolved first, so the real value is restored afterwards
+    monkeypatch.setitem(config._pending, "DATABASE_URL", config._Lazy(lambda: "postgresql://late@localhost/db"))
+    monkeypatch.delitem(vars(config), "DATABASE_URL", raising=False)
+    monkeypatch.setattr(tasks, "DATABASE_REPLICA_URLS", "")
+
+    assert str(tasks.create_database().url) == "postgresql://late@localhost/db"
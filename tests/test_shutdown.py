@@ -0,0 +1,40 @@
+import signal
+import time
+from agent import main
+from agent.core import config
+
+
+def test_drain_budget_counts_from_the_stop_signal(monkeypatch):
+    monkeypatch.setattr(main, "_shutdown_started", None)
+    assert main.shutdown_time_left() == config.SHUTDOWN_GRACE_SECONDS
+
+    monkeypatch.setattr(main, "_shutdown_started", time.monotonic() - config.SHUTDOWN_GRACE_SECONDS + 5)
+    assert 4 < main.shutdown_time_left() <= 5
+
+    monkeypatch.setattr(main, "_shutdown_started", time.monotonic() - config.SHUTDOWN_GRACE_SECONDS - 5)
+    assert main.shutdown_time_left() == 0
+
+
+def test_stop_signal_is_recorded_before_uvicorn_handles_it(monkeypatch):
+    handled = []
+    original_int = signal.getsignal(signal.SIGINT)
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: handled.append(signum))
+    monkeypatch.setattr(main, "_shutdown_started", None)
+    try:
+        main.record_shutdown_signal()
+        signal.raise_signal(signal.SIGTERM)
+    finally:
+        signal.signal(signal.SIGTERM, original)
+        signal.signal(signal.SIGINT, original_int)
+
+    assert handled == [signal.SIGTERM]
+    assert main._shutdown_started is not None
+
+
+def test_production_trusts_forwarded_headers_only_from_the_proxy(monkeypatch):
+    started = {}
+    monkeypatch.setattr(main.uvicorn, "run", lambda app, **kwargs: started.update(kwargs))
+    monkeypatch.setattr(config, "FORWARDED_ALLOW_IPS", "10.0.0.0/8")
+    main.main(["--production"])
+    assert started["proxy_headers"] is True
+    assert started["forwarded_allow_ips"] == "10.0.0.0/8"
@@ -0,0 +1,75 @@
+import hashlib
+import hmac
+import time
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from agent.core.signatures import SignatureMiddleware
+from agent.core.utils import verify_a2a_signature
+
+SECRET = "shared-secret"
+
+
+async def echo(request: Request):
+    return PlainTextResponse(await request.body())
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[Route("/rpc", echo, methods=["POST"])])
+    app.add_middleware(SignatureMiddleware, paths=("/rpc",), secret=SECRET, max_body_bytes=64)
+    return TestClient(app)
+
+
+def sign(body: bytes, timestamp: int = None) -> dict:
+    timestamp = str(timestamp or int(time.time()))
+    signature = hmac.new(SECRET.encode(), timestamp.encode() + body, hashlib.sha256).hexdigest()
+    return {"X-A2A-Timestamp": timestamp, "X-A2A-Signature": signature}
+
+
+def test_valid_signature_reaches_the_route_with_the_body(client):
+    response = client.post("/rpc", content=b'{"a": 1}', headers=sign(b'{"a": 1}'))
+    assert response.status_code == 200
+    assert response.content == b'{"a": 1}'
+
+
+def test_replayed_signature_is_rejected(client):
+    headers = sign(b"{}")
+    assert client.post("/rpc", content=b"{}", headers=headers).status_code == 200
+    assert client.post("/rpc", content=b"{}", headers=headers).status_code == 409
+
+
+def test_bad_signature_is_rejected(client):
+    headers = {**sign(b"{}"), "X-A2A-Signature": "0" * 64}
+    assert client.post("/rpc", content=b"{}", headers=headers).status_code == 401
+
+
+def test_stale_timestamp_is_rejected(client):
+    headers = sign(b"{}", int(time.time()) - 3600)
+    assert client.post("/rpc", content=b"{}", headers=headers).status_code == 401
+
+
+def test_missing_header_is_rejected(client):
+    assert client.post("/rpc", content=b"{}").status_code == 401
+
+
+def test_non_ascii_signature_is_rejected_not_an_error(client):
+    headers = {**sign(b"{}"), "X-A2A-Signature": "é" * 64}
+    headers = [(k.encode(), v.encode("latin-1")) for k, v in headers.items()]
+    assert client.post("/rpc", content=b"{}", headers=headers).status_code == 401
+    assert not verify_a2a_signature(b"{}", str(int(time.time())), "é" * 64, SECRET)
+
+
+def test_oversized_body_is_refused_before_the_check(client):
+    assert client.post("/rpc", content=b"x" * 65, headers=sign(b"x" * 65)).status_code == 413
+
+
+def test_body_limit_applies_without_a_secret():
+    app = Starlette(routes=[Route("/rpc", echo, methods=["POST"])])
+    app.add_middleware(SignatureMiddleware, paths=("/rpc",), secret=None, max_body_bytes=64)
+    client = TestClient(app)
+    assert client.post("/rpc", content=b"x" * 65).status_code == 413
+    assert client.post("/rpc", content=b"{}").text == "{}"
@@ -0,0 +1,121 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from agent.core import tracing, worker
+from agent.core.tracing import (
+    SpanContext, TracingMiddleware, critical_path, current_traceparent, parse_traceparent, span
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    spans = []
+    monkeypatch.setattr(tracing, "enabled", lambda: True)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing.exporter, "submit", spans.extend)
+    return spans
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == SpanContext(TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00").sampled is False
+    for value in (None, "", "garbage", f"00-{TRACE_ID}-short-01", f"00-{TRACE_ID}-{PARENT_ID}-zz"):
+        assert parse_traceparent(value) is None
+
+
+def test_children_share_the_trace_and_point_at_their_parent(exported):
+    with span("root", parent=SpanContext(TRACE_ID, PARENT_ID, True)) as root:
+        with span("child") as child:
+            assert current_traceparent() == f"00-{TRACE_ID}-{child.span_id}-01"
+
+    assert [s.name for s in exported] == ["child", "root"]
+    assert child.trace.trace_id == root.trace.trace_id == TRACE_ID
+    assert child.parent_id == root.span_id
+    assert root.parent_id == PARENT_ID
+
+
+def test_unsampled_fast_traces_are_dropped_and_errors_kept(exported):
+    with span("fast"):
+        pass
+    assert exported == []
+
+    with pytest.raises(ValueError):
+        with span("failing"):
+            with span("inner"):
+                raise ValueError("boom")
+    assert [s.name for s in exported] == ["inner", "failing"]
+    assert exported[0].error == "ValueError: boom"
+
+
+def test_middleware_continues_the_incoming_trace(exported):
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    async def broken(request):
+        return PlainTextResponse("no", status_code=503)
+
+    app = Starlette(routes=[Route("/ok", ok), Route("/broken", broken)])
+    app.add_middleware(TracingMiddleware)
+    client = TestClient(app)
+
+    client.get("/ok", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    (root,) = exported
+    assert (root.trace.trace_id, root.parent_id) == (TRACE_ID, PARENT_ID)
+    assert root.attributes["http_status"] == 200
+
+    exported.clear()
+    client.get("/broken")
+    (root,) = exported
+    assert root.error == "HTTP 503"
+
+
+def test_enqueued_jobs_carry_the_trace_into_the_worker(exported, monkeypatch):
+    enqueued = []
+
+    class FakeQueue:
+        def enqueue(self, func, *args, **kwargs):
+            enqueued.append(kwargs)
+
+    class FakeJob:
+        meta = {}
+
+    async def coach(user_input, channel_id):
+        return "done"
+
+    monkeypatch.setattr(worker, "node_queue", lambda node: FakeQueue())
+    with span("POST /coach", parent=SpanContext(TRACE_ID, PARENT_ID, True)) as request:
+        worker.enqueue_for("conversation", "agent.core.worker.long_coach_task", "hi")
+    assert enqueued[0]["meta"]["traceparent"] == f"00-{TRACE_ID}-{request.span_id}-01"
+
+    FakeJob.meta = enqueued[0]["meta"]
+    monkeypatch.setattr("rq.get_current_job", lambda: FakeJob)
+    monkeypatch.setattr(worker, "_long_coach", coach)
+    monkeypatch.setattr(tracing.exporter, "flush", lambda: None)
+    exported.clear()
+    assert worker.long_coach_task("hi") == "done"
+
+    (job,) = exported
+    assert job.name == "worker.long_coach_task"
+    assert (job.trace.trace_id, job.parent_id) == (TRACE_ID, request.span_id)
+
+
+def test_critical_path_follows_the_awaited_children():
+    def s(span_id, parent, start, end, name):
+        return {
+            "spanId": span_id, "parentSpanId": parent, "name": name,
+            "startTimeUnixNano": str(start), "endTimeUnixNano": str(end),
+        }
+
+    spans = [
+        s("a", None, 0, 100, "POST /rpc"),
+        s("b", "a", 0, 30, "db.query"),
+        s("c", "a", 30, 95, "llm.generate"),
+        s("d", "a", 90, 500, "queued job"),
+        s("e", "c", 31, 90, "llm.admission"),
+    ]
+    assert [x["name"] for x in critical_path(spans)] == ["POST /rpc", "llm.generate", "llm.admission"]